@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import csv
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any
+
+from pie.application.query import (
+    RangeFilter,
+    chunk_may_match,
+    group_value,
+    parse_group_by,
+    parse_where,
+)
+from pie.application.stats import (
+    PASSENGER_SAMPLE_SIZE,
+    GroupAgg,
+    PassengerAgg,
+    Reservoir,
+    rank_passengers,
+    row_matches,
+)
+from pie.infrastructure.io.ledger import (
+    SAMPLE_WEIGHT_FIELD,
+    iter_chunk_blocks,
+    read_block_lines,
+    read_ledger_index,
+    resolve_ledger_dir,
+)
+
+
+@dataclass
+class _GroupSample:
+    """
+    Per-block totals of one group over the sampled blocks (block index -> value).
+    Blocks where the group did not occur are implicit zeros. Rows count with
+    their sample weight on weighted ledgers.
+    """
+
+    agg: GroupAgg
+    y: dict[int, float] = field(default_factory=dict)
+    m: dict[int, float] = field(default_factory=dict)
+
+
+def _ratio_var(num: list[float], den: list[float], f: float) -> tuple[float, float]:
+    """
+    Ratio estimator b = sum(num)/sum(den) under simple random sampling of
+    clusters without replacement (sampling fraction f). Returns (b, var(b)).
+    """
+    n = len(num)
+    s_den = sum(den)
+    if s_den == 0:
+        return float("nan"), float("inf")
+    b = sum(num) / s_den
+    if n < 2:
+        return b, float("inf")
+    resid = [y - b * x for y, x in zip(num, den, strict=True)]
+    s2 = sum(e * e for e in resid) / (n - 1)
+    mean_den = s_den / n
+    return b, (1.0 - f) * s2 / (n * mean_den * mean_den)
+
+
+def _group_estimate(gs: _GroupSample, block_rows: list[int], total_rows: int, f: float, z: float) -> dict[str, float]:
+    n = len(block_rows)
+    y = [gs.y.get(i, 0.0) for i in range(n)]
+    m = [float(gs.m.get(i, 0)) for i in range(n)]
+    r = [float(x) for x in block_rows]
+
+    # Sums and counts: ratio to block size, scaled by the known row total.
+    per_row_sum, v_sum = _ratio_var(y, r, f)
+    per_row_cnt, _ = _ratio_var(m, r, f)
+    sum_est = per_row_sum * total_rows
+    sum_half = z * math.sqrt(v_sum) * total_rows
+    rows_est = per_row_cnt * total_rows
+
+    mean, v_mean = _ratio_var(y, m, f)
+    mean_half = z * math.sqrt(v_mean)
+    if mean_half == 0:
+        rel = 0.0
+    elif mean:
+        rel = mean_half / abs(mean)
+    else:
+        rel = float("inf")
+
+    out = gs.agg.as_dict()
+    scale = rows_est / gs.agg.weight if gs.agg.rows else 0.0
+    out.update(
+        {
+            "rows": float(rows_est),
+            "mean_total_cost_eur": float(mean),
+            "sum_total_cost_eur": float(sum_est),
+            "sum_cash_comp_eur": float(gs.agg.sum_cash * scale),
+            "sum_care_cost_eur": float(gs.agg.sum_care * scale),
+            "sum_refund_cost_eur": float(gs.agg.sum_refund * scale),
+            "sum_rebooking_cost_eur": float(gs.agg.sum_rebook * scale),
+            "sampled_rows": float(gs.agg.rows),
+            "mean_ci_low_eur": float(mean - mean_half),
+            "mean_ci_high_eur": float(mean + mean_half),
+            "sum_ci_low_eur": float(sum_est - sum_half),
+            "sum_ci_high_eur": float(sum_est + sum_half),
+            "rel_half_width": float(rel),
+        }
+    )
+    return out
+
+
+def compute_stats_approx(
+    out_dir: str,
+    top: int = 20,
+    by: str = "segment",
+    metric: str = "mean",
+    min_cost: float = 0.0,
+    sample_size: int = 5000,
+    seed: int = 1337,
+    where: list[str] | None = None,
+    delay_bucket: int = 60,
+    precision: float = 0.01,
+    time_budget: float = 10.0,
+    confidence: float = 0.95,
+    batch_blocks: int = 8,
+    min_blocks: int = 4,
+) -> dict:
+    """
+    Estimate compute_stats_v2 output from randomly sampled ledger blocks.
+
+    Blocks are drawn without replacement in batches until every group mean's
+    confidence half-width is within `precision` (relative), `time_budget`
+    seconds have elapsed, or the ledger is exhausted. Means are ratio
+    estimates over blocks (cluster sampling); sums and row counts are scaled
+    to the known row total from ledger_index.json. Quantiles and top
+    passengers are computed from the sampled rows only.
+    """
+    metric = metric.strip().lower()
+    if metric not in {"mean", "sum", "max", "p95"}:
+        raise ValueError("metric must be one of: mean|sum|max|p95")
+    if top <= 0:
+        raise ValueError("--top must be > 0")
+    if min_cost < 0:
+        raise ValueError("--min-cost must be >= 0")
+    if not (0.0 < precision < 1.0):
+        raise ValueError("--precision must be in (0, 1)")
+    if time_budget < 0:
+        raise ValueError("--time-budget must be >= 0")
+    if not (0.5 <= confidence < 1.0):
+        raise ValueError("--confidence must be in [0.5, 1)")
+    if batch_blocks <= 0 or min_blocks <= 0:
+        raise ValueError("batch_blocks and min_blocks must be > 0")
+
+    out = Path(out_dir)
+    idx = read_ledger_index(out)
+    if idx is None:
+        raise FileNotFoundError("--approx needs ledger_index.json + ledger/ chunks (it samples ledger blocks)")
+    ledger = idx["ledger"]
+    ledger_dir = resolve_ledger_dir(out, ledger)
+    fields = ledger["fields"]
+
+    keys = parse_group_by(by)
+    filters = parse_where(where or [])
+    if min_cost > 0:
+        filters.append(RangeFilter("total_cost_eur", lo=float(min_cost)))
+
+    live_chunks = [ch for ch in ledger["chunks"] if chunk_may_match(ch.get("zone_map"), filters)]
+    blocks = [b for b in iter_chunk_blocks(ledger_dir, live_chunks) if b[4] > 0]
+    all_rows = int(ledger["total_rows_written"])
+    population_rows = sum(b[4] for b in blocks)
+
+    rng = random.Random(seed)
+    rng.shuffle(blocks)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+    groups: dict[str, _GroupSample] = {}
+    pax: dict[str, PassengerAgg] = {}
+    block_rows: list[int] = []
+    scanned_rows = 0
+    kept_rows = 0
+
+    started = time.perf_counter()
+    stopped = "exhausted"
+    achieved = float("inf")
+    estimates: dict[str, dict[str, float]] = {}
+
+    while len(block_rows) < len(blocks):
+        for _chunk, path, offset, length, _rows in blocks[len(block_rows) : len(block_rows) + batch_blocks]:
+            i = len(block_rows)
+            n_rows = 0
+            for rec in csv.reader(read_block_lines(path, offset, length)):
+                n_rows += 1
+                row = dict(zip(fields, rec, strict=True))
+                total = float(row["total_cost_eur"])
+                w = float(row.get(SAMPLE_WEIGHT_FIELD) or 1.0)
+                if filters and not row_matches(row, total, filters):
+                    continue
+                kept_rows += 1
+
+                gkey = "|".join(f"{k}={group_value(row, k, delay_bucket)}" for k in keys) if keys else "all"
+                if gkey not in groups:
+                    groups[gkey] = _GroupSample(agg=GroupAgg(res=Reservoir(k=sample_size, rng=rng)))
+                gs = groups[gkey]
+                gs.agg.add(total, row, w)
+                gs.y[i] = gs.y.get(i, 0.0) + w * total
+                gs.m[i] = gs.m.get(i, 0.0) + w
+
+                pid = row.get("passenger_id", "")
+                if pid:
+                    if pid not in pax:
+                        pax[pid] = PassengerAgg(res=Reservoir(k=min(sample_size, PASSENGER_SAMPLE_SIZE), rng=rng))
+                    pax[pid].add(total, w)
+            block_rows.append(n_rows)
+            scanned_rows += n_rows
+
+        f = len(block_rows) / len(blocks)
+        estimates = {
+            k: _group_estimate(gs, block_rows, population_rows, f, z) for k, gs in groups.items()
+        }
+        achieved = max((e["rel_half_width"] for e in estimates.values()), default=0.0)
+
+        if len(block_rows) >= len(blocks):
+            stopped = "exhausted"
+            break
+        if len(block_rows) >= min_blocks and achieved <= precision:
+            stopped = "precision"
+            break
+        if time_budget and time.perf_counter() - started >= time_budget:
+            stopped = "time_budget"
+            break
+
+    approx: dict[str, Any] = {
+        "confidence": float(confidence),
+        "precision_target": float(precision),
+        "precision_achieved": float(achieved),
+        "time_budget_s": float(time_budget),
+        "elapsed_s": round(time.perf_counter() - started, 4),
+        "stopped": stopped,
+        "blocks_sampled": len(block_rows),
+        "blocks_total": len(blocks),
+        "rows_scanned": int(scanned_rows),
+    }
+
+    return {
+        "ok": True,
+        "out_dir": out_dir,
+        "source": str(ledger_dir),
+        "chunks": len(ledger["chunks"]),
+        "pruned_chunks": len(ledger["chunks"]) - len(live_chunks),
+        "by": by,
+        "where": [f.spec() for f in filters],
+        "delay_bucket": int(delay_bucket),
+        "metric": metric,
+        "min_cost": float(min_cost),
+        "sample_size": int(sample_size),
+        "total_rows": all_rows,
+        "kept_rows": int(kept_rows),
+        "approx": approx,
+        "groups": estimates,
+        "top_passengers": rank_passengers(pax, metric, top),
+    }
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+
+from pie.application.query import RangeFilter, parse_group_by
+from pie.application.stats import StatsQuery, _q_from_sorted, _wq_from_sorted
+from pie.infrastructure.io.binledger import CATEGORICAL_FIELDS, BinaryLedger
+from pie.infrastructure.io.ledger import SAMPLE_WEIGHT_FIELD
+
+_QUANTILES = (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+
+
+def _filter_mask(recs: np.ndarray, filters: list[RangeFilter]) -> np.ndarray:
+    mask = np.ones(len(recs), dtype=bool)
+    for f in filters:
+        col = recs[f.column]
+        if f.lo is not None:
+            mask &= (col > f.lo) if f.lo_open else (col >= f.lo)
+        if f.hi is not None:
+            mask &= (col < f.hi) if f.hi_open else (col <= f.hi)
+    return mask
+
+
+def _label_values(bl: BinaryLedger, recs: np.ndarray, column: str, delay_bucket: int) -> tuple[np.ndarray, Any]:
+    """
+    (integer-or-float key array, key -> label) for one --by column, with
+    labels formatted exactly like group_value() over the CSV ledger.
+    """
+    if column in CATEGORICAL_FIELDS:
+        cats = bl.categories[column]
+        return recs[column], lambda v: cats[int(v)]
+    if column == "passenger_id":
+        return recs["passenger"], lambda v: bl.passengers[int(v)]
+    if column == "refundable":
+        return recs["refundable"], lambda v: str(bool(v))
+    if column in {"run_id", "seed"}:
+        const = str(bl.header[column])
+        return np.zeros(len(recs), dtype=np.int8), lambda v: const
+    if column == "delay_minutes" and delay_bucket > 1:
+        lo = recs["delay_minutes"] // delay_bucket * delay_bucket
+        return lo, lambda v: f"{int(v)}-{int(v) + delay_bucket - 1}"
+    if column in {"iteration", "delay_minutes"}:
+        return recs[column], lambda v: str(int(v))
+    return recs[column], lambda v: str(float(v))
+
+
+def _quantiles(values: np.ndarray, weights: np.ndarray | None) -> dict[str, float]:
+    if not len(values):
+        return {name: float("nan") for name, _ in _QUANTILES}
+    order = np.argsort(values, kind="stable")
+    v = values[order]
+    if weights is None:
+        s = v.tolist()
+        return {name: _q_from_sorted(s, q) for name, q in _QUANTILES}
+    pairs = list(zip(v.tolist(), weights[order].tolist(), strict=True))
+    return {name: _wq_from_sorted(pairs, q) for name, q in _QUANTILES}
+
+
+def compute_stats_binary(
+    out_dir: str,
+    top: int = 20,
+    by: str = "segment",
+    metric: str = "mean",
+    min_cost: float = 0.0,
+    where: list[str] | None = None,
+    delay_bucket: int = 60,
+) -> dict:
+    """
+    compute_stats_v2 over the memory-mapped out/ledger.bin: filters, grouping
+    and sums are vectorized numpy passes over the records, and quantiles are
+    exact (no reservoir). Weighted ledgers are reweighted as in the CSV path.
+    """
+    q = StatsQuery(
+        top=top,
+        by=by,
+        metric=metric.strip().lower(),
+        min_cost=min_cost,
+        where=tuple(where or ()),
+        delay_bucket=delay_bucket,
+    )
+    q.validate()
+    filters = q.filters()
+    keys = parse_group_by(q.by)
+
+    bl = BinaryLedger(out_dir)
+    recs = bl.records
+    sel = recs[_filter_mask(recs, filters)] if filters else recs
+    weighted = bool(bl.header["weighted"])
+    w = np.asarray(sel[SAMPLE_WEIGHT_FIELD], dtype=np.float64)
+    total = np.asarray(sel["total_cost_eur"], dtype=np.float64)
+
+    # --- groups ---
+    if keys:
+        cols = [_label_values(bl, sel, k, q.delay_bucket) for k in keys]
+        uniq, inv = np.unique(np.stack([c[0].astype(np.float64) for c in cols], axis=1), axis=0, return_inverse=True)
+        inv = inv.reshape(-1)
+        labels = ["|".join(f"{k}={fmt(v)}" for k, (_, fmt), v in zip(keys, cols, row, strict=True)) for row in uniq]
+    else:
+        inv = np.zeros(len(sel), dtype=np.int64)
+        labels = ["all"] if len(sel) else []
+
+    n_groups = len(labels)
+    rows = np.bincount(inv, minlength=n_groups)
+    wsum = np.bincount(inv, weights=w, minlength=n_groups)
+    sums = {
+        c: np.bincount(inv, weights=w * sel[c], minlength=n_groups)
+        for c in ("total_cost_eur", "cash_comp_eur", "care_cost_eur", "refund_cost_eur", "rebooking_cost_eur")
+    }
+    order = np.argsort(inv, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(rows)])
+
+    groups: dict[str, dict[str, float]] = {}
+    for g, label in enumerate(labels):
+        idx = order[bounds[g] : bounds[g + 1]]
+        vals = total[idx]
+        qs = _quantiles(vals, w[idx] if weighted else None)
+        groups[label] = {
+            "rows": float(wsum[g]),
+            "mean_total_cost_eur": float(sums["total_cost_eur"][g] / wsum[g]),
+            "sum_total_cost_eur": float(sums["total_cost_eur"][g]),
+            "min_total_cost_eur": float(vals.min()),
+            "max_total_cost_eur": float(vals.max()),
+            "p50_total_cost_eur": qs["p50"],
+            "p95_total_cost_eur": qs["p95"],
+            "p99_total_cost_eur": qs["p99"],
+            "sum_cash_comp_eur": float(sums["cash_comp_eur"][g]),
+            "sum_care_cost_eur": float(sums["care_cost_eur"][g]),
+            "sum_refund_cost_eur": float(sums["refund_cost_eur"][g]),
+            "sum_rebooking_cost_eur": float(sums["rebooking_cost_eur"][g]),
+        }
+
+    # --- passengers ---
+    pax = np.asarray(sel["passenger"], dtype=np.int64)
+    n_pax = len(bl.passengers)
+    p_rows = np.bincount(pax, minlength=n_pax)
+    p_w = np.bincount(pax, weights=w, minlength=n_pax)
+    p_sum = np.bincount(pax, weights=w * total, minlength=n_pax)
+    p_max = np.full(n_pax, -np.inf)
+    np.maximum.at(p_max, pax, total)
+    p_order = np.lexsort((total, pax))
+    p_bounds = np.concatenate([[0], np.cumsum(p_rows)])
+
+    def pax_quantiles(code: int) -> dict[str, float]:
+        idx = p_order[p_bounds[code] : p_bounds[code + 1]]
+        return _quantiles(total[idx], w[idx] if weighted else None)
+
+    present = np.flatnonzero(p_rows)
+    if q.metric == "mean":
+        scores = p_sum[present] / p_w[present]
+    elif q.metric == "sum":
+        scores = p_sum[present]
+    elif q.metric == "max":
+        scores = p_max[present]
+    else:
+        scores = np.array([pax_quantiles(int(c))["p95"] for c in present])
+    ranked = present[np.argsort(-scores, kind="stable")][: q.top]
+    score_of = dict(zip(present.tolist(), scores.tolist(), strict=True))
+
+    top_passengers: list[dict[str, float | str]] = []
+    for code in ranked.tolist():
+        qs = pax_quantiles(code)
+        top_passengers.append(
+            {
+                "passenger_id": bl.passengers[code],
+                "rows": float(p_w[code]),
+                "mean_total_cost_eur": float(p_sum[code] / p_w[code]),
+                "sum_total_cost_eur": float(p_sum[code]),
+                "max_total_cost_eur": float(p_max[code]),
+                "p50_total_cost_eur": qs["p50"],
+                "p95_total_cost_eur": qs["p95"],
+                "p99_total_cost_eur": qs["p99"],
+                "score": float(score_of[code]),
+                "metric": q.metric,
+            }
+        )
+
+    return {
+        "ok": True,
+        "out_dir": out_dir,
+        "source": str(bl.path),
+        "engine": "binary",
+        "by": q.by,
+        "where": [f.spec() for f in filters],
+        "delay_bucket": int(q.delay_bucket),
+        "metric": q.metric,
+        "min_cost": float(q.min_cost),
+        "total_rows": len(recs),
+        "kept_rows": len(sel),
+        "groups": groups,
+        "top_passengers": top_passengers,
+    }
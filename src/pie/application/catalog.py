@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import sqlite3
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+CATALOG_ENV = "PIE_CATALOG"
+SUMMARY_METRICS = ("mean_total_cost", "p95_total_cost", "cvar95_total_cost", "p_loss_over_0")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    config_hash TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    iterations INTEGER NOT NULL,
+    audit TEXT NOT NULL,
+    ledger_mode TEXT,
+    out_dir TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    registered_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_config_created ON runs (config_hash, created_at);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at);
+
+CREATE TABLE IF NOT EXISTS run_metrics (
+    run_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, metric)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_metrics_metric_value ON run_metrics (metric, value);
+
+CREATE TABLE IF NOT EXISTS sketches (
+    run_id TEXT NOT NULL,
+    column TEXT NOT NULL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (run_id, column)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS stats_groups (
+    run_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    by TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    rows REAL NOT NULL,
+    mean_total_cost_eur REAL,
+    p50_total_cost_eur REAL,
+    p95_total_cost_eur REAL,
+    p99_total_cost_eur REAL,
+    sum_total_cost_eur REAL,
+    registered_at TEXT NOT NULL,
+    PRIMARY KEY (run_id, query, grp)
+) WITHOUT ROWID;
+"""
+
+
+def default_catalog_path() -> Path:
+    """
+    $PIE_CATALOG, else ~/.pie/catalog.sqlite.
+    """
+    env = os.getenv(CATALOG_ENV, "").strip()
+    return Path(env) if env else Path.home() / ".pie" / "catalog.sqlite"
+
+
+def _now() -> str:
+    return datetime.now(UTC).isoformat(timespec="seconds")
+
+
+@dataclass
+class CostSketch:
+    """
+    Log-bucketed histogram with relative accuracy `alpha` (DDSketch-style).
+    Sketches with the same alpha merge exactly by adding bucket counts, so
+    quantiles over many runs never need their raw cost distributions.
+    """
+
+    alpha: float = 0.01
+    zeros: int = 0
+    buckets: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def _gamma(self) -> float:
+        return (1.0 + self.alpha) / (1.0 - self.alpha)
+
+    @property
+    def count(self) -> int:
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, value: float) -> None:
+        if value <= 0.0:
+            self.zeros += 1
+            return
+        i = math.ceil(math.log(value) / math.log(self._gamma))
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+    def extend(self, values: Iterable[float]) -> None:
+        for v in values:
+            self.add(float(v))
+
+    def merge(self, other: CostSketch) -> None:
+        if other.alpha != self.alpha:
+            raise ValueError(f"Cannot merge sketches with alpha {self.alpha} and {other.alpha}")
+        self.zeros += other.zeros
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+
+    def quantile(self, q: float) -> float:
+        n = self.count
+        if n == 0:
+            return float("nan")
+        rank = q * (n - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        gamma = self._gamma
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if rank < seen:
+                return 2.0 * gamma**i / (gamma + 1.0)
+        return 2.0 * gamma ** max(self.buckets) / (gamma + 1.0)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"alpha": self.alpha, "zeros": self.zeros, "buckets": {str(k): v for k, v in sorted(self.buckets.items())}},
+            separators=(",", ":"),
+        )
+
+    @staticmethod
+    def from_json(raw: str) -> CostSketch:
+        d = json.loads(raw)
+        return CostSketch(
+            alpha=float(d["alpha"]),
+            zeros=int(d["zeros"]),
+            buckets={int(k): int(v) for k, v in d["buckets"].items()},
+        )
+
+
+class RunCatalog:
+    """
+    SQLite index of runs across out dirs: run metadata, summary metrics
+    (one indexed row per metric), a cost sketch per run and registered stats
+    groups. Writers upsert by run_id, so re-registering a run is idempotent.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path else default_catalog_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path, timeout=30)
+        self.con.row_factory = sqlite3.Row
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.con.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # --- writers ---
+    def register_run(self, out_dir: str, df: pd.DataFrame | None = None) -> str:
+        """
+        Register the simulate run in `out_dir` (run.json, summary.csv and the
+        cost distribution, from `df` when given). Returns its run_id.
+        """
+        import pandas as pd  # only writers need it; queries stay light
+
+        out = Path(out_dir)
+        meta = json.loads((out / "run.json").read_text(encoding="utf-8"))
+        summary = pd.read_csv(out / "summary.csv").iloc[0].to_dict()
+        if df is None:
+            df = pd.read_csv(out / "cost_distribution.csv")
+        ledger_mode = None
+        if (out / "ledger_index.json").exists():
+            ledger_mode = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))["ledger"]["mode"]
+
+        sketch = CostSketch()
+        sketch.extend(df["total_cost_eur"].tolist())
+        created = datetime.fromtimestamp((out / "run.json").stat().st_mtime, UTC).isoformat(timespec="seconds")
+        run_id = str(meta["run_id"])
+
+        with self.con:
+            self.con.execute(
+                """
+                INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id) DO UPDATE SET
+                    out_dir = excluded.out_dir, registered_at = excluded.registered_at
+                """,
+                (
+                    run_id,
+                    str(meta["config_hash"]),
+                    int(meta["seed"]),
+                    int(meta["iterations"]),
+                    str(meta["audit"]),
+                    ledger_mode,
+                    str(out.resolve()),
+                    created,
+                    _now(),
+                ),
+            )
+            self.con.executemany(
+                "INSERT OR REPLACE INTO run_metrics VALUES (?, ?, ?)",
+                [(run_id, m, float(summary[m])) for m in SUMMARY_METRICS if m in summary],
+            )
+            self.con.execute(
+                "INSERT OR REPLACE INTO sketches VALUES (?, ?, ?)",
+                (run_id, "total_cost_eur", sketch.to_json()),
+            )
+        return run_id
+
+    def register_stats(self, out_dir: str, stats: dict[str, Any], query: str = "default") -> str:
+        """
+        Register the groups of one stats result computed over the run in
+        `out_dir` (replacing an earlier registration of the same query).
+        """
+        run_id = str(json.loads((Path(out_dir) / "run.json").read_text(encoding="utf-8"))["run_id"])
+        now = _now()
+        with self.con:
+            self.con.execute("DELETE FROM stats_groups WHERE run_id = ? AND query = ?", (run_id, query))
+            self.con.executemany(
+                "INSERT INTO stats_groups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        query,
+                        str(stats.get("by", "")),
+                        label,
+                        float(g["rows"]),
+                        g.get("mean_total_cost_eur"),
+                        g.get("p50_total_cost_eur"),
+                        g.get("p95_total_cost_eur"),
+                        g.get("p99_total_cost_eur"),
+                        g.get("sum_total_cost_eur"),
+                        now,
+                    )
+                    for label, g in stats["groups"].items()
+                ],
+            )
+        return run_id
+
+    # --- queries ---
+    def list_runs(
+        self,
+        config_hash: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        metric: str | None = None,
+        min_value: float | None = None,
+        max_value: float | None = None,
+        limit: int = 50,
+    ) -> list[dict[str, Any]]:
+        """
+        Runs newest first, filtered by config hash, created_at range (ISO
+        dates/timestamps) and a range on one summary metric.
+        """
+        sql = ["SELECT r.* FROM runs r"]
+        where: list[str] = []
+        args: list[Any] = []
+        if metric is not None:
+            if metric not in SUMMARY_METRICS:
+                raise ValueError(f"Invalid metric: {metric} ({'|'.join(SUMMARY_METRICS)})")
+            sql.append("JOIN run_metrics m ON m.run_id = r.run_id AND m.metric = ?")
+            args.append(metric)
+            if min_value is not None:
+                where.append("m.value >= ?")
+                args.append(min_value)
+            if max_value is not None:
+                where.append("m.value <= ?")
+                args.append(max_value)
+        if config_hash:
+            where.append("r.config_hash = ?")
+            args.append(config_hash)
+        if since:
+            where.append("r.created_at >= ?")
+            args.append(since)
+        if until:
+            where.append("r.created_at < ?")
+            args.append(until)
+        if where:
+            sql.append("WHERE " + " AND ".join(where))
+        sql.append("ORDER BY r.created_at DESC, r.run_id LIMIT ?")
+        args.append(limit)
+
+        runs = [dict(r) for r in self.con.execute(" ".join(sql), args)]
+        metrics = self._metrics([r["run_id"] for r in runs])
+        for r in runs:
+            r.update(metrics.get(r["run_id"], {}))
+        return runs
+
+    def _metrics(self, run_ids: Sequence[str]) -> dict[str, dict[str, float]]:
+        out: dict[str, dict[str, float]] = {}
+        if not run_ids:
+            return out
+        marks = ",".join("?" * len(run_ids))
+        for row in self.con.execute(f"SELECT * FROM run_metrics WHERE run_id IN ({marks})", list(run_ids)):
+            out.setdefault(row["run_id"], {})[row["metric"]] = row["value"]
+        return out
+
+    def resolve(self, prefix: str) -> str:
+        """
+        Full run_id for a unique run_id prefix.
+        """
+        rows = self.con.execute(
+            "SELECT run_id FROM runs WHERE run_id >= ? AND run_id < ? LIMIT 2", (prefix, prefix + "\uffff")
+        ).fetchall()
+        if not rows:
+            raise ValueError(f"Unknown run: {prefix}")
+        if len(rows) > 1:
+            raise ValueError(f"Ambiguous run prefix: {prefix}")
+        return str(rows[0]["run_id"])
+
+    def sketch(self, run_ids: Sequence[str], column: str = "total_cost_eur") -> CostSketch:
+        """
+        Merged sketch of `column` over the given runs.
+        """
+        merged = CostSketch()
+        marks = ",".join("?" * len(run_ids))
+        for row in self.con.execute(
+            f"SELECT sketch FROM sketches WHERE column = ? AND run_id IN ({marks})", [column, *run_ids]
+        ):
+            merged.merge(CostSketch.from_json(row["sketch"]))
+        return merged
+
+    def compare(self, run_ids: Sequence[str]) -> dict[str, Any]:
+        """
+        Side-by-side summary metrics, sketch quantiles and registered stats
+        groups for the given runs (prefixes allowed). Deltas are against the
+        first run.
+        """
+        if not run_ids:
+            raise ValueError("compare needs at least one run")
+        ids = [self.resolve(r) for r in run_ids]
+        metrics = self._metrics(ids)
+        runs: list[dict[str, Any]] = []
+        for rid in ids:
+            row = dict(self.con.execute("SELECT * FROM runs WHERE run_id = ?", (rid,)).fetchone())
+            sk = self.sketch([rid])
+            row["metrics"] = metrics.get(rid, {})
+            row["sketch_p50"] = sk.quantile(0.50)
+            row["sketch_p99"] = sk.quantile(0.99)
+            runs.append(row)
+
+        base = runs[0]["metrics"]
+        for r in runs:
+            r["delta"] = {m: v - base[m] for m, v in r["metrics"].items() if m in base}
+
+        groups: dict[str, dict[str, float | None]] = {}
+        marks = ",".join("?" * len(ids))
+        for row in self.con.execute(
+            f"SELECT run_id, query, grp, p95_total_cost_eur FROM stats_groups WHERE run_id IN ({marks})", ids
+        ):
+            key = f"{row['query']}:{row['grp']}"
+            groups.setdefault(key, {rid: None for rid in ids})[row["run_id"]] = row["p95_total_cost_eur"]
+
+        return {"runs": runs, "groups_p95": groups}
+
@@ -1,16 +1,46 @@
 from __future__ import annotations
 
+import csv
+import hashlib
+import io
 import json
+import math
+import os
+import re
+from collections.abc import Callable
 from dataclasses import dataclass
+from functools import cached_property
+from html import escape
 from pathlib import Path
+from typing import Any
 
-import pandas as pd
+from pie.application.svgcharts import bar_chart_svg, histogram_svg
+from pie.infrastructure.io.store import ArtifactStore, sync_dir
+
+CHART_BACKENDS = ("svg", "matplotlib")
+MANIFEST_NAME = "manifest.json"
+# <name>.<12 hex>.<ext>: content-hashed chart and table files.
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[A-Za-z0-9]+$")
+
+# Bump when rendering changes, so every fragment is rebuilt once.
+DASHBOARD_VERSION = 3
+
+# Input files of the dashboard (cost_distribution.csv is optional).
+DASHBOARD_INPUTS = (
+    "run.json",
+    "summary.csv",
+    "stats.json",
+    "stats_groups.csv",
+    "stats_top_passengers.csv",
+    "cost_distribution.csv",
+)
 
 
 @dataclass(frozen=True)
 class DashboardPaths:
     index_html: Path
     assets_dir: Path
+    rebuilt: tuple[str, ...] = ()
 
 
 def _safe_read_json(path: Path) -> dict:
@@ -24,9 +54,8 @@ def _require(path: Path, msg: str) -> None:
         raise FileNotFoundError(f"{msg}: {path}")
 
 
-def _write_html(out_html: Path, title: str, body: str) -> None:
-    out_html.write_text(
-        f"""<!doctype html>
+def _page_html(title: str, body: str) -> str:
+    return f"""<!doctype html>
 <html lang="en">
 <head>
 <meta charset="utf-8"/>
@@ -109,7 +138,7 @@ def _write_html(out_html: Path, title: str, body: str) -> None:
     border: 1px solid rgba(106,166,255,.25);
     font-size: 12px;
   }}
-  img {{
+  img, svg {{
     max-width: 100%;
     border-radius: 10px;
     border: 1px solid var(--line);
@@ -134,39 +163,135 @@ def _write_html(out_html: Path, title: str, body: str) -> None:
 </div>
 </body>
 </html>
-""",
-        encoding="utf-8",
-    )
+"""
+
 
+def build_dashboard(
+    out_dir: str,
+    top: int = 20,
+    charts: str = "svg",
+    page_size: int = 25,
+    store: ArtifactStore | None = None,
+) -> DashboardPaths:
+    """
+    Build out/dashboard/index.html from run.json, summary.csv and the stats
+    artifacts. charts="svg" uses the built-in renderer; charts="matplotlib"
+    draws PNGs instead (needs matplotlib).
+
+    Builds are incremental: every chart and table fragment is keyed by a
+    hash of the inputs it reads (plus top/backend), recorded in
+    out/dashboard/manifest.json, and only rebuilt when that key changes.
+    Chart files are named by content hash (assets/<name>.<hash>.<ext>) so
+    browsers can cache them forever. An unchanged cycle renders nothing.
+
+    Tables are not inlined: their rows go to compact data/<name>.<hash>.json
+    files that a small script fetches when the table scrolls into view and
+    pages/sorts client-side (`page_size` rows per page), so index.html stays
+    small whatever --top and the grouping produce.
+
+    With a `store`, the dashboard is mirrored to its dashboard/ prefix:
+    content-hashed files only when missing, index.html last, files of
+    earlier builds removed.
+    """
+    paths = _build_dashboard(out_dir, top, charts, page_size)
+    if store is not None:
+        sync_dir(paths.index_html.parent, store, "dashboard/", immutable=is_hashed_name, skip=(MANIFEST_NAME,))
+    return paths
+
+
+def is_hashed_name(rel: str) -> bool:
+    """
+    True for assets/ and data/ files named by content hash (never rewritten).
+    """
+    return rel.startswith(("assets/", "data/")) and _HASHED_NAME.search(rel) is not None
+
+
+def _build_dashboard(out_dir: str, top: int, charts: str, page_size: int) -> DashboardPaths:
+    charts = charts.strip().lower()
+    if charts not in CHART_BACKENDS:
+        raise ValueError(f"Invalid charts backend: {charts} ({'|'.join(CHART_BACKENDS)})")
+    if page_size <= 0:
+        raise ValueError("page_size must be > 0")
 
-def build_dashboard(out_dir: str, top: int = 20) -> DashboardPaths:
     out = Path(out_dir)
     dash = out / "dashboard"
     assets = dash / "assets"
-    assets.mkdir(parents=True, exist_ok=True)
-
-    run_json = out / "run.json"
-    stats_json = out / "stats.json"
-    groups_csv = out / "stats_groups.csv"
-    top_csv = out / "stats_top_passengers.csv"
 
-    _require(run_json, "Missing run metadata. Run simulate first")
-    _require(stats_json, "Missing stats.json. Run: pie stats")
-    _require(groups_csv, "Missing stats_groups.csv. Run: pie stats")
-    _require(top_csv, "Missing stats_top_passengers.csv. Run: pie stats")
+    _require(out / "run.json", "Missing run metadata. Run simulate first")
+    _require(out / "stats.json", "Missing stats.json. Run: pie stats")
+    _require(out / "stats_groups.csv", "Missing stats_groups.csv. Run: pie stats")
+    _require(out / "stats_top_passengers.csv", "Missing stats_top_passengers.csv. Run: pie stats")
 
-    run = _safe_read_json(run_json)
-    stats = _safe_read_json(stats_json)
+    manifest_path = dash / MANIFEST_NAME
+    old = _safe_read_json(manifest_path)
+    if old.get("version") != DASHBOARD_VERSION:
+        old = {}
+    inputs = {name: _input_digest(out / name, old.get("inputs", {}).get(name)) for name in DASHBOARD_INPUTS}
+    params = {"version": DASHBOARD_VERSION, "top": top, "charts": charts, "page_size": page_size}
 
-    groups = pd.read_csv(groups_csv)
-    top_df = pd.read_csv(top_csv).head(top)
+    def key(*deps: str) -> str:
+        return _hash_obj([params, [inputs[d]["sha256"] if inputs[d] else None for d in deps]])
 
-    # Make charts (matplotlib optional; we import only when used)
-    chart_paths = _make_charts(assets, groups, top_df)
+    index = dash / "index.html"
+    page_key = key(*DASHBOARD_INPUTS)
+    if old.get("page_key") == page_key and index.exists() and _assets_present(dash, old):
+        if inputs != old["inputs"]:  # touched but unchanged: remember the new mtimes
+            _write_atomic(manifest_path, (json.dumps({**old, "inputs": inputs}, indent=2) + "\n").encode("utf-8"))
+        return DashboardPaths(index_html=index, assets_dir=assets)
 
-    # Render tables
-    groups_html = _df_to_html(groups)
-    top_html = _df_to_html(top_df)
+    assets.mkdir(parents=True, exist_ok=True)
+    data = _DashboardData(out, top)
+    rebuilt: list[str] = []
+    old_fragments: dict[str, Any] = old.get("fragments", {})
+    fragments: dict[str, dict[str, Any]] = {}
+
+    # --- charts ---
+    ext = "svg" if charts == "svg" else "png"
+    for name, (deps, build) in _CHARTS.items():
+        k = key(*deps)
+        prev = old_fragments.get(name)
+        if prev and prev["key"] == k and (prev["file"] is None or (dash / prev["file"]).exists()):
+            fragments[name] = prev
+            continue
+        spec = build(data)
+        rel = None
+        if spec is not None:
+            content = _render_chart(spec, charts)
+            rel = f"assets/{name}.{hashlib.sha256(content).hexdigest()[:12]}.{ext}"
+            _write_atomic(dash / rel, content)
+        fragments[name] = {"key": k, "file": rel, "alt": _CHART_ALTS[name]}
+        rebuilt.append(name)
+
+    # --- tables ---
+    for name, (deps, render) in _TABLES.items():
+        k = key(*deps)
+        prev = old_fragments.get(name)
+        if prev and prev["key"] == k and (dash / prev["file"]).exists():
+            fragments[name] = prev
+            continue
+        content = render(data)
+        rel = f"data/{name}.{hashlib.sha256(content).hexdigest()[:12]}.json"
+        _write_atomic(dash / rel, content)
+        fragments[name] = {"key": k, "file": rel}
+        rebuilt.append(name)
+
+    # --- table script (depends on nothing but the renderer version) ---
+    js = _TABLE_JS.encode("utf-8")
+    script = f"assets/table.{hashlib.sha256(js).hexdigest()[:12]}.js"
+    if not (dash / script).exists():
+        _write_atomic(dash / script, js)
+        rebuilt.append("table_js")
+    fragments["table_js"] = {"key": key(), "file": script}
+
+    # --- page ---
+    run = data.run
+    stats = data.stats
+    chart_html = {
+        name: _img(f["file"], f["alt"]) if f["file"] else _no_chart(f["alt"])
+        for name, f in fragments.items()
+        if name in _CHARTS
+    }
+    table_html = {name: _table_mount(fragments[name]["file"], page_size) for name in _TABLES}
 
     # KPIs
     mean_total = run.get("mean_total_cost", None)
@@ -176,6 +301,7 @@ def build_dashboard(out_dir: str, top: int = 20) -> DashboardPaths:
 
     by = stats.get("by", "unknown")
     metric = stats.get("metric", "unknown")
+    distribution = "" if fragments["distribution"]["file"] is None else chart_html["distribution"]
 
     body = f"""
 <h1>Passenger Impact Engine — Dashboard</h1>
@@ -193,31 +319,39 @@ def build_dashboard(out_dir: str, top: int = 20) -> DashboardPaths:
   <div class="card span-12">
     <h3 style="margin:0 0 10px;">Charts</h3>
     <div class="grid">
-      <div class="span-6">{_img(chart_paths.get("mean_by_group"), "Mean cost by group")}</div>
-      <div class="span-6">{_img(chart_paths.get("p95_by_group"), "P95 cost by group")}</div>
-      <div class="span-12">{_img(chart_paths.get("top_passengers"), "Top passengers by score")}</div>
-      <div class="span-12">{_img(chart_paths.get("components"), "Cost components (sum)")}</div>
+      <div class="span-6">{chart_html["mean_by_group"]}</div>
+      <div class="span-6">{chart_html["p95_by_group"]}</div>
+      <div class="span-12">{chart_html["top_passengers"]}</div>
+      <div class="span-12">{chart_html["components"]}</div>
+      <div class="span-12">{distribution}</div>
     </div>
   </div>
 
   <div class="card span-12">
     <h3 style="margin:0 0 10px;">Group statistics</h3>
     <div class="muted" style="margin-bottom:10px;">Source: stats_groups.csv</div>
-    {groups_html}
+    {table_html["groups_table"]}
   </div>
 
   <div class="card span-12">
     <h3 style="margin:0 0 10px;">Top passengers</h3>
     <div class="muted" style="margin-bottom:10px;">Source: stats_top_passengers.csv</div>
-    {top_html}
+    {table_html["top_table"]}
   </div>
 </div>
+<script src="{script}" defer></script>
 """
 
-    index = dash / "index.html"
-    _write_html(index, "PIE Dashboard", body)
+    html = _page_html("PIE Dashboard", body).encode("utf-8")
+    if not index.exists() or index.read_bytes() != html:
+        _write_atomic(index, html)
+        rebuilt.append("index")
+
+    manifest = {"version": DASHBOARD_VERSION, "page_key": page_key, "inputs": inputs, "fragments": fragments}
+    _write_atomic(manifest_path, (json.dumps(manifest, indent=2) + "\n").encode("utf-8"))
+    _prune(dash, {f["file"] for f in fragments.values() if f["file"]})
 
-    return DashboardPaths(index_html=index, assets_dir=assets)
+    return DashboardPaths(index_html=index, assets_dir=assets, rebuilt=tuple(rebuilt))
 
 
 def _fmt(x) -> str:
@@ -229,109 +363,320 @@ def _fmt(x) -> str:
         return "—"
 
 
-def _df_to_html(df: pd.DataFrame) -> str:
-    # make it compact & readable
-    return df.to_html(index=False, escape=True)
+# --------------------------------------------------------------------------------------
+# Inputs, hashing, files
+# --------------------------------------------------------------------------------------
+def _input_digest(path: Path, prev: dict[str, Any] | None) -> dict[str, Any] | None:
+    """
+    {size, mtime_ns, sha256} of an input file; the previous digest is reused
+    when size and mtime are unchanged, so a no-op build reads no inputs.
+    """
+    if not path.exists():
+        return None
+    st = path.stat()
+    if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+        return prev
+    h = hashlib.sha256(path.read_bytes()).hexdigest()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h}
+
+
+def _hash_obj(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _assets_present(dash: Path, manifest: dict[str, Any]) -> bool:
+    files = [f["file"] for f in manifest.get("fragments", {}).values() if f["file"]]
+    return bool(files) and all((dash / f).exists() for f in files)
+
 
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def _prune(dash: Path, live: set[str]) -> None:
+    """
+    Remove chart/fragment files of earlier builds that the manifest no longer references.
+    """
+    for sub in ("assets", "data"):
+        d = dash / sub
+        if not d.is_dir():
+            continue
+        for p in d.iterdir():
+            if p.is_file() and f"{sub}/{p.name}" not in live:
+                p.unlink()
+
+
+def _read_csv(path: Path) -> list[dict[str, str]]:
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
 
-def _img(path: Path | None, alt: str) -> str:
-    if path is None:
-        return f"<div class='muted'>No chart: {alt}</div>"
-    rel = f"assets/{path.name}"
+
+def _floats(rows: list[dict[str, str]], column: str) -> list[float]:
+    return [float(r[column]) for r in rows]
+
+
+class _DashboardData:
+    """
+    Lazily loaded inputs: only fragments being rebuilt read their files.
+    """
+
+    def __init__(self, out: Path, top: int) -> None:
+        self.out = out
+        self.top = top
+
+    @cached_property
+    def run(self) -> dict[str, Any]:
+        run = _safe_read_json(self.out / "run.json")
+        summary = _read_csv(self.out / "summary.csv")
+        if summary:
+            run.update(summary[0])
+        return run
+
+    @cached_property
+    def stats(self) -> dict[str, Any]:
+        return _safe_read_json(self.out / "stats.json")
+
+    @cached_property
+    def groups(self) -> list[dict[str, str]]:
+        return _read_csv(self.out / "stats_groups.csv")
+
+    @cached_property
+    def top_rows(self) -> list[dict[str, str]]:
+        return _read_csv(self.out / "stats_top_passengers.csv")[: self.top]
+
+    @cached_property
+    def totals(self) -> list[float]:
+        return [float(r["total_cost_eur"]) for r in _read_csv(self.out / "cost_distribution.csv")]
+
+
+# --------------------------------------------------------------------------------------
+# Fragments
+# --------------------------------------------------------------------------------------
+@dataclass(frozen=True)
+class _ChartSpec:
+    kind: str  # bar | hist
+    title: str
+    xlabel: str
+    ylabel: str
+    values: list[float]
+    labels: list[str] | None = None
+    rotate: bool = False
+
+
+_COMPONENTS = [
+    ("sum_cash_comp_eur", "Cash"),
+    ("sum_care_cost_eur", "Care"),
+    ("sum_refund_cost_eur", "Refund"),
+    ("sum_rebooking_cost_eur", "Rebook"),
+]
+
+
+def _group_bar(column: str, title: str, ylabel: str) -> Callable[[_DashboardData], _ChartSpec | None]:
+    def build(d: _DashboardData) -> _ChartSpec | None:
+        if not d.groups or "group" not in d.groups[0] or column not in d.groups[0]:
+            return None
+        labels = [r["group"] for r in d.groups]
+        return _ChartSpec("bar", title, "Group", ylabel, _floats(d.groups, column), labels)
+
+    return build
+
+
+def _top_passengers_chart(d: _DashboardData) -> _ChartSpec | None:
+    if not d.top_rows or "passenger_id" not in d.top_rows[0] or "score" not in d.top_rows[0]:
+        return None
+    labels = [r["passenger_id"] for r in d.top_rows]
+    return _ChartSpec("bar", "Top passengers by score", "Passenger", "Score", _floats(d.top_rows, "score"), labels, True)
+
+
+def _components_chart(d: _DashboardData) -> _ChartSpec | None:
+    if not d.groups or not all(c in d.groups[0] for c, _ in _COMPONENTS):
+        return None
+    vals = [sum(_floats(d.groups, c)) for c, _ in _COMPONENTS]
+    labels = [name for _, name in _COMPONENTS]
+    return _ChartSpec("bar", "Total cost components (sum over groups)", "", "EUR", vals, labels)
+
+
+def _distribution_chart(d: _DashboardData) -> _ChartSpec | None:
+    if not d.totals:
+        return None
+    return _ChartSpec("hist", "Total cost per iteration", "Total cost (EUR)", "Count", d.totals)
+
+
+# name -> (input files read, builder)
+_CHARTS: dict[str, tuple[tuple[str, ...], Callable[[_DashboardData], _ChartSpec | None]]] = {
+    "mean_by_group": (
+        ("stats_groups.csv",),
+        _group_bar("mean_total_cost_eur", "Mean total cost by group", "Mean total cost (EUR)"),
+    ),
+    "p95_by_group": (
+        ("stats_groups.csv",),
+        _group_bar("p95_total_cost_eur", "P95 total cost by group", "P95 total cost (EUR)"),
+    ),
+    "top_passengers": (("stats_top_passengers.csv",), _top_passengers_chart),
+    "components": (("stats_groups.csv",), _components_chart),
+    "distribution": (("cost_distribution.csv",), _distribution_chart),
+}
+
+_CHART_ALTS = {
+    "mean_by_group": "Mean cost by group",
+    "p95_by_group": "P95 cost by group",
+    "top_passengers": "Top passengers by score",
+    "components": "Cost components (sum)",
+    "distribution": "Total cost per iteration",
+}
+
+_TABLES: dict[str, tuple[tuple[str, ...], Callable[[_DashboardData], bytes]]] = {
+    "groups_table": (("stats_groups.csv",), lambda d: _rows_to_json(d.groups)),
+    "top_table": (("stats_top_passengers.csv",), lambda d: _rows_to_json(d.top_rows)),
+}
+
+
+def _cell(v: str | None) -> str | float | None:
+    if v is None or v == "":
+        return None
+    try:
+        x = float(v)
+    except ValueError:
+        return v
+    return x if math.isfinite(x) else v
+
+
+def _rows_to_json(rows: list[dict[str, str]]) -> bytes:
+    """
+    {"columns": [...], "rows": [[...], ...]} with numeric cells as numbers
+    (so the client sorts them numerically).
+    """
+    cols = list(rows[0].keys()) if rows else []
+    data = {"columns": cols, "rows": [[_cell(r[c]) for c in cols] for r in rows]}
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _table_mount(rel: str, page_size: int) -> str:
+    return (
+        f"<div class='pie-table' data-src='{escape(rel)}' data-page-size='{page_size}'>"
+        "<div class='muted'>Loading…</div></div>"
+    )
+
+
+def _no_chart(alt: str) -> str:
+    return f"<div class='muted'>No chart: {alt}</div>"
+
+
+def _img(rel: str, alt: str) -> str:
     return f"<img src='{rel}' alt='{alt}'/>"
 
 
-def _make_charts(assets: Path, groups: pd.DataFrame, top_df: pd.DataFrame) -> dict[str, Path]:
+def _render_chart(spec: _ChartSpec, backend: str) -> bytes:
+    if backend == "svg":
+        if spec.kind == "hist":
+            return histogram_svg(spec.values, spec.title, spec.xlabel).encode("utf-8")
+        assert spec.labels is not None
+        svg = bar_chart_svg(spec.labels, spec.values, spec.title, spec.xlabel, spec.ylabel, spec.rotate)
+        return svg.encode("utf-8")
+    return _render_png(spec)
+
+
+def _render_png(spec: _ChartSpec) -> bytes:
+    import matplotlib
+
+    matplotlib.use("Agg")
     import matplotlib.pyplot as plt
 
-    out: dict[str, Path] = {}
-
-    # Mean by group
-    if "group" in groups.columns and "mean_total_cost_eur" in groups.columns:
-        p = assets / "mean_by_group.png"
-        _bar(
-            x=groups["group"].astype(str),
-            y=groups["mean_total_cost_eur"].astype(float),
-            title="Mean total cost by group",
-            xlabel="Group",
-            ylabel="Mean total cost (EUR)",
-            out_path=p,
-            plt=plt,
-        )
-        out["mean_by_group"] = p
-
-    # P95 by group
-    if "group" in groups.columns and "p95_total_cost_eur" in groups.columns:
-        p = assets / "p95_by_group.png"
-        _bar(
-            x=groups["group"].astype(str),
-            y=groups["p95_total_cost_eur"].astype(float),
-            title="P95 total cost by group",
-            xlabel="Group",
-            ylabel="P95 total cost (EUR)",
-            out_path=p,
-            plt=plt,
-        )
-        out["p95_by_group"] = p
-
-    # Top passengers by score
-    if "passenger_id" in top_df.columns and "score" in top_df.columns:
-        p = assets / "top_passengers.png"
-        _bar(
-            x=top_df["passenger_id"].astype(str),
-            y=top_df["score"].astype(float),
-            title="Top passengers by score",
-            xlabel="Passenger",
-            ylabel="Score",
-            out_path=p,
-            plt=plt,
-            rotate_xticks=True,
-        )
-        out["top_passengers"] = p
-
-    # Components (sum) - from groups table
-    comp_cols = [
-        ("sum_cash_comp_eur", "Cash"),
-        ("sum_care_cost_eur", "Care"),
-        ("sum_refund_cost_eur", "Refund"),
-        ("sum_rebooking_cost_eur", "Rebook"),
-    ]
-    if all(c in groups.columns for c, _ in comp_cols):
-        p = assets / "components.png"
-        vals = [float(groups[c].sum()) for c, _ in comp_cols]
-        labels = [name for _, name in comp_cols]
-
-        plt.figure()
-        plt.bar(labels, vals)
-        plt.title("Total cost components (sum over groups)")
-        plt.ylabel("EUR")
-        plt.tight_layout()
-        plt.savefig(p, dpi=140)
-        plt.close()
-
-        out["components"] = p
-
-    return out
-
-
-def _bar(
-    *,
-    x,
-    y,
-    title: str,
-    xlabel: str,
-    ylabel: str,
-    out_path: Path,
-    plt,
-    rotate_xticks: bool = False,
-) -> None:
     plt.figure()
-    plt.bar(x, y)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    if rotate_xticks:
+    if spec.kind == "hist":
+        plt.hist(spec.values, bins=30)
+    else:
+        plt.bar(spec.labels, spec.values)
+    plt.title(spec.title)
+    plt.xlabel(spec.xlabel)
+    plt.ylabel(spec.ylabel)
+    if spec.rotate:
         plt.xticks(rotation=45, ha="right")
     plt.tight_layout()
-    plt.savefig(out_path, dpi=140)
+    buf = io.BytesIO()
+    plt.savefig(buf, format="png", dpi=140)
     plt.close()
+    return buf.getvalue()
+
+
+# Client-side table: fetched when scrolled into view, sorted by header click,
+# paginated with prev/next. Only the visible page is ever in the DOM.
+_TABLE_JS = """(function () {
+  function esc(s) {
+    return s.replace(/[&<>"']/g, function (c) {
+      return { "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" }[c];
+    });
+  }
+  function fmt(v) {
+    if (v === null || v === undefined) return "";
+    if (typeof v === "number") return Number.isInteger(v) ? String(v) : v.toFixed(2);
+    return String(v);
+  }
+  function cmp(a, b) {
+    if (a === b) return 0;
+    if (a === null) return 1;
+    if (b === null) return -1;
+    if (typeof a === "number" && typeof b === "number") return a - b;
+    return String(a).localeCompare(String(b));
+  }
+  function mount(el, data) {
+    var size = Number(el.dataset.pageSize) || 25, page = 0, col = -1, dir = 1;
+    var rows = data.rows.slice();
+    var table = document.createElement("table"), nav = document.createElement("div");
+    nav.className = "muted pager";
+    el.textContent = "";
+    el.appendChild(table);
+    el.appendChild(nav);
+    function render() {
+      var pages = Math.max(1, Math.ceil(rows.length / size));
+      page = Math.min(Math.max(0, page), pages - 1);
+      var head = data.columns.map(function (c, i) {
+        var mark = i === col ? (dir > 0 ? " \u25b2" : " \u25bc") : "";
+        return "<th data-i='" + i + "' style='cursor:pointer'>" + esc(c) + mark + "</th>";
+      }).join("");
+      var body = rows.slice(page * size, (page + 1) * size).map(function (r) {
+        return "<tr>" + r.map(function (v) { return "<td>" + esc(fmt(v)) + "</td>"; }).join("") + "</tr>";
+      }).join("");
+      table.innerHTML = "<thead><tr>" + head + "</tr></thead><tbody>" + body + "</tbody>";
+      nav.innerHTML = "<button data-step='-1'>&lsaquo; Prev</button> Page " + (page + 1) + " / " + pages +
+        " (" + rows.length + " rows) <button data-step='1'>Next &rsaquo;</button>";
+    }
+    table.addEventListener("click", function (e) {
+      var th = e.target.closest("th");
+      if (!th) return;
+      var i = Number(th.dataset.i);
+      dir = i === col ? -dir : 1;
+      col = i;
+      rows.sort(function (a, b) { return dir * cmp(a[i], b[i]); });
+      page = 0;
+      render();
+    });
+    nav.addEventListener("click", function (e) {
+      var step = e.target.dataset && e.target.dataset.step;
+      if (step) { page += Number(step); render(); }
+    });
+    render();
+  }
+  function load(el) {
+    fetch(el.dataset.src)
+      .then(function (r) { if (!r.ok) throw new Error(r.status); return r.json(); })
+      .then(function (data) { mount(el, data); })
+      .catch(function () {
+        el.textContent = "Could not load " + el.dataset.src + " (serve the dashboard over HTTP, e.g. pie serve)";
+      });
+  }
+  var els = Array.prototype.slice.call(document.querySelectorAll(".pie-table"));
+  if (!("IntersectionObserver" in window)) { els.forEach(load); return; }
+  var io = new IntersectionObserver(function (entries) {
+    entries.forEach(function (e) {
+      if (e.isIntersecting) { io.unobserve(e.target); load(e.target); }
+    });
+  }, { rootMargin: "200px" });
+  els.forEach(function (el) { io.observe(el); });
+})();
+"""
@@ -1,15 +1,48 @@
 from __future__ import annotations
 
+import csv
 import gzip
+import heapq
 import json
+import shutil
+import tempfile
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from pathlib import Path
 
+from pie.infrastructure.io.ledger import resolve_ledger_dir
+from pie.infrastructure.io.store import ArtifactStore
 
-def merge_ledger(out_dir: str, out_name: str = "entitlements.csv.gz") -> Path:
+SORTED_NAME = "entitlements_by_passenger.csv.gz"
+SORTED_META_NAME = "entitlements_by_passenger.json"
+
+# Runs merged at once; more runs are first merged in passes to bound open files.
+_MAX_FAN_IN = 64
+
+
+def merge_ledger(
+    out_dir: str,
+    out_name: str = "entitlements.csv.gz",
+    sort_by: str = "none",
+    run_rows: int = 200_000,
+    store: ArtifactStore | None = None,
+) -> Path:
     """
     Merge all ledger chunk files into a single gzip CSV with exactly one header.
     Requires out/ledger_index.json.
+
+    sort_by="passenger" writes out/entitlements_by_passenger.csv.gz instead,
+    ordered by (passenger_id, iteration) with a bounded-memory external merge
+    sort: at most `run_rows` rows are held in memory at a time.
+
+    With a `store`, the merged file (and its sidecar) is uploaded too.
     """
+    sort_by = sort_by.strip().lower()
+    if sort_by not in {"none", "passenger"}:
+        raise ValueError(f"Invalid sort_by: {sort_by} (none|passenger)")
+    if run_rows <= 0:
+        raise ValueError("run_rows must be > 0")
+
     out = Path(out_dir)
     idx_path = out / "ledger_index.json"
     if not idx_path.exists():
@@ -17,18 +50,26 @@ def merge_ledger(out_dir: str, out_name: str = "entitlements.csv.gz") -> Path:
 
     idx = json.loads(idx_path.read_text(encoding="utf-8"))
     ledger = idx["ledger"]
-    ledger_dir = Path(ledger["dir"])
+    ledger_dir = resolve_ledger_dir(out, ledger)
     chunks = ledger["chunks"]
 
+    srcs = [ledger_dir / ch["file"] for ch in chunks]
+    for src in srcs:
+        if not src.exists():
+            raise FileNotFoundError(f"Missing chunk file: {src}")
+
+    if sort_by == "passenger":
+        target = _sort_by_passenger(out, idx, srcs, run_rows)
+        if store is not None:
+            store.put_file(target.name, target)
+            store.put_file(SORTED_META_NAME, out / SORTED_META_NAME)
+        return target
+
     target = out / out_name
 
     first = True
     with gzip.open(target, "wt", encoding="utf-8", newline="") as w:
-        for ch in chunks:
-            src = ledger_dir / ch["file"]
-            if not src.exists():
-                raise FileNotFoundError(f"Missing chunk file: {src}")
-
+        for src in srcs:
             with gzip.open(src, "rt", encoding="utf-8", newline="") as r:
                 header = r.readline()
                 if first:
@@ -38,4 +79,111 @@ def merge_ledger(out_dir: str, out_name: str = "entitlements.csv.gz") -> Path:
                 for line in r:
                     w.write(line)
 
+    if store is not None:
+        store.put_file(out_name, target)
+    return target
+
+
+def _iter_lines(paths: list[Path]) -> Iterator[str]:
+    for p in paths:
+        with gzip.open(p, "rt", encoding="utf-8", newline="") as r:
+            r.readline()
+            yield from r
+
+
+def _iter_run(path: Path) -> Iterator[str]:
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as r:
+        yield from r
+
+
+def _header_line(srcs: list[Path], fields: list[str]) -> str:
+    if srcs:
+        with gzip.open(srcs[0], "rt", encoding="utf-8", newline="") as r:
+            return r.readline()
+    return ",".join(fields) + "\r\n"
+
+
+def _sort_key(fields: list[str]) -> Callable[[str], tuple[str, int]]:
+    pid_col = fields.index("passenger_id")
+    it_col = fields.index("iteration")
+
+    def key(line: str) -> tuple[str, int]:
+        rec = next(csv.reader([line]))
+        return rec[pid_col], int(rec[it_col])
+
+    return key
+
+
+def _merge_runs(runs: list[Path], key: Callable[[str], tuple[str, int]], dst: Path) -> None:
+    with gzip.open(dst, "wt", encoding="utf-8", newline="", compresslevel=1) as w:
+        w.writelines(heapq.merge(*(_iter_run(r) for r in runs), key=key))
+    for r in runs:
+        r.unlink()
+
+
+@contextmanager
+def sorted_by_passenger(out: Path, fields: list[str], srcs: list[Path], run_rows: int) -> Iterator[Iterator[str]]:
+    """
+    The data lines of `srcs` ordered by (passenger_id, iteration), via a
+    bounded-memory external merge sort: at most `run_rows` lines are held in
+    memory, sorted runs spill to a temp dir under `out` that is removed on exit.
+    """
+    key = _sort_key(fields)
+    spill_dir = Path(tempfile.mkdtemp(prefix=".sort_", dir=out))
+    try:
+        # 1) sorted runs of at most run_rows lines each
+        runs: list[Path] = []
+        buf: list[str] = []
+
+        def spill() -> None:
+            buf.sort(key=key)
+            run = spill_dir / f"run_{len(runs):05d}.csv.gz"
+            with gzip.open(run, "wt", encoding="utf-8", newline="", compresslevel=1) as w:
+                w.writelines(buf)
+            runs.append(run)
+            buf.clear()
+
+        for line in _iter_lines(srcs):
+            buf.append(line)
+            if len(buf) >= run_rows:
+                spill()
+        if buf:
+            spill()
+
+        # 2) k-way merge of the runs (one buffered line per run in memory)
+        passes = 0
+        while len(runs) > _MAX_FAN_IN:
+            passes += 1
+            merged: list[Path] = []
+            for i in range(0, len(runs), _MAX_FAN_IN):
+                dst = spill_dir / f"pass{passes}_{len(merged):05d}.csv.gz"
+                _merge_runs(runs[i : i + _MAX_FAN_IN], key, dst)
+                merged.append(dst)
+            runs = merged
+
+        yield heapq.merge(*(_iter_run(r) for r in runs), key=key)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def _sort_by_passenger(out: Path, idx: dict, srcs: list[Path], run_rows: int) -> Path:
+    fields = list(idx["ledger"]["fields"])
+    target = out / SORTED_NAME
+    tmp_target = target.with_name(target.name + ".tmp")
+
+    rows = 0
+    with sorted_by_passenger(out, fields, srcs, run_rows) as lines, gzip.open(
+        tmp_target, "wt", encoding="utf-8", newline=""
+    ) as w:
+        w.write(_header_line(srcs, fields))
+        for line in lines:
+            w.write(line)
+            rows += 1
+
+    tmp_target.replace(target)
+    (out / SORTED_META_NAME).write_text(
+        json.dumps({"run_id": idx["run_id"], "sorted_by": ["passenger_id", "iteration"], "rows": rows}, indent=2)
+        + "\n",
+        encoding="utf-8",
+    )
     return target
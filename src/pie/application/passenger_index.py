@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import secrets
+import sqlite3
+from collections import Counter
+from pathlib import Path
+from typing import Any, Self
+
+from pie.application.merge_ledger import sorted_by_passenger
+from pie.infrastructure.io.ledger import (
+    BIN_HEADER_NAME,
+    read_block_lines,
+    read_ledger_index,
+    resolve_ledger_dir,
+)
+
+INDEX_NAME = "passenger_index.sqlite"
+# Passenger-clustered copy of the ledger the index points into:
+# out/passenger_ledger.<token>.csv.gz (the token changes with every build).
+CLUSTERED_PREFIX = "passenger_ledger."
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE blocks (
+    block_id INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE passenger_blocks (
+    passenger_id TEXT NOT NULL,
+    block_id INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (passenger_id, block_id)
+) WITHOUT ROWID;
+"""
+
+
+def _load_ledger(out: Path) -> tuple[dict[str, Any], Path]:
+    idx = read_ledger_index(out)
+    if idx is None:
+        raise FileNotFoundError(f"Missing: {out / 'ledger_index.json'} (run simulate with audit=ledger|both)")
+    return idx, resolve_ledger_dir(out, idx["ledger"])
+
+
+def build_passenger_index(out_dir: str, block_rows: int = 1024, run_rows: int = 200_000) -> Path:
+    """
+    Write out/passenger_index.sqlite over a passenger-clustered copy of the
+    ledger: rows ordered by (passenger_id, iteration) (bounded-memory external
+    sort) in independent gzip blocks of ~`block_rows` rows, so one passenger's
+    rows sit in a few consecutive blocks whatever the ledger mode.
+    index: passenger_id -> (block offset, block length, row count).
+    Both files are built under temp names and renamed, data file first, so
+    readers never see a partial index or an index over the wrong file.
+    """
+    if block_rows <= 0:
+        raise ValueError("block_rows must be > 0")
+    out = Path(out_dir)
+    idx, ledger_dir = _load_ledger(out)
+    fields = idx["ledger"]["fields"]
+    pid_col = fields.index("passenger_id")
+    srcs = [ledger_dir / ch["file"] for ch in idx["ledger"]["chunks"]]
+
+    data = out / f"{CLUSTERED_PREFIX}{secrets.token_hex(6)}.csv.gz"
+    tmp_data = data.with_name(data.name + ".tmp")
+    target = out / INDEX_NAME
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+
+    blocks: list[tuple[int, int, int, Counter[str]]] = []
+    with tmp_data.open("wb") as f, sorted_by_passenger(out, fields, srcs, run_rows) as lines:
+        f.write(gzip.compress((",".join(fields) + "\r\n").encode("utf-8")))
+        buf: list[str] = []
+
+        def flush() -> None:
+            counts = Counter(r[pid_col] for r in csv.reader(buf))
+            payload = gzip.compress("".join(buf).encode("utf-8"))
+            blocks.append((f.tell(), len(payload), len(buf), counts))
+            f.write(payload)
+            buf.clear()
+
+        for line in lines:
+            buf.append(line)
+            if len(buf) >= block_rows:
+                flush()
+        if buf:
+            flush()
+
+    con = sqlite3.connect(tmp)
+    try:
+        con.executescript(_SCHEMA)
+        con.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("run_id", str(idx["run_id"])), ("fields", ",".join(fields)), ("file", data.name)],
+        )
+        for block_id, (offset, length, rows, counts) in enumerate(blocks):
+            con.execute("INSERT INTO blocks VALUES (?, ?, ?, ?)", (block_id, offset, length, rows))
+            con.executemany(
+                "INSERT INTO passenger_blocks VALUES (?, ?, ?)",
+                [(pid, block_id, n) for pid, n in counts.items()],
+            )
+        con.commit()
+    finally:
+        con.close()
+
+    tmp_data.replace(data)
+    tmp.replace(target)
+    for old in out.glob(f"{CLUSTERED_PREFIX}*.csv.gz"):
+        if old != data:
+            old.unlink(missing_ok=True)
+    return target
+
+
+class PassengerIndex:
+    """
+    Reader for passenger_index.sqlite. Lookups touch only the blocks that
+    contain the passenger (a few, since the data is clustered by passenger);
+    each block is one seek + one gzip member.
+    """
+
+    def __init__(self, out_dir: str) -> None:
+        self.out = Path(out_dir)
+        path = self.out / INDEX_NAME
+        if not path.exists():
+            raise FileNotFoundError(f"Missing {path}. Run: pie index --out {out_dir}")
+
+        idx, _ = _load_ledger(self.out)
+        self._con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        meta = dict(self._con.execute("SELECT key, value FROM meta"))
+        if meta.get("run_id") != str(idx["run_id"]):
+            self._con.close()
+            raise ValueError(f"Stale {path}: built for run {meta.get('run_id')}, ledger is {idx['run_id']}")
+        self.fields = meta["fields"].split(",")
+        self.data = self.out / meta["file"]
+        self._pid_col = self.fields.index("passenger_id")
+
+    def close(self) -> None:
+        self._con.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def blocks(self, passenger_id: str) -> list[dict[str, Any]]:
+        cur = self._con.execute(
+            """
+            SELECT b.offset, b.length, pb.rows
+            FROM passenger_blocks pb JOIN blocks b ON b.block_id = pb.block_id
+            WHERE pb.passenger_id = ?
+            ORDER BY b.block_id
+            """,
+            (passenger_id,),
+        )
+        return [{"offset": o, "length": n, "rows": r} for o, n, r in cur.fetchall()]
+
+    def lookup(self, passenger_id: str, limit: int | None = None) -> list[dict[str, str]]:
+        """
+        The passenger's ledger rows in iteration order.
+        """
+        out: list[dict[str, str]] = []
+        needle = f",{passenger_id},"
+        for b in self.blocks(passenger_id):
+            lines = read_block_lines(self.data, b["offset"], b["length"])
+            # cheap substring test before paying for CSV parsing
+            for rec in csv.reader(line for line in lines if needle in line):
+                if rec[self._pid_col] == passenger_id:
+                    out.append(dict(zip(self.fields, rec, strict=True)))
+                    if limit is not None and len(out) >= limit:
+                        return out
+        return out
+
+
+def lookup_passenger(out_dir: str, passenger_id: str, limit: int | None = None) -> list[dict[str, str]]:
+    """
+    Uses passenger_index.sqlite when present, else a vectorized scan of the
+    memory-mapped ledger.bin.
+    """
+    out = Path(out_dir)
+    if not (out / INDEX_NAME).exists() and (out / BIN_HEADER_NAME).exists():
+        from pie.infrastructure.io.binledger import BinaryLedger  # numpy
+
+        bl = BinaryLedger(out)
+        recs = bl.records[bl.records["passenger"] == bl.passenger_code(passenger_id)]
+        return bl.to_rows(recs[:limit] if limit is not None else recs)
+    with PassengerIndex(out_dir) as pi:
+        return pi.lookup(passenger_id, limit=limit)
+
+
+def lookup_iteration(out_dir: str, iteration: int) -> list[dict[str, str]]:
+    """
+    Every ledger row of one iteration: a zero-copy slice of ledger.bin.
+    """
+    from pie.infrastructure.io.binledger import BinaryLedger  # numpy
+
+    bl = BinaryLedger(out_dir)
+    return bl.to_rows(bl.iteration(iteration))
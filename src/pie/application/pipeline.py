@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import shutil
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pie.application.dashboard import build_dashboard
+from pie.application.merge_ledger import merge_ledger
+from pie.application.run_cache import simulate_cached
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import (
+    StatsFeed,
+    StatsQuery,
+    compute_stats_multi,
+    write_stats_artifacts_v2,
+)
+
+PIPELINE_MANIFEST_NAME = "pipeline_manifest.json"
+
+
+@dataclass
+class PipelineOptions:
+    # simulate
+    audit: str = "ledger"
+    ledger_mode: str = "topk"
+    ledger_topk: int = 10
+    ledger_sample: float = 0.05
+    ledger_chunk_size: int = 100
+    ledger_block_rows: int = 10_000
+    ledger_binary: bool = False
+    run_cache: str = ""
+    # merge
+    merge: bool = True
+    # stats
+    query: StatsQuery = field(default_factory=StatsQuery)
+    sample_size: int = 5000
+    # dashboard
+    dashboard_top: int = 20
+    charts: str = "svg"
+    page_size: int = 25
+
+
+def _tree_bytes(paths: list[Path]) -> int:
+    total = 0
+    for p in paths:
+        if p.is_file():
+            total += p.stat().st_size
+        elif p.is_dir():
+            total += sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
+    return total
+
+
+def _ledger_rows(out: Path) -> int:
+    idx_path = out / "ledger_index.json"
+    if not idx_path.exists():
+        return 0
+    idx = json.loads(idx_path.read_text(encoding="utf-8"))
+    return sum(int(ch["rows_written"]) for ch in idx["ledger"]["chunks"])
+
+
+def _swap_into_place(new: Path, out: Path) -> None:
+    """
+    Publish the fully built `new` (a sibling of `out`) as `out`. `out` is a
+    symlink to the current tree, switched with a single os.replace: readers
+    resolve either the old or the new tree and `out` never disappears. The
+    old tree is deleted afterwards. A plain `out` directory (from before the
+    first pipeline run) is moved aside first, the one time `out` is briefly
+    missing.
+    """
+    old: Path | None = None
+    if out.is_symlink():
+        old = out.parent / os.readlink(out)
+    elif out.exists():
+        old = out.with_name(f".{out.name}.old-{secrets.token_hex(6)}")
+        out.rename(old)
+    link = out.with_name(f".{out.name}.link-{secrets.token_hex(6)}")
+    link.symlink_to(new.name, target_is_directory=True)
+    os.replace(link, out)
+    if old is not None and old.name != new.name:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def run_pipeline(config_path: str, out_dir: str, opts: PipelineOptions | None = None) -> dict[str, Any]:
+    """
+    simulate -> merge-ledger -> stats -> dashboard in one process, into a
+    new versioned sibling of `out_dir` that `out_dir` (a symlink) switches
+    to only once every stage succeeded. Stats are aggregated from ledger rows while they are written
+    (StatsFeed), so the stats stage reads no ledger chunks. Returns the
+    manifest written to out/pipeline_manifest.json (per-stage wall time,
+    rows and bytes) plus the in-memory df, summary and stats.
+    """
+    opts = opts or PipelineOptions()
+    opts.query.validate()
+    out = Path(out_dir)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.name}.{secrets.token_hex(6)}")
+
+    stages: list[dict[str, Any]] = []
+
+    def stage(name: str, fn: Callable[[], tuple[int, list[Path]]]) -> None:
+        t0 = time.perf_counter()
+        rows, produced = fn()
+        stages.append(
+            {
+                "stage": name,
+                "wall_s": round(time.perf_counter() - t0, 4),
+                "rows": int(rows),
+                "bytes": _tree_bytes(produced),
+            }
+        )
+
+    t_start = time.perf_counter()
+    feed = StatsFeed([opts.query], sample_size=opts.sample_size)
+    sim: dict[str, Any] = {}
+
+    def simulate() -> tuple[int, list[Path]]:
+        sim_opts = {
+            "audit": opts.audit,
+            "ledger_mode": opts.ledger_mode,
+            "ledger_topk": opts.ledger_topk,
+            "ledger_sample": opts.ledger_sample,
+            "ledger_chunk_size": opts.ledger_chunk_size,
+            "ledger_block_rows": opts.ledger_block_rows,
+            "ledger_binary": opts.ledger_binary,
+        }
+        if opts.run_cache:
+            # A cache hit restores files without writing rows: stats then read the chunks.
+            df, summary, hit = simulate_cached(config_path, str(tmp), opts.run_cache, **sim_opts)
+            sim["cache_hit"] = hit
+        else:
+            df, summary = run_monte_carlo(
+                config_path=config_path,
+                out_dir=str(tmp),
+                on_ledger_row=feed.row,
+                on_ledger_chunk=feed.chunk,
+                **sim_opts,
+            )
+        sim["df"], sim["summary"] = df, summary
+        return _ledger_rows(tmp) or len(df), [tmp]
+
+    def merge() -> tuple[int, list[Path]]:
+        target = merge_ledger(out_dir=str(tmp))
+        return _ledger_rows(tmp), [target]
+
+    def stats() -> tuple[int, list[Path]]:
+        res = compute_stats_multi(str(tmp), [opts.query], sample_size=opts.sample_size, feed=feed)[opts.query.name]
+        res.pop("query")
+        res["format"] = "both"
+        res["out_dir"] = str(out)
+        res["source"] = res["source"].replace(str(tmp), str(out), 1)
+        sim["stats"] = res
+        written = write_stats_artifacts_v2(str(tmp), res)
+        return res["total_rows"], [Path(p) for p in written.values()]
+
+    def dashboard() -> tuple[int, list[Path]]:
+        paths = build_dashboard(str(tmp), top=opts.dashboard_top, charts=opts.charts, page_size=opts.page_size)
+        return len(sim["stats"]["groups"]), [paths.index_html.parent]
+
+    try:
+        stage("simulate", simulate)
+        ledger = opts.audit in {"ledger", "both"}
+        if ledger and opts.merge:
+            stage("merge", merge)
+        if ledger:
+            stage("stats", stats)
+            stage("dashboard", dashboard)
+
+        idx_path = tmp / "ledger_index.json"
+        if idx_path.exists():  # record where the ledger will live after the swap
+            idx = json.loads(idx_path.read_text(encoding="utf-8"))
+            idx["ledger"]["dir"] = str(out / "ledger")
+            idx_path.write_text(json.dumps(idx, indent=2), encoding="utf-8")
+
+        manifest = {
+            "config": str(config_path),
+            "out_dir": str(out),
+            "run_id": json.loads((tmp / "run.json").read_text(encoding="utf-8"))["run_id"],
+            "cache_hit": bool(sim.get("cache_hit", False)),
+            "stats_from_feed": bool(feed.partials),
+            "stages": stages,
+            "total_wall_s": round(time.perf_counter() - t_start, 4),
+        }
+        (tmp / PIPELINE_MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+        _swap_into_place(tmp, out)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    manifest["df"] = sim["df"]
+    manifest["summary"] = sim["summary"]
+    manifest["stats"] = sim.get("stats")
+    return manifest
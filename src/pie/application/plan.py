@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+import shutil
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from pie.application.simulate import generate_population, load_config, run_monte_carlo
+from pie.infrastructure.io.ledger import BIN_NAME, passenger_in_sample
+
+# The calibration micro-run simulates at most this many passenger-iterations,
+# on a population of at most _CAL_PASSENGERS (so it covers enough iterations
+# for the data-dependent modes to show their row rate).
+CALIBRATION_BUDGET = 20_000
+_CAL_PASSENGERS = 250
+# Warn when an estimate reaches this share of a limit or of the free disk.
+_WARN_SHARE = 0.8
+
+
+@dataclass(frozen=True)
+class PlanLimits:
+    """
+    Refuse a run whose plan exceeds any of these (0 = no limit).
+    """
+
+    max_rows: int = 0
+    max_bytes: int = 0
+    max_seconds: float = 0.0
+
+
+def deterministic_ledger_rows(
+    mode: str, iterations: int, passengers: int, topk: int, sampled_passengers: int | None = None
+) -> int | None:
+    """
+    Exact ledger row count for the modes whose row count does not depend on
+    the simulated outcomes (the same expectations verify_run checks), or
+    None for eligible/sample/weighted.
+    """
+    if mode == "all":
+        return iterations * passengers
+    if mode == "topk":
+        return iterations * min(topk, passengers)
+    if mode == "global_topk":
+        return min(topk, iterations * passengers)
+    if mode == "passenger_sample":
+        if sampled_passengers is None:
+            raise ValueError("passenger_sample needs the sampled passenger count")
+        return iterations * sampled_passengers
+    return None
+
+
+def _calibrate(cfg: dict[str, Any], passengers: int, iterations: int, sim: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run the real simulation on a shrunken copy of the config in a temp dir
+    and measure wall time, ledger rows and artifact bytes.
+    """
+    small = json.loads(json.dumps(cfg))
+    small["run"]["iterations"] = iterations
+    small["population"]["passengers"] = passengers
+    with tempfile.TemporaryDirectory(prefix="pie-plan-") as tmp:
+        config_path = Path(tmp) / "config.yml"  # JSON is valid YAML
+        config_path.write_text(json.dumps(small), encoding="utf-8")
+        out = Path(tmp) / "out"
+        t0 = time.perf_counter()
+        run_monte_carlo(str(config_path), str(out), **sim)
+        seconds = time.perf_counter() - t0
+
+        rows = ledger_bytes = 0
+        if (out / "ledger_index.json").exists():
+            idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+            rows = int(idx["ledger"]["total_rows_written"])
+            ledger_bytes = sum(int(ch["bytes"]) for ch in idx["ledger"]["chunks"])
+        bin_bytes = (out / BIN_NAME).stat().st_size if (out / BIN_NAME).exists() else 0
+        total = sum(p.stat().st_size for p in out.rglob("*") if p.is_file())
+    return {
+        "passengers": passengers,
+        "iterations": iterations,
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "ledger_bytes": ledger_bytes,
+        "binary_bytes": bin_bytes,
+        "other_bytes": total - ledger_bytes - bin_bytes,
+    }
+
+
+def _free_bytes(out_dir: str) -> int:
+    path = Path(out_dir).resolve()
+    while not path.exists():
+        path = path.parent
+    return shutil.disk_usage(path).free
+
+
+def plan_run(
+    config_path: str,
+    audit: str = "both",
+    ledger_mode: str = "all",
+    ledger_topk: int = 50,
+    ledger_sample: float = 0.05,
+    ledger_chunk_size: int = 100,
+    ledger_block_rows: int = 10_000,
+    ledger_binary: bool = False,
+    out_dir: str | None = None,
+    limits: PlanLimits | None = None,
+    budget: int = CALIBRATION_BUDGET,
+) -> dict[str, Any]:
+    """
+    Predict what `run_monte_carlo` with these options will produce, before
+    running it: ledger rows (exact for all/topk/global_topk/passenger_sample,
+    extrapolated from the calibration run's row rate otherwise), bytes
+    (calibrated bytes per row, other artifacts per iteration) and wall time
+    (calibrated seconds per passenger-iteration). The plan lists limit
+    violations (the run should be refused) and warnings; with `out_dir`
+    the estimate is also checked against the free disk space there.
+    """
+    limits = limits or PlanLimits()
+    cfg = load_config(config_path)
+    iterations = int(cfg["run"]["iterations"])
+    passengers = int(cfg["population"]["passengers"])
+    work = iterations * passengers
+    sim = {
+        "audit": audit,
+        "ledger_mode": ledger_mode,
+        "ledger_topk": ledger_topk,
+        "ledger_sample": ledger_sample,
+        "ledger_chunk_size": ledger_chunk_size,
+        "ledger_block_rows": ledger_block_rows,
+        "ledger_binary": ledger_binary,
+    }
+
+    cal_passengers = min(passengers, _CAL_PASSENGERS)
+    cal_iterations = min(iterations, max(1, budget // cal_passengers))
+    cal = _calibrate(cfg, cal_passengers, cal_iterations, sim)  # also validates the options
+    cal_work = cal_passengers * cal_iterations
+
+    ledger = audit in {"ledger", "both"}
+    sampled = None
+    if ledger and ledger_mode == "passenger_sample":
+        population = generate_population(cfg, random.Random(int(cfg["run"]["seed"])))
+        sampled = sum(passenger_in_sample(p.id, ledger_sample) for p in population)
+    rows = deterministic_ledger_rows(ledger_mode, iterations, passengers, ledger_topk, sampled) if ledger else 0
+    exact = rows is not None
+    if rows is None:
+        if ledger_mode == "sample":
+            rows = round(work * ledger_sample)
+        else:
+            rows = round(work * cal["rows"] / cal_work)
+
+    row_bytes = cal["ledger_bytes"] / cal["rows"] if cal["rows"] else 0.0
+    bin_row_bytes = cal["binary_bytes"] / cal["rows"] if cal["rows"] else 0.0
+    ledger_bytes = round(rows * row_bytes)
+    binary_bytes = round(rows * bin_row_bytes)
+    other_bytes = round(cal["other_bytes"] * iterations / cal_iterations)
+    total_bytes = ledger_bytes + binary_bytes + other_bytes
+    seconds = cal["seconds"] * work / cal_work
+
+    violations: list[str] = []
+    warnings: list[str] = []
+    for name, value, limit in (
+        ("ledger rows", rows, limits.max_rows),
+        ("bytes", total_bytes, limits.max_bytes),
+        ("runtime seconds", seconds, limits.max_seconds),
+    ):
+        if not limit:
+            continue
+        if value > limit:
+            violations.append(f"estimated {name} {value:,.0f} exceed the limit {limit:,.0f}")
+        elif value > _WARN_SHARE * limit:
+            warnings.append(f"estimated {name} {value:,.0f} are within {1 - _WARN_SHARE:.0%} of the limit {limit:,.0f}")
+    free = None
+    if out_dir is not None:
+        free = _free_bytes(out_dir)
+        if total_bytes > free:
+            violations.append(f"estimated {total_bytes:,} bytes exceed the {free:,} bytes free under {out_dir}")
+        elif total_bytes > _WARN_SHARE * free:
+            warnings.append(f"estimated {total_bytes:,} bytes use most of the {free:,} bytes free under {out_dir}")
+    if ledger and not exact:
+        warnings.append(f"ledger_mode={ledger_mode} rows are extrapolated from the calibration run")
+
+    chunks = 0
+    if ledger:
+        chunks = 1 if ledger_mode == "global_topk" else math.ceil(iterations / ledger_chunk_size)
+    return {
+        "ok": not violations,
+        "config": config_path,
+        "iterations": iterations,
+        "passengers": passengers,
+        "passenger_iterations": work,
+        "audit": audit,
+        "ledger": {
+            "mode": ledger_mode if ledger else None,
+            "rows": rows,
+            "rows_exact": exact,
+            "rows_per_iteration": rows / iterations if iterations else 0.0,
+            "chunks": chunks,
+            "bytes_per_row": round(row_bytes, 2),
+            "bytes": ledger_bytes,
+            "binary_bytes": binary_bytes,
+        },
+        "other_bytes": other_bytes,
+        "total_bytes": total_bytes,
+        "free_bytes": free,
+        "runtime_s": round(seconds, 2),
+        "calibration": cal,
+        "limits": asdict(limits),
+        "violations": violations,
+        "warnings": warnings,
+    }
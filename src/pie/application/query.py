@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+from pie.infrastructure.io.ledger import LEDGER_FIELDS, ZONE_MAP_FIELDS
+
+# col>=x | col>x | col<=x | col<x | col==x | col=x | col=a..b
+_NUM = r"[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?"
+_WHERE_RE = re.compile(rf"^\s*([a-z_]+)\s*(>=|<=|==|=|>|<)\s*({_NUM})(?:\.\.({_NUM}))?\s*$")
+
+
+@dataclass(frozen=True)
+class RangeFilter:
+    """
+    Numeric range predicate on one ledger column. Bounds are optional;
+    each bound is inclusive unless its *_open flag is set.
+    """
+
+    column: str
+    lo: float | None = None
+    hi: float | None = None
+    lo_open: bool = False
+    hi_open: bool = False
+
+    def matches(self, value: float) -> bool:
+        if self.lo is not None and (value <= self.lo if self.lo_open else value < self.lo):
+            return False
+        return not (self.hi is not None and (value >= self.hi if self.hi_open else value > self.hi))
+
+    def may_match(self, zmin: float, zmax: float) -> bool:
+        """
+        False only when no value in [zmin, zmax] can satisfy the predicate.
+        """
+        if self.lo is not None and (zmax <= self.lo if self.lo_open else zmax < self.lo):
+            return False
+        return not (self.hi is not None and (zmin >= self.hi if self.hi_open else zmin > self.hi))
+
+    def spec(self) -> str:
+        lo = "" if self.lo is None else ("(" if self.lo_open else "[") + repr(self.lo)
+        hi = "" if self.hi is None else repr(self.hi) + (")" if self.hi_open else "]")
+        return f"{self.column}:{lo},{hi}"
+
+
+def parse_where(exprs: Sequence[str]) -> list[RangeFilter]:
+    out: list[RangeFilter] = []
+    for expr in exprs:
+        m = _WHERE_RE.match(expr.lower())
+        if not m:
+            raise ValueError(f"Invalid --where {expr!r}. Expected e.g. total_cost_eur>=200 or iteration=0..99")
+        col, op, a, b = m.groups()
+        if col not in ZONE_MAP_FIELDS:
+            raise ValueError(f"Invalid --where column {col!r}. Allowed: {'|'.join(ZONE_MAP_FIELDS)}")
+        x = float(a)
+        if b is not None:
+            if op not in {"=", "=="}:
+                raise ValueError(f"Invalid --where {expr!r}: ranges use col=a..b")
+            out.append(RangeFilter(col, lo=x, hi=float(b)))
+        elif op == ">=":
+            out.append(RangeFilter(col, lo=x))
+        elif op == ">":
+            out.append(RangeFilter(col, lo=x, lo_open=True))
+        elif op == "<=":
+            out.append(RangeFilter(col, hi=x))
+        elif op == "<":
+            out.append(RangeFilter(col, hi=x, hi_open=True))
+        else:
+            out.append(RangeFilter(col, lo=x, hi=x))
+    return out
+
+
+def parse_group_by(by: str) -> list[str]:
+    by = by.strip().lower()
+    if by in {"", "none"}:
+        return []
+    parts = [p.strip() for p in by.split(",") if p.strip()]
+    bad = [p for p in parts if p not in LEDGER_FIELDS]
+    if bad:
+        raise ValueError(f"Invalid --by value(s): {bad}. Allowed: none or a comma list of {'|'.join(LEDGER_FIELDS)}")
+    out: list[str] = []
+    for p in parts:
+        if p not in out:
+            out.append(p)
+    return out
+
+
+def group_value(row: Mapping[str, str], column: str, delay_bucket: int) -> str:
+    """
+    Grouping label for one column; delay_minutes is bucketed as 'lo-hi'.
+    """
+    raw = row.get(column, "")
+    if column != "delay_minutes" or delay_bucket <= 1 or raw == "":
+        return raw
+    lo = int(float(raw)) // delay_bucket * delay_bucket
+    return f"{lo}-{lo + delay_bucket - 1}"
+
+
+def chunk_may_match(zone_map: Mapping[str, Sequence[float]] | None, filters: Sequence[RangeFilter]) -> bool:
+    """
+    Zone-map pruning: a chunk is skipped when any filter excludes its whole
+    [min, max] range. Missing zone maps (older runs, merged file) never prune.
+    """
+    if not zone_map:
+        return True
+    for f in filters:
+        z = zone_map.get(f.column)
+        if z is not None and not f.may_match(float(z[0]), float(z[1])):
+            return False
+    return True
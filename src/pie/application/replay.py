@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+from typing import Any
+
+from pie.application.simulate import (
+    build_scenario,
+    generate_population,
+    sample_disruption,
+    sample_rebooking_cost,
+)
+from pie.domain.regulations.eu261 import assess_eu261
+from pie.domain.runmeta import stable_hash
+from pie.infrastructure.io.ledger import WeightedRowSampler, passenger_in_sample
+
+try:  # numpy ships with pandas; the pure-Python loop is the fallback
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Below this many draws the numpy state round-trip costs more than it saves.
+_NUMPY_MIN_DRAWS = 64
+
+
+def _count_uniform_below(rng: random.Random, n: int, p: float) -> int:
+    """
+    Advance `rng` by n random() calls and return how many were < p.
+
+    random.Random and numpy's MT19937 share the same generator, so the state
+    is handed to numpy, the 2n 32-bit words are drawn in one call and turned
+    into doubles exactly the way random() does ((a >> 5) * 2**26 + (b >> 6)) / 2**53,
+    and the advanced state is handed back.
+    """
+    if np is None or n < _NUMPY_MIN_DRAWS:
+        return sum(1 for _ in range(n) if rng.random() < p)
+
+    version, internal, gauss_next = rng.getstate()
+    bitgen = np.random.MT19937()
+    bitgen.state = {
+        "bit_generator": "MT19937",
+        "state": {"key": np.asarray(internal[:-1], dtype=np.uint32), "pos": int(internal[-1])},
+    }
+    words = bitgen.random_raw(2 * n)
+    u = ((words[0::2] >> 5).astype(np.float64) * 67108864.0 + (words[1::2] >> 6)) / 9007199254740992.0
+    count = int(np.count_nonzero(u < p))
+
+    st = bitgen.state["state"]
+    rng.setstate((version, (*(int(k) for k in st["key"]), int(st["pos"])), gauss_next))
+    return count
+
+
+def load_run_config(out: Path, run_meta: dict[str, Any]) -> dict[str, Any]:
+    """
+    Load the config snapshot written by simulate and check it still hashes to
+    run.json's config_hash.
+    """
+    path = out / "config.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Missing: {path} (runs written before config snapshots cannot be replayed)")
+    cfg = json.loads(path.read_text(encoding="utf-8"))
+    got = stable_hash(cfg)
+    if got != run_meta["config_hash"]:
+        raise ValueError(f"Config snapshot hash mismatch: run.json says {run_meta['config_hash']}, config.json gives {got}")
+    return cfg
+
+
+def replay_rows_per_iteration(
+    cfg: dict[str, Any],
+    seed: int,
+    iterations: int,
+    ledger_mode: str,
+    ledger_sample: float = 0.0,
+) -> list[int]:
+    """
+    Replay the simulator's random stream and return the number of ledger rows
+    each iteration writes, without building or writing any rows.
+
+    The draws are consumed in exactly the order run_monte_carlo consumes them:
+    the population, then per iteration the disruption, the rebooking cost and
+    (sample and weighted modes) one random() per passenger.
+    """
+    rng = random.Random(seed)
+    passengers = generate_population(cfg, rng)
+    ctx, eu_cfg = build_scenario(cfg)
+    n = len(passengers)
+    n_sampled = sum(passenger_in_sample(p.id, ledger_sample) for p in passengers)
+    weighted = WeightedRowSampler(ledger_sample)
+
+    out: list[int] = []
+    for _ in range(iterations):
+        event = sample_disruption(cfg, rng)
+        rebook_cost = sample_rebooking_cost(eu_cfg, rng)
+
+        if ledger_mode == "all":
+            out.append(n)
+        elif ledger_mode == "passenger_sample":
+            out.append(n_sampled)
+        elif ledger_mode == "sample":
+            out.append(_count_uniform_below(rng, n, ledger_sample))
+        elif ledger_mode == "weighted":
+            # inclusion depends on each row's cost, so the outcomes are recomputed
+            kept = 0
+            for p in passengers:
+                outcome = assess_eu261(p, ctx, event, eu_cfg, sampled_rebooking_cost_eur=rebook_cost)
+                if rng.random() < weighted.inclusion_prob(outcome.total_cost_eur):
+                    kept += 1
+            out.append(kept)
+        elif ledger_mode == "eligible":
+            out.append(
+                sum(
+                    1
+                    for p in passengers
+                    if assess_eu261(p, ctx, event, eu_cfg, sampled_rebooking_cost_eur=rebook_cost).cash_comp_eur > 0
+                )
+            )
+        else:
+            raise ValueError(f"Replay does not support ledger mode: {ledger_mode}")
+    return out
+
+
+def replay_chunk_rows(out_dir: str) -> list[int]:
+    """
+    Expected rows_written for every chunk in ledger_index.json, recomputed
+    from run.json + config.json.
+    """
+    out = Path(out_dir)
+    run_meta = json.loads((out / "run.json").read_text(encoding="utf-8"))
+    idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+    ledger = idx["ledger"]
+    cfg = load_run_config(out, run_meta)
+
+    per_it = replay_rows_per_iteration(
+        cfg,
+        seed=int(run_meta["seed"]),
+        iterations=int(idx["iterations"]),
+        ledger_mode=ledger["mode"],
+        ledger_sample=float(ledger["sample"]),
+    )
+    return [
+        sum(per_it[int(ch["start_iteration"]) : int(ch["end_iteration"]) + 1]) for ch in ledger["chunks"]
+    ]
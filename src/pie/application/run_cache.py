@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import stat
+import time
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from pie.application.simulate import (
+    compute_run_id,
+    load_config,
+    run_artifacts,
+    run_monte_carlo,
+    upload_run,
+)
+from pie.application.verify import verify_run
+from pie.infrastructure.io.ledger import BIN_HEADER_NAME, BIN_NAME
+from pie.infrastructure.io.store import ArtifactStore, Uploader
+
+ENTRY_NAME = "entry.json"
+
+
+class RunCache:
+    """
+    Content-addressed store of finished, verified runs: <root>/<run_id>/ holds
+    the run's artifacts (read-only) plus entry.json. Entries are written
+    once; restores hardlink them into the out dir (copy across devices).
+    Least recently used entries are evicted beyond max_bytes, and entries
+    older than max_age_s are dropped.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int = 5 << 30, max_age_s: float = 30 * 86400) -> None:
+        if max_bytes <= 0 or max_age_s <= 0:
+            raise ValueError("run cache max_bytes and max_age_s must be > 0")
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+
+    def _entry(self, run_id: str) -> dict[str, Any] | None:
+        meta = self.root / run_id / ENTRY_NAME
+        if not meta.exists():
+            return None
+        return json.loads(meta.read_text(encoding="utf-8"))
+
+    def restore(self, run_id: str, out: Path, need_binary: bool = False) -> bool:
+        entry = self._entry(run_id)
+        if entry is None or (need_binary and not entry["ledger_binary"]):
+            return False
+        if time.time() - float(entry["created"]) > self.max_age_s:
+            self._remove(self.root / run_id)
+            return False
+        src_dir = self.root / run_id
+        if not all((src_dir / rel).exists() for rel in entry["files"]):
+            self._remove(src_dir)
+            return False
+
+        out.mkdir(parents=True, exist_ok=True)
+        if not entry["ledger_binary"]:
+            for name in (BIN_NAME, BIN_HEADER_NAME):
+                (out / name).unlink(missing_ok=True)
+        for rel in entry["files"]:
+            src, dst = src_dir / rel, out / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            dst.unlink(missing_ok=True)
+            if rel == "ledger_index.json":
+                # The index records the ledger dir of the run that wrote it.
+                idx = json.loads(src.read_text(encoding="utf-8"))
+                idx["ledger"]["dir"] = str(out / "ledger")
+                dst.write_text(json.dumps(idx, indent=2), encoding="utf-8")
+                continue
+            try:
+                os.link(src, dst)
+            except OSError:  # e.g. cache on another device
+                shutil.copy2(src, dst)
+                # the entry is read-only; the copy belongs to the out dir
+                dst.chmod(dst.stat().st_mode | stat.S_IWUSR)
+
+        os.utime(src_dir / ENTRY_NAME)  # LRU clock
+        return True
+
+    def store(self, run_id: str, out: Path, ledger_binary: bool) -> Path:
+        final = self.root / run_id
+        if final.exists():
+            return final
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".tmp-{run_id}-{os.getpid()}"
+        self._remove(tmp)
+
+        files = run_artifacts(out)
+        total = 0
+        for rel in files:
+            dst = tmp / rel
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(out / rel, dst)
+            dst.chmod(stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            total += dst.stat().st_size
+        (tmp / ENTRY_NAME).write_text(
+            json.dumps(
+                {
+                    "run_id": run_id,
+                    "created": time.time(),
+                    "bytes": total,
+                    "ledger_binary": ledger_binary,
+                    "files": files,
+                },
+                indent=2,
+            )
+            + "\n",
+            encoding="utf-8",
+        )
+        try:
+            tmp.rename(final)
+        except OSError:  # another worker stored the same run first
+            self._remove(tmp)
+        self.evict(keep=run_id)
+        return final
+
+    def evict(self, keep: str | None = None) -> list[str]:
+        """
+        Drop entries older than max_age_s, then least recently used entries
+        until the cache fits in max_bytes. Returns the evicted run ids.
+        """
+        if not self.root.is_dir():
+            return []
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        evicted: list[str] = []
+        for d in self.root.iterdir():
+            meta = d / ENTRY_NAME
+            if not d.is_dir() or d.name.startswith(".") or not meta.exists():
+                continue
+            entry = json.loads(meta.read_text(encoding="utf-8"))
+            if now - float(entry["created"]) > self.max_age_s and d.name != keep:
+                self._remove(d)
+                evicted.append(d.name)
+                continue
+            entries.append((meta.stat().st_mtime, int(entry["bytes"]), d))
+
+        entries.sort()
+        total = sum(b for _, b, _ in entries)
+        for _, size, d in entries:
+            if total <= self.max_bytes:
+                break
+            if d.name == keep:
+                continue
+            self._remove(d)
+            evicted.append(d.name)
+            total -= size
+        return evicted
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def simulate_cached(
+    config_path: str,
+    out_dir: str,
+    cache_dir: str,
+    audit: str = "both",
+    ledger_mode: str = "all",
+    ledger_topk: int = 50,
+    ledger_sample: float = 0.05,
+    ledger_chunk_size: int = 100,
+    ledger_block_rows: int = 10_000,
+    ledger_binary: bool = False,
+    max_bytes: int = 5 << 30,
+    max_age_s: float = 30 * 86400,
+    store: ArtifactStore | None = None,
+    upload_workers: int = 4,
+) -> tuple[pd.DataFrame, dict[str, float], bool]:
+    """
+    run_monte_carlo through a RunCache. Returns (df, summary, cache_hit).
+    A miss runs the simulation, verifies it and stores it. With a `store`,
+    the artifacts are uploaded either way.
+    """
+    cache = RunCache(cache_dir, max_bytes=max_bytes, max_age_s=max_age_s)
+    out = Path(out_dir)
+    run_id = compute_run_id(
+        load_config(config_path),
+        audit=audit,
+        ledger_mode=ledger_mode,
+        ledger_topk=ledger_topk,
+        ledger_sample=ledger_sample,
+        ledger_chunk_size=ledger_chunk_size,
+        ledger_block_rows=ledger_block_rows,
+    )
+
+    if cache.restore(run_id, out, need_binary=ledger_binary):
+        df = pd.read_csv(out / "cost_distribution.csv")
+        summary = {k: float(v) for k, v in pd.read_csv(out / "summary.csv").iloc[0].items()}
+        if store is not None:
+            upload_run(out, Uploader(store, max_workers=upload_workers))
+        return df, summary, True
+
+    df, summary = run_monte_carlo(
+        config_path=config_path,
+        out_dir=out_dir,
+        audit=audit,
+        ledger_mode=ledger_mode,
+        ledger_topk=ledger_topk,
+        ledger_sample=ledger_sample,
+        ledger_chunk_size=ledger_chunk_size,
+        ledger_block_rows=ledger_block_rows,
+        ledger_binary=ledger_binary,
+        store=store,
+        upload_workers=upload_workers,
+    )
+    verify_run(out_dir)
+    cache.store(run_id, out, ledger_binary=ledger_binary)
+    return df, summary, False
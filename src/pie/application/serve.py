@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from pie.application.dashboard import is_hashed_name
+
+try:  # optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Smaller bodies are not worth compressing.
+_MIN_COMPRESS_BYTES = 512
+_COMPRESSIBLE = ("text/", "application/json", "application/javascript", "image/svg+xml")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Each representation gets its own strong ETag: the identity one plus a suffix.
+_ETAG_SUFFIX = {"gzip": "-gz", "br": "-br"}
+
+
+@dataclass(frozen=True)
+class StaticFile:
+    body: bytes
+    content_type: str
+    etag: str
+    cache_control: str
+    encoded: dict[str, bytes]  # content-coding -> precompressed body
+
+    def etag_for(self, coding: str | None) -> str:
+        return self.etag if coding is None else self.etag[:-1] + _ETAG_SUFFIX[coding] + '"'
+
+
+def _load_file(rel: str, path: Path) -> StaticFile:
+    body = path.read_bytes()
+    ctype = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if ctype.startswith("text/") or ctype in {"application/json", "application/javascript"}:
+        ctype += "; charset=utf-8"
+    encoded: dict[str, bytes] = {}
+    if len(body) >= _MIN_COMPRESS_BYTES and ctype.startswith(_COMPRESSIBLE):
+        gz = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(gz) < len(body):
+            encoded["gzip"] = gz
+        if brotli is not None:
+            br = brotli.compress(body)
+            if len(br) < len(body):
+                encoded["br"] = br
+    immutable = is_hashed_name(rel)
+    return StaticFile(
+        body=body,
+        content_type=ctype,
+        etag='"' + hashlib.sha256(body).hexdigest()[:20] + '"',
+        cache_control="public, max-age=31536000, immutable" if immutable else "no-cache",
+        encoded=encoded,
+    )
+
+
+class DashboardSite:
+    """
+    In-memory snapshot of a dashboard directory (bodies, precompressed
+    variants, ETags). reload() builds a complete new snapshot and swaps it in
+    with one assignment, so requests always see either the old or the new
+    site, never a half-published one.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.files: dict[str, StaticFile] = {}
+        self._fingerprint: tuple[tuple[str, int, int, int], ...] | None = None
+        self._lock = threading.Lock()
+        if not self.reload():
+            raise FileNotFoundError(f"Missing {self.root / 'index.html'}. Run: pie dashboard")
+
+    def _scan(self) -> tuple[tuple[str, int, int, int], ...]:
+        out = []
+        for p in sorted(self.root.rglob("*")):
+            if p.is_file() and not any(part.startswith(".") for part in p.relative_to(self.root).parts):
+                st = p.stat()
+                out.append((p.relative_to(self.root).as_posix(), st.st_size, st.st_mtime_ns, st.st_ino))
+        return tuple(out)
+
+    def reload(self) -> bool:
+        """
+        Load the directory if it changed since the last snapshot. Returns
+        False (keeping the current snapshot) while no index.html is present,
+        e.g. in the middle of a non-atomic publish.
+        """
+        with self._lock:
+            try:
+                fp = self._scan()
+                if fp == self._fingerprint:
+                    return True
+                if not any(rel == "index.html" for rel, *_ in fp):
+                    return False
+                files = {rel: _load_file(rel, self.root / rel) for rel, *_ in fp}
+            except FileNotFoundError:  # files moved while loading: retry next time
+                return False
+            self.files = files
+            self._fingerprint = fp
+            return True
+
+    def watch(self, interval: float, stop: threading.Event) -> threading.Thread:
+        def loop() -> None:
+            while not stop.wait(interval):
+                self.reload()
+
+        t = threading.Thread(target=loop, name="dashboard-reload", daemon=True)
+        t.start()
+        return t
+
+
+def _choose_encoding(accept: str, available: dict[str, bytes]) -> str | None:
+    offered = {}
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding in available and offered.get(coding, offered.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    server_version = "pie-serve"
+    site: DashboardSite  # set on the subclass made by make_server
+
+    def do_HEAD(self) -> None:
+        self._serve(head=True)
+
+    def do_GET(self) -> None:
+        self._serve(head=False)
+
+    def log_message(self, format: str, *args) -> None:
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _serve(self, head: bool) -> None:
+        rel = unquote(urlsplit(self.path).path).lstrip("/")
+        if rel == "" or rel.endswith("/"):
+            rel += "index.html"
+        f = self.site.files.get(rel)  # lookups never touch the filesystem
+        if f is None:
+            self._send_bytes(HTTPStatus.NOT_FOUND, b"Not found\n", "text/plain; charset=utf-8", head)
+            return
+
+        coding = _choose_encoding(self.headers.get("Accept-Encoding", ""), f.encoded)
+        range_hdr = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        # Ranges address the identity bytes, so only that representation is ever sliced.
+        ranged = bool(range_hdr) and (if_range is None or if_range == f.etag)
+        if ranged:
+            coding = None
+        etag = f.etag_for(coding)
+
+        common = {"ETag": etag, "Cache-Control": f.cache_control, "Vary": "Accept-Encoding"}
+        if etag in {t.strip() for t in self.headers.get("If-None-Match", "").split(",")}:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for k, v in common.items():
+                self.send_header(k, v)
+            self.end_headers()
+            return
+
+        if ranged:
+            self._serve_range(f, range_hdr, common, head)
+            return
+
+        body = f.encoded[coding] if coding else f.body
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", f.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if coding:
+            self.send_header("Content-Encoding", coding)
+        else:
+            self.send_header("Accept-Ranges", "bytes")
+        for k, v in common.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _serve_range(self, f: StaticFile, range_hdr: str, common: dict[str, str], head: bool) -> None:
+        size = len(f.body)
+        m = _RANGE.match(range_hdr.strip())
+        start = end = -1
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            else:
+                start, end = max(0, size - int(m.group(2))), size - 1
+        if not m or start < 0 or start > end or start >= size:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = f.body[start : end + 1]
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", f.content_type)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in common.items():
+            self.send_header(k, v)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_bytes(self, status: HTTPStatus, body: bytes, ctype: str, head: bool) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+class DashboardServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+    verbose = False
+
+
+def make_server(root: str | Path, host: str = "0.0.0.0", port: int = 8010) -> tuple[DashboardServer, DashboardSite]:
+    """
+    A thread-per-connection HTTP server over an in-memory DashboardSite.
+    The caller runs serve_forever() and, for hot reload, site.watch().
+    """
+    site = DashboardSite(root)
+    handler = type("BoundDashboardHandler", (DashboardHandler,), {"site": site})
+    return DashboardServer((host, port), handler), site
@@ -4,6 +4,7 @@ import heapq
 import json
 import math
 import random
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
@@ -11,6 +12,7 @@ import pandas as pd
 import yaml
 
 from pie.domain.models import (
+    CompensationOutcome,
     DisruptionEvent,
     DisruptionType,
     EligibilityContext,
@@ -19,7 +21,37 @@ from pie.domain.models import (
 )
 from pie.domain.regulations.eu261 import EU261Config, assess_eu261
 from pie.domain.runmeta import RunMeta, stable_hash
-from pie.infrastructure.io.ledger import LedgerWriter
+from pie.infrastructure.io.audit import AUDIT_DIR, AUDIT_INDEX_NAME, AuditLogWriter
+from pie.infrastructure.io.binledger import BinaryLedgerWriter
+from pie.infrastructure.io.ledger import (
+    BIN_HEADER_NAME,
+    BIN_NAME,
+    LEDGER_FIELDS,
+    SAMPLE_WEIGHT_FIELD,
+    ZONE_MAP_FIELDS,
+    LedgerWriter,
+    WeightedRowSampler,
+    detach_hardlinks,
+    merkle_root,
+    passenger_in_sample,
+)
+from pie.infrastructure.io.store import ArtifactStore, Uploader
+
+# Top-level files a finished simulate run leaves in its out dir (if present).
+RUN_FILES = (
+    "run.json",
+    "config.json",
+    "cost_distribution.csv",
+    "summary.csv",
+    "report.html",
+    AUDIT_INDEX_NAME,
+    "ledger_index.json",
+    BIN_HEADER_NAME,
+    BIN_NAME,
+)
+# Uploaded after every file they describe, so a store never lists an index
+# whose files are not there yet.
+_INDEX_FILES = ("ledger_index.json", AUDIT_INDEX_NAME, BIN_HEADER_NAME, "run.json")
 
 
 def _clamp(x: float, lo: float, hi: float) -> float:
@@ -71,6 +103,79 @@ def sample_disruption(cfg: dict, rng: random.Random) -> DisruptionEvent:
     return DisruptionEvent(dtype=DisruptionType.CANCEL, delay_minutes=0, cause="simulated")
 
 
+def build_scenario(cfg: dict) -> tuple[EligibilityContext, EU261Config]:
+    s = cfg["scenario"]
+    ctx = EligibilityContext(
+        carrier_is_eu=bool(s["carrier_is_eu"]),
+        dep_in_eu=bool(s["dep_in_eu"]),
+        arr_in_eu=bool(s["arr_in_eu"]),
+        distance_km=int(s["distance_km"]),
+    )
+
+    c = cfg["costs"]
+    eu_cfg = EU261Config(
+        meal_cost=float(c["meal_cost"]),
+        hotel_cost_per_night=float(c["hotel_cost_per_night"]),
+        ground_transport_cost=float(c["ground_transport_cost"]),
+        refund_rate=float(c["refund_rate"]),
+        rebooking_cost_mean=float(c["rebooking_cost_mean"]),
+        rebooking_cost_std=float(c["rebooking_cost_std"]),
+    )
+    return ctx, eu_cfg
+
+
+def sample_rebooking_cost(eu_cfg: EU261Config, rng: random.Random) -> float:
+    return _sample_normal(
+        rng,
+        mean=eu_cfg.rebooking_cost_mean,
+        std=eu_cfg.rebooking_cost_std,
+        lo=0,
+        hi=2000,
+    )
+
+
+def run_artifacts(out: Path) -> list[str]:
+    """
+    Relative paths of every artifact of the run in `out`, taken from its
+    indexes (so stale chunk files of older runs are never picked up).
+    """
+    files = [name for name in RUN_FILES if (out / name).exists()]
+    if (out / AUDIT_INDEX_NAME).exists():
+        idx = json.loads((out / AUDIT_INDEX_NAME).read_text(encoding="utf-8"))
+        files += [f"{idx['dir']}/{seg['file']}" for seg in idx["segments"]]
+    if (out / "ledger_index.json").exists():
+        idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+        files += [f"ledger/{ch['file']}" for ch in idx["ledger"]["chunks"]]
+    return files
+
+
+def compute_run_id(
+    cfg: dict,
+    audit: str,
+    ledger_mode: str,
+    ledger_topk: int,
+    ledger_sample: float,
+    ledger_chunk_size: int,
+    ledger_block_rows: int,
+) -> str:
+    """
+    Deterministic id of a run: same config + options => same artifacts.
+    """
+    return stable_hash(
+        {
+            "seed": int(cfg["run"]["seed"]),
+            "iterations": int(cfg["run"]["iterations"]),
+            "config_hash": stable_hash(cfg),
+            "audit": audit,
+            "ledger_mode": ledger_mode,
+            "ledger_topk": ledger_topk,
+            "ledger_sample": ledger_sample,
+            "ledger_chunk_size": ledger_chunk_size,
+            "ledger_block_rows": ledger_block_rows,
+        }
+    )
+
+
 def run_monte_carlo(
     config_path: str,
     out_dir: str,
@@ -79,13 +184,29 @@ def run_monte_carlo(
     ledger_topk: int = 50,
     ledger_sample: float = 0.05,
     ledger_chunk_size: int = 100,
+    ledger_block_rows: int = 10_000,
+    ledger_binary: bool = False,
+    audit_segment_bytes: int = 32 << 20,
+    on_ledger_row: Callable[[dict[str, Any]], None] | None = None,
+    on_ledger_chunk: Callable[[dict[str, Any]], None] | None = None,
+    store: ArtifactStore | None = None,
+    upload_workers: int = 4,
 ) -> tuple[pd.DataFrame, dict[str, float]]:
+    """
+    on_ledger_row / on_ledger_chunk, when given, see every ledger row as it
+    is written and every chunk's metadata once its file is closed (used by
+    `pie pipeline` to aggregate stats without re-reading the ledger).
+
+    With a `store`, every finished ledger chunk is uploaded on
+    `upload_workers` threads while later chunks are simulated; the remaining
+    artifacts follow at the end, index files last.
+    """
     cfg = load_config(config_path)
 
     # --- validations ---
     if audit not in {"summary", "ledger", "both"}:
         raise ValueError(f"Invalid audit: {audit}")
-    if ledger_mode not in {"all", "eligible", "topk", "sample"}:
+    if ledger_mode not in {"all", "eligible", "topk", "global_topk", "sample", "passenger_sample", "weighted"}:
         raise ValueError(f"Invalid ledger_mode: {ledger_mode}")
     if ledger_topk <= 0:
         raise ValueError("ledger_topk must be > 0")
@@ -93,28 +214,33 @@ def run_monte_carlo(
         raise ValueError("ledger_sample must be in (0, 1]")
     if ledger_chunk_size <= 0:
         raise ValueError("ledger_chunk_size must be > 0")
+    if ledger_block_rows < 0:
+        raise ValueError("ledger_block_rows must be >= 0")
 
     seed = int(cfg["run"]["seed"])
     iterations = int(cfg["run"]["iterations"])
 
     config_hash = stable_hash(cfg)
-    run_id = stable_hash(
-        {
-            "seed": seed,
-            "iterations": iterations,
-            "config_hash": config_hash,
-            "audit": audit,
-            "ledger_mode": ledger_mode,
-            "ledger_topk": ledger_topk,
-            "ledger_sample": ledger_sample,
-            "ledger_chunk_size": ledger_chunk_size,
-        }
+    run_id = compute_run_id(
+        cfg,
+        audit=audit,
+        ledger_mode=ledger_mode,
+        ledger_topk=ledger_topk,
+        ledger_sample=ledger_sample,
+        ledger_chunk_size=ledger_chunk_size,
+        ledger_block_rows=ledger_block_rows,
     )
 
     rng = random.Random(seed)
 
     out = Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
+    detach_hardlinks(out, RUN_FILES, dirs=("ledger", AUDIT_DIR))
+    if not (ledger_binary and audit in {"ledger", "both"}):
+        # a binary copy from an earlier run would no longer match the ledger
+        for name in (BIN_NAME, BIN_HEADER_NAME):
+            (out / name).unlink(missing_ok=True)
+    uploader = Uploader(store, max_workers=upload_workers) if store is not None else None
 
     run_meta = RunMeta(
         run_id=run_id,
@@ -127,31 +253,19 @@ def run_monte_carlo(
         json.dumps(run_meta.__dict__, indent=2, ensure_ascii=False) + "\n",
         encoding="utf-8",
     )
+    # Exact config snapshot (hashes to config_hash) so verify can replay the run.
+    (out / "config.json").write_text(json.dumps(cfg, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
 
     passengers = generate_population(cfg, rng)
 
-    s = cfg["scenario"]
-    ctx = EligibilityContext(
-        carrier_is_eu=bool(s["carrier_is_eu"]),
-        dep_in_eu=bool(s["dep_in_eu"]),
-        arr_in_eu=bool(s["arr_in_eu"]),
-        distance_km=int(s["distance_km"]),
-    )
+    ctx, eu_cfg = build_scenario(cfg)
 
-    c = cfg["costs"]
-    eu_cfg = EU261Config(
-        meal_cost=float(c["meal_cost"]),
-        hotel_cost_per_night=float(c["hotel_cost_per_night"]),
-        ground_transport_cost=float(c["ground_transport_cost"]),
-        refund_rate=float(c["refund_rate"]),
-        rebooking_cost_mean=float(c["rebooking_cost_mean"]),
-        rebooking_cost_std=float(c["rebooking_cost_std"]),
-    )
+    # passenger_sample: a fixed, hash-selected subset written in every iteration
+    in_sample = [passenger_in_sample(p.id, ledger_sample) for p in passengers]
 
-    # --- audit log ---
-    audit_path = out / "events.jsonl"
-    audit_f = audit_path.open("w", encoding="utf-8")
-    audit_f.write(json.dumps({"type": "run_start", "meta": run_meta.__dict__}, ensure_ascii=False) + "\n")
+    # --- audit log (run_id/seed live in each segment header, not on every event) ---
+    audit_log = AuditLogWriter(out, run_id=run_id, seed=seed, segment_bytes=audit_segment_bytes)
+    audit_log.emit({"type": "run_start", "meta": run_meta.__dict__})
 
     # --- ledger setup (ONLY if audit includes ledger) ---
     ledger: LedgerWriter | None = None
@@ -159,21 +273,11 @@ def run_monte_carlo(
     ledger_path: Path | None = None
     current_chunk: int | None = None
 
-    ledger_fields = [
-        "run_id",
-        "iteration",
-        "seed",
-        "passenger_id",
-        "segment",
-        "refundable",
-        "dtype",
-        "delay_minutes",
-        "cash_comp_eur",
-        "care_cost_eur",
-        "refund_cost_eur",
-        "rebooking_cost_eur",
-        "total_cost_eur",
-    ]
+    ledger_fields = list(LEDGER_FIELDS)
+    weighted: WeightedRowSampler | None = None
+    if ledger_mode == "weighted":
+        ledger_fields.append(SAMPLE_WEIGHT_FIELD)
+        weighted = WeightedRowSampler(ledger_sample)
 
     # chunk/index bookkeeping
     ledger_rows_written = 0
@@ -185,7 +289,14 @@ def run_monte_carlo(
         nonlocal ledger, ledger_path
         assert ledger_dir is not None
         ledger_path = ledger_dir / f"entitlements_chunk_{chunk:05d}.csv.gz"
-        ledger = LedgerWriter(ledger_path, ledger_fields).__enter__()
+        ledger = LedgerWriter(
+            ledger_path,
+            ledger_fields,
+            zone_fields=ZONE_MAP_FIELDS,
+            block_rows=ledger_block_rows,
+            uploader=uploader,
+            key=f"ledger/{ledger_path.name}",
+        ).__enter__()
 
     def _close_and_record_chunk(chunk: int, end_iteration: int) -> None:
         """
@@ -205,23 +316,67 @@ def run_monte_carlo(
                 "start_iteration": chunk_start_it,
                 "end_iteration": end_iteration,
                 "rows_written": chunk_rows_written,
+                "bytes": ledger.bytes_written,
+                "sha256": ledger.sha256,
+                "zone_map": ledger.zone_map,
+                "blocks": ledger.blocks if ledger.block_rows else None,
             }
         )
         chunk_rows_written = 0
+        if on_ledger_chunk is not None:
+            on_ledger_chunk(chunks_meta[-1])
 
     def _write_ledger_row(row: dict[str, Any]) -> None:
         nonlocal ledger_rows_written, chunk_rows_written
         assert ledger is not None
         ledger.write_row(row)
+        if bin_writer is not None:
+            bin_writer.write_row(row)
+        if on_ledger_row is not None:
+            on_ledger_row(row)
         ledger_rows_written += 1
         chunk_rows_written += 1
 
+    def _make_ledger_row(it: int, p: Passenger, event: DisruptionEvent, outcome: CompensationOutcome) -> dict[str, Any]:
+        return {
+            "run_id": run_id,
+            "iteration": it,
+            "seed": seed,
+            "passenger_id": p.id,
+            "segment": p.segment.value,
+            "refundable": p.refundable,
+            "dtype": event.dtype.value,
+            "delay_minutes": event.delay_minutes,
+            "cash_comp_eur": round(outcome.cash_comp_eur, 2),
+            "care_cost_eur": round(outcome.care_cost_eur, 2),
+            "refund_cost_eur": round(outcome.refund_cost_eur, 2),
+            "rebooking_cost_eur": round(outcome.rebooking_cost_eur, 2),
+            "total_cost_eur": round(outcome.total_cost_eur, 2),
+        }
+
+    # global_topk: one bounded min-heap over the whole run, keyed
+    # (cost, -iteration, -passenger_index) so ties keep the earliest outcome.
+    # Written as a single sorted chunk after the last iteration.
+    global_heap: list[tuple[tuple[float, int, int], dict[str, Any]]] | None = None
+
+    # optional fixed-width copy of the ledger for memory-mapped local analysis
+    bin_writer: BinaryLedgerWriter | None = None
+
     if audit in {"ledger", "both"}:
         ledger_dir = out / "ledger"
         ledger_dir.mkdir(parents=True, exist_ok=True)
         current_chunk = 0
         chunk_start_it = 0
-        _open_ledger_for_chunk(current_chunk)
+        if ledger_mode == "global_topk":
+            global_heap = []
+        else:
+            _open_ledger_for_chunk(current_chunk)
+        if ledger_binary:
+            bin_writer = BinaryLedgerWriter(
+                out,
+                [p.id for p in passengers],
+                {"segment": [v.value for v in Segment], "dtype": [v.value for v in DisruptionType]},
+            )
 
     # --- simulation ---
     rows: list[dict[str, Any]] = []
@@ -239,13 +394,7 @@ def run_monte_carlo(
 
         event = sample_disruption(cfg, rng)
 
-        rebook_cost = _sample_normal(
-            rng,
-            mean=eu_cfg.rebooking_cost_mean,
-            std=eu_cfg.rebooking_cost_std,
-            lo=0,
-            hi=2000,
-        )
+        rebook_cost = sample_rebooking_cost(eu_cfg, rng)
 
         total_cost = 0.0
         cash = 0.0
@@ -254,9 +403,10 @@ def run_monte_carlo(
         rebook_total = 0.0
 
         # topk heap: store only K passenger rows for this iteration
-        topk_heap: list[tuple[float, dict[str, Any]]] = []
+        # (passenger index breaks cost ties so rows are never compared)
+        topk_heap: list[tuple[float, int, dict[str, Any]]] = []
 
-        for p in passengers:
+        for pi, p in enumerate(passengers):
             outcome = assess_eu261(p, ctx, event, eu_cfg, sampled_rebooking_cost_eur=rebook_cost)
 
             total_cost += outcome.total_cost_eur
@@ -265,24 +415,29 @@ def run_monte_carlo(
             refund += outcome.refund_cost_eur
             rebook_total += outcome.rebooking_cost_eur
 
+            if global_heap is not None:
+                # Build the row dict only when the outcome enters the heap.
+                key = (outcome.total_cost_eur, -it, -pi)
+                if len(global_heap) < ledger_topk:
+                    heapq.heappush(global_heap, (key, _make_ledger_row(it, p, event, outcome)))
+                elif key > global_heap[0][0]:
+                    heapq.heapreplace(global_heap, (key, _make_ledger_row(it, p, event, outcome)))
+                continue
+
             if ledger is None:
                 continue
+            if ledger_mode == "passenger_sample" and not in_sample[pi]:
+                continue
 
-            ledger_row = {
-                "run_id": run_id,
-                "iteration": it,
-                "seed": seed,
-                "passenger_id": p.id,
-                "segment": p.segment.value,
-                "refundable": p.refundable,
-                "dtype": event.dtype.value,
-                "delay_minutes": event.delay_minutes,
-                "cash_comp_eur": round(outcome.cash_comp_eur, 2),
-                "care_cost_eur": round(outcome.care_cost_eur, 2),
-                "refund_cost_eur": round(outcome.refund_cost_eur, 2),
-                "rebooking_cost_eur": round(outcome.rebooking_cost_eur, 2),
-                "total_cost_eur": round(outcome.total_cost_eur, 2),
-            }
+            if weighted is not None:
+                prob = weighted.inclusion_prob(outcome.total_cost_eur)
+                if rng.random() < prob:
+                    ledger_row = _make_ledger_row(it, p, event, outcome)
+                    ledger_row[SAMPLE_WEIGHT_FIELD] = 1.0 / prob
+                    _write_ledger_row(ledger_row)
+                continue
+
+            ledger_row = _make_ledger_row(it, p, event, outcome)
 
             eligible_flag = outcome.cash_comp_eur > 0
 
@@ -294,6 +449,9 @@ def run_monte_carlo(
                 if rng.random() < ledger_sample:
                     _write_ledger_row(ledger_row)
 
+            elif ledger_mode == "passenger_sample":
+                _write_ledger_row(ledger_row)
+
             elif ledger_mode == "eligible":
                 if eligible_flag:
                     _write_ledger_row(ledger_row)
@@ -302,14 +460,14 @@ def run_monte_carlo(
                 # Keep only K by total_cost_eur using min-heap
                 cost_val = outcome.total_cost_eur
                 if len(topk_heap) < ledger_topk:
-                    heapq.heappush(topk_heap, (cost_val, ledger_row))
+                    heapq.heappush(topk_heap, (cost_val, -pi, ledger_row))
                 else:
                     if cost_val > topk_heap[0][0]:
-                        heapq.heapreplace(topk_heap, (cost_val, ledger_row))
+                        heapq.heapreplace(topk_heap, (cost_val, -pi, ledger_row))
 
         # Flush topk rows AFTER passenger loop
         if ledger is not None and ledger_mode == "topk":
-            for _, r in sorted(topk_heap, key=lambda x: x[0], reverse=True):
+            for _, _, r in sorted(topk_heap, key=lambda x: x[0], reverse=True):
                 _write_ledger_row(r)
 
         row = {
@@ -324,18 +482,20 @@ def run_monte_carlo(
         }
         rows.append(row)
 
-        audit_f.write(
-            json.dumps(
-                {"type": "iteration_result", "run_id": run_id, "seed": seed, "data": row},
-                ensure_ascii=False,
-            )
-            + "\n"
-        )
+        audit_log.emit({"type": "iteration_result", "data": row})
+
+    # global_topk: the whole ledger is one sorted chunk covering every iteration
+    if global_heap is not None:
+        _open_ledger_for_chunk(current_chunk)
+        for _, r in sorted(global_heap, key=lambda x: x[0], reverse=True):
+            _write_ledger_row(r)
 
     # close last chunk
     if ledger is not None:
         assert current_chunk is not None
         _close_and_record_chunk(chunk=current_chunk, end_iteration=iterations - 1)
+    if bin_writer is not None:
+        bin_writer.close(run_id=run_id, seed=seed, iterations=iterations, weighted=weighted is not None)
 
     # --- outputs ---
     df = pd.DataFrame(rows)
@@ -366,18 +526,21 @@ def run_monte_carlo(
                 "mode": ledger_mode,
                 "topk": ledger_topk,
                 "sample": ledger_sample,
+                "sampled_passengers": sum(in_sample) if ledger_mode == "passenger_sample" else None,
                 "chunk_size_iterations": ledger_chunk_size,
+                "block_rows": ledger_block_rows,
                 "dir": str(ledger_dir),
                 "fields": ledger_fields,
                 "total_rows_written": ledger_rows_written,
+                "merkle_root": merkle_root([ch["sha256"] for ch in chunks_meta]),
                 "chunks": chunks_meta,
             },
         }
         (out / "ledger_index.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
 
     # Run end marker
-    audit_f.write(json.dumps({"type": "run_end", "run_id": run_id, "summary": summary}, ensure_ascii=False) + "\n")
-    audit_f.close()
+    audit_log.emit({"type": "run_end", "summary": summary})
+    audit_log.close()
 
     report_html = f"""<!doctype html>
 <html>
@@ -395,12 +558,33 @@ def run_monte_carlo(
 <ul>
   <li>cost_distribution.csv</li>
   <li>summary.csv</li>
-  <li>events.jsonl (audit log)</li>
+  <li>events/events_*.jsonl.gz + events_index.json (hash-chained audit log)</li>
   <li>ledger/entitlements_chunk_*.csv.gz (passenger ledger; if audit=ledger|both)</li>
   <li>ledger_index.json (ledger chunk index; if audit=ledger|both)</li>
+  <li>config.json (config snapshot used for replay verification)</li>
+  <li>ledger.bin + ledger_bin.json (fixed-width ledger copy; if --ledger-binary)</li>
 </ul>
 </body>
 </html>"""
     (out / "report.html").write_text(report_html, encoding="utf-8")
 
+    if uploader is not None:
+        upload_run(out, uploader)
+
     return df, summary
+
+
+def upload_run(out: Path, uploader: Uploader) -> None:
+    """
+    Upload the run's artifacts not yet submitted to `uploader`, index files
+    only after everything they reference is stored, then close it.
+    """
+    files = run_artifacts(out)
+    with uploader:
+        for rel in files:
+            if rel not in uploader.submitted and rel not in _INDEX_FILES:
+                uploader.submit(rel, out / rel)
+        uploader.wait()
+        for rel in _INDEX_FILES:
+            if rel in files:
+                uploader.submit(rel, out / rel)
@@ -2,41 +2,73 @@ from __future__ import annotations
 
 import csv
 import gzip
+import heapq
 import json
 import math
 import random
-from collections.abc import Iterator
-from dataclasses import dataclass
+import sys
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
 from pathlib import Path
-
-
-def _parse_by(by: str) -> list[str]:
-    by = by.strip().lower()
-    if by in {"", "none"}:
-        return []
-    parts = [p.strip() for p in by.split(",") if p.strip()]
-    allowed = {"segment", "dtype"}
-    bad = [p for p in parts if p not in allowed]
-    if bad:
-        raise ValueError(f"Invalid --by value(s): {bad}. Allowed: none|segment|dtype|segment,dtype")
-    out: list[str] = []
-    for p in parts:
-        if p not in out:
-            out.append(p)
-    return out
-
-
-def _source_path(out_dir: str) -> Path:
+from typing import Any
+
+from pie.application.merge_ledger import SORTED_META_NAME, SORTED_NAME
+from pie.application.query import (
+    RangeFilter,
+    chunk_may_match,
+    group_value,
+    parse_group_by,
+    parse_where,
+)
+from pie.domain.runmeta import stable_hash
+from pie.infrastructure.io.ledger import (
+    SAMPLE_WEIGHT_FIELD,
+    file_sha256,
+    read_ledger_index,
+    resolve_ledger_dir,
+)
+
+# Bump when the on-disk partial layout changes; old sidecars are then ignored.
+STATS_CACHE_VERSION = 5
+
+# Per-passenger reservoirs only rank passengers (--exact-passengers gives exact
+# figures), and the cache holds one per passenger per chunk, so they are kept
+# much smaller than the group reservoirs: a chunk partial samples at most
+# PASSENGER_CHUNK_SAMPLE_SIZE rows of a passenger, the merged result at most
+# PASSENGER_SAMPLE_SIZE.
+PASSENGER_SAMPLE_SIZE = 256
+PASSENGER_CHUNK_SAMPLE_SIZE = 32
+
+# Finest grouping grain kept in cached partials; every --by within it rolls up
+# from the same sidecars. Other --by columns are appended to the grain.
+_GRAIN = ("segment", "dtype")
+
+
+def _source_paths(out_dir: str) -> tuple[Path, list[tuple[Path, dict | None]]]:
+    """
+    Returns (source, [(file, chunk_meta)]). Ledger chunks are preferred because
+    they carry zone maps and let the stats cache skip unchanged chunks; the
+    merged file (no chunk meta) is the fallback for out dirs that only ship
+    entitlements.csv.gz.
+    """
     out = Path(out_dir)
     merged = out / "entitlements.csv.gz"
+
+    idx = read_ledger_index(out)
+    if idx is not None:
+        ledger = idx["ledger"]
+        ledger_dir = resolve_ledger_dir(out, ledger)
+        files = [(ledger_dir / ch["file"], ch) for ch in ledger["chunks"]]
+        if files and all(f.exists() for f, _ in files):
+            return ledger_dir, files
+
     if merged.exists():
-        return merged
+        return merged, [(merged, None)]
 
-    idx = out / "ledger_index.json"
-    if idx.exists():
+    if idx is not None:
         raise FileNotFoundError(
-            "Missing out/entitlements.csv.gz. Run: pie merge-ledger --out out "
-            "(or simulate with --ledger-merge)."
+            "Missing ledger chunks and out/entitlements.csv.gz. Re-run: pie simulate --out out "
+            "(or pie merge-ledger --out out)."
         )
     raise FileNotFoundError("No entitlements.csv.gz and no ledger_index.json found in out dir.")
 
@@ -66,30 +98,121 @@ def _q_from_sorted(sorted_vals: list[float], q: float) -> float:
     return float(sorted_vals[lo] * (1 - w) + sorted_vals[hi] * w)
 
 
+def _wq_from_sorted(pairs: list[tuple[float, float]], q: float) -> float:
+    """
+    Weighted quantile over (value, weight) pairs sorted by value: the first
+    value whose cumulative weight reaches q of the total.
+    """
+    if not pairs:
+        return float("nan")
+    target = q * sum(w for _, w in pairs)
+    acc = 0.0
+    for x, w in pairs:
+        acc += w
+        if acc >= target:
+            return float(x)
+    return float(pairs[-1][0])
+
+
+def _num(row: dict[str, str], name: str) -> float:
+    try:
+        return float(row.get(name, "0") or 0)
+    except ValueError:
+        return 0.0
+
+
 @dataclass
 class Reservoir:
+    """
+    Uniform sample of rows. Rows from a weighted ledger keep their sample
+    weight next to the value (`weights` stays None while every weight is 1),
+    and quantiles are then weighted.
+    """
+
     k: int
     rng: random.Random
     n: int = 0
     data: list[float] = None  # type: ignore
+    weights: list[float] | None = None
 
     def __post_init__(self) -> None:
         self.data = []
 
-    def add(self, x: float) -> None:
+    def add(self, x: float, w: float = 1.0) -> None:
         self.n += 1
         if self.k <= 0:
             return
+        if w != 1.0 and self.weights is None:
+            self.weights = [1.0] * len(self.data)
         if len(self.data) < self.k:
             self.data.append(x)
+            if self.weights is not None:
+                self.weights.append(w)
             return
         j = self.rng.randint(1, self.n)
         if j <= self.k:
             self.data[j - 1] = x
+            if self.weights is not None:
+                self.weights[j - 1] = w
+
+    def _pairs(self) -> list[tuple[float, float]]:
+        return list(zip(self.data, self.weights or [1.0] * len(self.data), strict=True))
+
+    def merge(self, other: Reservoir) -> None:
+        """
+        Fold another reservoir in, keeping a uniform sample of the union.
+        Each kept value stands for n/len(data) rows of its side, so slots are
+        drawn from the side with the larger remaining represented population.
+        """
+        total = self.n + other.n
+        weighted = self.weights is not None or other.weights is not None
+        if len(self.data) + len(other.data) <= self.k and len(self.data) == self.n and len(other.data) == other.n:
+            merged = self._pairs() + other._pairs()
+        else:
+            a = self._pairs()
+            b = other._pairs()
+            self.rng.shuffle(a)
+            self.rng.shuffle(b)
+            wa = self.n / len(a) if a else 0.0
+            wb = other.n / len(b) if b else 0.0
+
+            merged = []
+            while len(merged) < self.k and (a or b):
+                ra = wa * len(a)
+                rb = wb * len(b)
+                if self.rng.random() * (ra + rb) < ra:
+                    merged.append(a.pop())
+                else:
+                    merged.append(b.pop())
+
+        self.data = [x for x, _ in merged]
+        self.weights = [w for _, w in merged] if weighted else None
+        self.n = total
+
+    def state(self) -> dict[str, Any]:
+        st: dict[str, Any] = {"k": self.k, "n": self.n, "data": self.data}
+        if self.weights is not None:
+            st["w"] = self.weights
+        return st
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any], rng: random.Random) -> Reservoir:
+        r = cls(k=int(state["k"]), rng=rng, n=int(state["n"]))
+        r.data = [float(x) for x in state["data"]]
+        if state.get("w") is not None:
+            r.weights = [float(w) for w in state["w"]]
+        return r
 
     def quantiles(self) -> dict[str, float]:
         if not self.data:
             return {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+        if self.weights is not None:
+            pairs = sorted(self._pairs())
+            return {
+                "p50": _wq_from_sorted(pairs, 0.50),
+                "p95": _wq_from_sorted(pairs, 0.95),
+                "p99": _wq_from_sorted(pairs, 0.99),
+            }
         s = sorted(self.data)
         return {
             "p50": _q_from_sorted(s, 0.50),
@@ -100,7 +223,14 @@ class Reservoir:
 
 @dataclass
 class GroupAgg:
+    """
+    Per-group aggregates. `rows` counts ledger rows; `weight` sums their
+    sample weights (equal to rows for unweighted ledgers) and is what the
+    sums, means and reported row counts are scaled by.
+    """
+
     rows: int = 0
+    weight: float = 0.0
     sum_total: float = 0.0
     min_total: float = float("inf")
     max_total: float = float("-inf")
@@ -112,16 +242,70 @@ class GroupAgg:
 
     res: Reservoir = None  # type: ignore
 
+    def add(self, total: float, row: dict[str, str], w: float = 1.0) -> None:
+        self.rows += 1
+        self.weight += w
+        self.sum_total += w * total
+        self.min_total = min(self.min_total, total)
+        self.max_total = max(self.max_total, total)
+        self.res.add(total, w)
+
+        self.sum_cash += w * _num(row, "cash_comp_eur")
+        self.sum_care += w * _num(row, "care_cost_eur")
+        self.sum_refund += w * _num(row, "refund_cost_eur")
+        self.sum_rebook += w * _num(row, "rebooking_cost_eur")
+
+    def merge(self, other: GroupAgg) -> None:
+        self.rows += other.rows
+        self.weight += other.weight
+        self.sum_total += other.sum_total
+        self.min_total = min(self.min_total, other.min_total)
+        self.max_total = max(self.max_total, other.max_total)
+        self.sum_cash += other.sum_cash
+        self.sum_care += other.sum_care
+        self.sum_refund += other.sum_refund
+        self.sum_rebook += other.sum_rebook
+        self.res.merge(other.res)
+
+    def state(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "weight": self.weight,
+            "sum_total": self.sum_total,
+            "min_total": self.min_total if self.rows else None,
+            "max_total": self.max_total if self.rows else None,
+            "sum_cash": self.sum_cash,
+            "sum_care": self.sum_care,
+            "sum_refund": self.sum_refund,
+            "sum_rebook": self.sum_rebook,
+            "res": self.res.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any], rng: random.Random) -> GroupAgg:
+        return cls(
+            rows=int(state["rows"]),
+            weight=float(state["weight"]),
+            sum_total=float(state["sum_total"]),
+            min_total=float("inf") if state["min_total"] is None else float(state["min_total"]),
+            max_total=float("-inf") if state["max_total"] is None else float(state["max_total"]),
+            sum_cash=float(state["sum_cash"]),
+            sum_care=float(state["sum_care"]),
+            sum_refund=float(state["sum_refund"]),
+            sum_rebook=float(state["sum_rebook"]),
+            res=Reservoir.from_state(state["res"], rng),
+        )
+
     def as_dict(self) -> dict[str, float]:
         if self.res is None:
             q = {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
         else:
             q = self.res.quantiles()
 
-        mean = self.sum_total / self.rows if self.rows else float("nan")
+        mean = self.sum_total / self.weight if self.rows else float("nan")
 
         return {
-            "rows": float(self.rows),
+            "rows": float(self.weight),
             "mean_total_cost_eur": float(mean),
             "sum_total_cost_eur": float(self.sum_total),
             "min_total_cost_eur": float(self.min_total if self.rows else float("nan")),
@@ -139,15 +323,49 @@ class GroupAgg:
 @dataclass
 class PassengerAgg:
     rows: int = 0
+    weight: float = 0.0
     sum_total: float = 0.0
     max_total: float = float("-inf")
     res: Reservoir = None  # type: ignore
 
+    def add(self, total: float, w: float = 1.0) -> None:
+        self.rows += 1
+        self.weight += w
+        self.sum_total += w * total
+        self.max_total = max(self.max_total, total)
+        self.res.add(total, w)
+
+    def merge(self, other: PassengerAgg) -> None:
+        self.rows += other.rows
+        self.weight += other.weight
+        self.sum_total += other.sum_total
+        self.max_total = max(self.max_total, other.max_total)
+        self.res.merge(other.res)
+
+    def state(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "weight": self.weight,
+            "sum_total": self.sum_total,
+            "max_total": self.max_total if self.rows else None,
+            "res": self.res.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, Any], rng: random.Random) -> PassengerAgg:
+        return cls(
+            rows=int(state["rows"]),
+            weight=float(state["weight"]),
+            sum_total=float(state["sum_total"]),
+            max_total=float("-inf") if state["max_total"] is None else float(state["max_total"]),
+            res=Reservoir.from_state(state["res"], rng),
+        )
+
     def score(self, metric: str) -> float:
         if self.rows == 0:
             return float("-inf")
         if metric == "mean":
-            return self.sum_total / self.rows
+            return self.sum_total / self.weight
         if metric == "sum":
             return self.sum_total
         if metric == "max":
@@ -158,7 +376,7 @@ class PassengerAgg:
         raise ValueError(f"Invalid metric: {metric}")
 
     def as_row(self, passenger_id: str) -> dict[str, float | str]:
-        mean = self.sum_total / self.rows if self.rows else float("nan")
+        mean = self.sum_total / self.weight if self.rows else float("nan")
         if self.res is None:
             qs = {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
         else:
@@ -166,7 +384,7 @@ class PassengerAgg:
 
         return {
             "passenger_id": passenger_id,
-            "rows": float(self.rows),
+            "rows": float(self.weight),
             "mean_total_cost_eur": float(mean),
             "sum_total_cost_eur": float(self.sum_total),
             "max_total_cost_eur": float(self.max_total if self.rows else float("nan")),
@@ -176,92 +394,280 @@ class PassengerAgg:
         }
 
 
-def compute_stats_v2(
-    out_dir: str,
-    top: int = 20,
-    by: str = "segment",
-    metric: str = "mean",
-    fmt: str = "both",
-    min_cost: float = 0.0,
-    sample_size: int = 5000,
-    seed: int = 1337,
-) -> dict:
-    metric = metric.strip().lower()
-    if metric not in {"mean", "sum", "max", "p95"}:
-        raise ValueError("metric must be one of: mean|sum|max|p95")
-
-    fmt = fmt.strip().lower()
-    if fmt not in {"json", "csv", "both"}:
-        raise ValueError("format must be one of: json|csv|both")
+@dataclass
+class ChunkPartial:
+    """
+    Aggregates of one ledger file at the partial grain (grain x passenger).
+    """
+
+    chunk_hash: str
+    total_rows: int = 0
+    kept_rows: int = 0
+    groups: dict[tuple[str, ...], GroupAgg] = field(default_factory=dict)
+    pax: dict[str, PassengerAgg] = field(default_factory=dict)
+
+    def state(self) -> dict[str, Any]:
+        return {
+            "chunk_hash": self.chunk_hash,
+            "total_rows": self.total_rows,
+            "kept_rows": self.kept_rows,
+            "groups": [[list(k), g.state()] for k, g in self.groups.items()],
+            "pax": {pid: pa.state() for pid, pa in self.pax.items()},
+        }
 
-    if top <= 0:
-        raise ValueError("--top must be > 0")
-    if min_cost < 0:
-        raise ValueError("--min-cost must be >= 0")
-    if sample_size < 0:
-        raise ValueError("--sample-size must be >= 0")
+    @classmethod
+    def from_state(cls, state: dict[str, Any], rng: random.Random) -> ChunkPartial:
+        return cls(
+            chunk_hash=str(state["chunk_hash"]),
+            total_rows=int(state["total_rows"]),
+            kept_rows=int(state["kept_rows"]),
+            groups={tuple(k): GroupAgg.from_state(g, rng) for k, g in state["groups"]},
+            pax={pid: PassengerAgg.from_state(pa, rng) for pid, pa in state["pax"].items()},
+        )
 
-    keys = _parse_by(by)
-    src = _source_path(out_dir)
 
-    rng = random.Random(seed)
+def _rollup_key(grain_key: tuple[str, ...], grain: list[str], keys: list[str]) -> str:
+    if not keys:
+        return "all"
+    values = dict(zip(grain, grain_key, strict=True))
+    return "|".join(f"{k}={values[k]}" for k in keys)
+
+
+@dataclass(frozen=True)
+class StatsQuery:
+    """
+    One stats request. Several queries over the same ledger are answered by
+    compute_stats_multi in a single pass.
+    """
+
+    name: str = "default"
+    top: int = 20
+    by: str = "segment"
+    metric: str = "mean"
+    min_cost: float = 0.0
+    where: tuple[str, ...] = ()
+    delay_bucket: int = 60
+
+    @classmethod
+    def from_dict(cls, d: dict[str, Any]) -> StatsQuery:
+        unknown = set(d) - {"name", "top", "by", "metric", "min_cost", "where", "delay_bucket"}
+        if unknown:
+            raise ValueError(f"Unknown stats query key(s): {sorted(unknown)}")
+        where = d.get("where", ())
+        return cls(
+            name=str(d.get("name", "default")),
+            top=int(d.get("top", 20)),
+            by=str(d.get("by", "segment")),
+            metric=str(d.get("metric", "mean")).strip().lower(),
+            min_cost=float(d.get("min_cost", 0.0)),
+            where=(where,) if isinstance(where, str) else tuple(where),
+            delay_bucket=int(d.get("delay_bucket", 60)),
+        )
 
-    groups: dict[str, GroupAgg] = {}
-    pax: dict[str, PassengerAgg] = {}
+    def validate(self) -> None:
+        if self.metric not in {"mean", "sum", "max", "p95"}:
+            raise ValueError("metric must be one of: mean|sum|max|p95")
+        if self.top <= 0:
+            raise ValueError("--top must be > 0")
+        if self.min_cost < 0:
+            raise ValueError("--min-cost must be >= 0")
+        if self.delay_bucket <= 0:
+            raise ValueError("--delay-bucket must be > 0")
 
-    total_rows = 0
-    kept_rows = 0
+    def filters(self) -> list[RangeFilter]:
+        filters = parse_where(self.where)
+        if self.min_cost > 0:
+            filters.append(RangeFilter("total_cost_eur", lo=float(self.min_cost)))
+        return filters
 
-    for row in _iter_rows_gz(src):
-        total_rows += 1
 
+@dataclass
+class _PartialSpec:
+    """
+    What a chunk partial depends on. Queries that only differ in metric, top
+    or a --by within the same grain share one spec (and one cache entry).
+    """
+
+    params: dict[str, Any]
+    filters: list[RangeFilter]
+
+    @property
+    def key(self) -> str:
+        return stable_hash(self.params)
+
+
+def _partial_spec(q: StatsQuery, sample_size: int, seed: int) -> _PartialSpec:
+    keys = parse_group_by(q.by)
+    filters = q.filters()
+    grain = list(dict.fromkeys([*_GRAIN, *keys]))
+    params = {
+        "v": STATS_CACHE_VERSION,
+        "grain": grain,
+        "delay_bucket": int(q.delay_bucket) if "delay_minutes" in grain else 1,
+        "filters": sorted(f.spec() for f in filters),
+        "sample_size": int(sample_size),
+        "seed": int(seed),
+    }
+    return _PartialSpec(params=params, filters=filters)
+
+
+def _scan_partials(path: Path, chunk_hash: str, specs: list[_PartialSpec]) -> list[ChunkPartial]:
+    """
+    One decompress + parse of `path`, feeding every spec's aggregates.
+    """
+    return _partials_from_rows(_iter_rows_gz(path), chunk_hash, specs, path.name)
+
+
+def _partials_from_rows(
+    rows: Iterable[dict[str, str]], chunk_hash: str, specs: list[_PartialSpec], source: str
+) -> list[ChunkPartial]:
+    builder = _PartialBuilder(specs, source)
+    for row in rows:
+        builder.add(row)
+    return builder.finish(chunk_hash)
+
+
+_Plan = tuple[ChunkPartial, list[RangeFilter], list[str], int, int, random.Random]
+
+
+class _PartialBuilder:
+    """
+    Folds the rows of one ledger file into a ChunkPartial per spec as they
+    arrive; only the running aggregates are kept.
+    """
+
+    def __init__(self, specs: list[_PartialSpec], source: str) -> None:
+        self.specs = specs
+        self.source = source
+        self.parts = [ChunkPartial(chunk_hash="") for _ in specs]
+        self.total_rows = 0
+        self._plans: list[_Plan] | None = None
+
+    def _make_plans(self, first: dict[str, str]) -> list[_Plan]:
+        plans: list[_Plan] = []
+        for spec, part in zip(self.specs, self.parts, strict=True):
+            p = spec.params
+            # Seeded by the file's first row, which is known before its digest, so a partial is
+            # identical whether fed while the file is written, scanned later or loaded from cache.
+            origin = ":".join(first.get(k, "") for k in ("run_id", "iteration", "passenger_id"))
+            rng = random.Random(f"{p['seed']}:{origin}")
+            plans.append((part, spec.filters, list(p["grain"]), int(p["delay_bucket"]), int(p["sample_size"]), rng))
+        return plans
+
+    def add(self, row: dict[str, str]) -> None:
+        self.total_rows += 1
         try:
             total = float(row["total_cost_eur"])
         except (KeyError, ValueError) as e:
-            raise ValueError(f"Bad total_cost_eur at row {total_rows}: {e}") from e
-
-        if total < min_cost:
-            continue
-        kept_rows += 1
-
-        if not keys:
-            gkey = "all"
-        else:
-            parts = [f"{k}={row.get(k, '')}" for k in keys]
-            gkey = "|".join(parts)
-
-        if gkey not in groups:
-            groups[gkey] = GroupAgg(res=Reservoir(k=sample_size, rng=rng))
-        g = groups[gkey]
-
-        g.rows += 1
-        g.sum_total += total
-        g.min_total = min(g.min_total, total)
-        g.max_total = max(g.max_total, total)
-        g.res.add(total)
-
-        # Fix B023: don't close over loop var in nested function
-        def _f(r: dict[str, str], name: str) -> float:
-            try:
-                return float(r.get(name, "0") or 0)
-            except ValueError:
-                return 0.0
-
-        g.sum_cash += _f(row, "cash_comp_eur")
-        g.sum_care += _f(row, "care_cost_eur")
-        g.sum_refund += _f(row, "refund_cost_eur")
-        g.sum_rebook += _f(row, "rebooking_cost_eur")
+            raise ValueError(f"Bad total_cost_eur at row {self.total_rows} of {self.source}: {e}") from e
+        if self._plans is None:
+            self._plans = self._make_plans(row)
 
         pid = row.get("passenger_id", "")
-        if pid:
-            if pid not in pax:
-                pax[pid] = PassengerAgg(res=Reservoir(k=min(sample_size, 2000), rng=rng))
-            pa = pax[pid]
-            pa.rows += 1
-            pa.sum_total += total
-            pa.max_total = max(pa.max_total, total)
-            pa.res.add(total)
-
+        w = float(row.get(SAMPLE_WEIGHT_FIELD) or 1.0)
+
+        for part, filters, grain, delay_bucket, sample_size, rng in self._plans:
+            if filters and not row_matches(row, total, filters):
+                continue
+            part.kept_rows += 1
+
+            gkey = tuple(group_value(row, k, delay_bucket) for k in grain)
+            if gkey not in part.groups:
+                part.groups[gkey] = GroupAgg(res=Reservoir(k=sample_size, rng=rng))
+            part.groups[gkey].add(total, row, w)
+
+            if pid:
+                if pid not in part.pax:
+                    part.pax[pid] = PassengerAgg(res=Reservoir(k=min(sample_size, PASSENGER_CHUNK_SAMPLE_SIZE), rng=rng))
+                part.pax[pid].add(total, w)
+
+    def finish(self, chunk_hash: str) -> list[ChunkPartial]:
+        for part in self.parts:
+            part.chunk_hash = chunk_hash
+            part.total_rows = self.total_rows
+        return self.parts
+
+
+def row_matches(row: dict[str, str], total: float, filters: list[RangeFilter]) -> bool:
+    for f in filters:
+        v = total if f.column == "total_cost_eur" else _num(row, f.column)
+        if not f.matches(v):
+            return False
+    return True
+
+
+def _cache_path(cache_dir: Path, chunk_hash: str, spec: _PartialSpec) -> Path:
+    return cache_dir / f"{chunk_hash[:32]}_{spec.key}.json.gz"
+
+
+def _chunk_partials(
+    path: Path,
+    meta: Mapping[str, Any] | None,
+    specs: list[_PartialSpec],
+    cache_dir: Path | None,
+    fed: Mapping[tuple[str, str], ChunkPartial] | None = None,
+) -> tuple[list[ChunkPartial], list[bool]]:
+    """
+    Returns (partials, cache_hit) aligned with specs. Specs missing from the
+    cache are computed together in one scan, unless a StatsFeed already built
+    them in memory (`fed`). Ledger chunks are keyed by the sha256 recorded in
+    ledger_index.json (`pie verify` checks it against the bytes); only the
+    merged file, which has no chunk meta, is hashed here.
+    """
+    chunk_hash = str(meta["sha256"]) if meta is not None else file_sha256(path)
+    partials: list[ChunkPartial | None] = [None] * len(specs)
+    hits = [False] * len(specs)
+
+    if cache_dir is not None:
+        for i, spec in enumerate(specs):
+            cached = _cache_path(cache_dir, chunk_hash, spec)
+            if not cached.exists():
+                continue
+            rng = random.Random(f"{spec.params['seed']}:{chunk_hash}")
+            try:
+                with gzip.open(cached, "rt", encoding="utf-8") as f:
+                    partials[i] = ChunkPartial.from_state(json.load(f), rng)
+                hits[i] = True
+            except (OSError, ValueError, KeyError):
+                cached.unlink(missing_ok=True)
+
+    missing = [i for i, p in enumerate(partials) if p is None]
+    if missing:
+        to_scan = [i for i in missing if fed is None or (chunk_hash, specs[i].key) not in fed]
+        scanned = (
+            dict(zip(to_scan, _scan_partials(path, chunk_hash, [specs[i] for i in to_scan]), strict=True))
+            if to_scan
+            else {}
+        )
+        for i in missing:
+            partial = scanned[i] if i in scanned else fed[(chunk_hash, specs[i].key)]  # type: ignore[index]
+            partials[i] = partial
+            if cache_dir is not None:
+                cache_dir.mkdir(parents=True, exist_ok=True)
+                cached = _cache_path(cache_dir, chunk_hash, specs[i])
+                tmp = cached.with_name(cached.name + ".tmp")
+                with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                    json.dump(partial.state(), f, separators=(",", ":"))
+                tmp.replace(cached)
+
+    return [p for p in partials if p is not None], hits
+
+
+def _prune_cache(cache_dir: Path, spec: _PartialSpec, live_hashes: set[str]) -> None:
+    """
+    Drop sidecars for chunks that no longer exist with these parameters.
+    Entries built with other parameters are left for their own invocations.
+    """
+    if not cache_dir.is_dir():
+        return
+    live = {h[:32] for h in live_hashes}
+    suffix = f"_{spec.key}.json.gz"
+    for p in cache_dir.glob(f"*{suffix}"):
+        if p.name[: -len(suffix)] not in live:
+            p.unlink(missing_ok=True)
+
+
+def rank_passengers(pax: dict[str, PassengerAgg], metric: str, top: int) -> list[dict[str, float | str]]:
     top_items: list[tuple[float, str, PassengerAgg]] = []
     for pid, pa in pax.items():
         top_items.append((pa.score(metric), pid, pa))
@@ -274,23 +680,264 @@ def compute_stats_v2(
         r["score"] = float(sc)
         r["metric"] = metric
         top_passengers.append(r)
+    return top_passengers
 
-    groups_out = {k: v.as_dict() for k, v in groups.items()}
 
-    return {
-        "ok": True,
-        "out_dir": out_dir,
-        "source": str(src),
-        "by": by,
-        "metric": metric,
-        "format": fmt,
-        "min_cost": float(min_cost),
-        "sample_size": int(sample_size),
-        "total_rows": int(total_rows),
-        "kept_rows": int(kept_rows),
-        "groups": groups_out,
-        "top_passengers": top_passengers,
-    }
+def exact_top_passengers(out_dir: str, queries: list[StatsQuery]) -> list[list[dict[str, float | str]]]:
+    """
+    Per-passenger rankings streamed from the passenger-sorted ledger written by
+    `pie merge-ledger --sort-by passenger`, one passenger at a time: memory is
+    one passenger's rows plus `top` results per query, however many passengers
+    there are, and quantiles are exact. One scan serves every query.
+    """
+    out = Path(out_dir)
+    path = out / SORTED_NAME
+    meta_path = out / SORTED_META_NAME
+    if not path.exists() or not meta_path.exists():
+        raise FileNotFoundError(f"Missing {path}. Run: pie merge-ledger --out {out_dir} --sort-by passenger")
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    idx = read_ledger_index(out)
+    if idx is not None and meta.get("run_id") != idx["run_id"]:
+        raise ValueError(f"Stale {path}: built for run {meta.get('run_id')}, ledger is {idx['run_id']}")
+
+    plans = [(q, q.filters()) for q in queries]
+    heaps: list[list[tuple[float, str, PassengerAgg]]] = [[] for _ in plans]
+    rng = random.Random(0)  # unused: exact reservoirs never evict
+    cur_pid: str | None = None
+    current: list[PassengerAgg] = []
+
+    def flush() -> None:
+        for (q, _), heap, pa in zip(plans, heaps, current, strict=True):
+            if pa.rows == 0:
+                continue
+            item = (pa.score(q.metric), cur_pid or "", pa)
+            if len(heap) < q.top:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+    for row in _iter_rows_gz(path):
+        pid = row.get("passenger_id", "")
+        if pid != cur_pid:
+            if current:
+                flush()
+            cur_pid = pid
+            current = [PassengerAgg(res=Reservoir(k=sys.maxsize, rng=rng)) for _ in plans]
+        total = float(row["total_cost_eur"])
+        w = float(row.get(SAMPLE_WEIGHT_FIELD) or 1.0)
+        for (_, filters), pa in zip(plans, current, strict=True):
+            if filters and not row_matches(row, total, filters):
+                continue
+            pa.add(total, w)
+    if current:
+        flush()
+
+    return [
+        rank_passengers({pid: pa for _, pid, pa in heap}, q.metric, q.top)
+        for (q, _), heap in zip(plans, heaps, strict=True)
+    ]
+
+
+class StatsFeed:
+    """
+    Builds chunk partials from ledger rows while they are being written
+    (run_monte_carlo's on_ledger_row/on_ledger_chunk hooks), so stats over a
+    fresh run never re-read the chunks. Rows are folded into the running
+    aggregates of the chunk being written as they arrive, never buffered.
+    Partials are keyed like the stats cache, so results are identical to a
+    later compute_stats_multi over the files.
+    """
+
+    def __init__(self, queries: list[StatsQuery], sample_size: int = 5000, seed: int = 1337) -> None:
+        specs = [_partial_spec(q, sample_size, seed) for q in queries]
+        self.specs = list({spec.key: spec for spec in specs}.values())
+        self.partials: dict[tuple[str, str], ChunkPartial] = {}
+        self.rows = 0
+        self._builder = _PartialBuilder(self.specs, "the ledger chunk being written")
+
+    def row(self, row: Mapping[str, Any]) -> None:
+        # Same text as the CSV writer produces, so grouping labels match.
+        self._builder.add({k: "" if v is None else str(v) for k, v in row.items()})
+        self.rows += 1
+
+    def chunk(self, meta: Mapping[str, Any]) -> None:
+        chunk_hash = str(meta["sha256"])
+        for spec, part in zip(self.specs, self._builder.finish(chunk_hash), strict=True):
+            self.partials[(chunk_hash, spec.key)] = part
+        self._builder = _PartialBuilder(self.specs, "the ledger chunk being written")
+
+
+def compute_stats_multi(
+    out_dir: str,
+    queries: list[StatsQuery],
+    sample_size: int = 5000,
+    seed: int = 1337,
+    cache: bool = True,
+    exact_passengers: bool = False,
+    feed: StatsFeed | None = None,
+) -> dict[str, dict]:
+    """
+    Answer several stats queries with at most one read of each ledger chunk.
+    Returns {query.name: result}, each result shaped like compute_stats_v2's.
+    With exact_passengers, top passengers come from exact_top_passengers
+    (one extra scan of the passenger-sorted ledger) instead of reservoirs.
+    Chunks a StatsFeed saw being written are not read at all.
+    """
+    if not queries:
+        raise ValueError("At least one stats query is required")
+    names = [q.name for q in queries]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stats query names: {names}")
+    if sample_size < 0:
+        raise ValueError("--sample-size must be >= 0")
+    for q in queries:
+        q.validate()
+
+    src, files = _source_paths(out_dir)
+    cache_dir = Path(out_dir) / "stats_cache" if cache else None
+
+    specs: dict[str, _PartialSpec] = {}
+    q_spec: list[str] = []
+    for q in queries:
+        spec = _partial_spec(q, sample_size, seed)
+        specs.setdefault(spec.key, spec)
+        q_spec.append(spec.key)
+    spec_keys = list(specs)
+
+    # partials[spec_key] -> one ChunkPartial per file
+    partials: dict[str, list[ChunkPartial]] = {k: [] for k in spec_keys}
+    hits = dict.fromkeys(spec_keys, 0)
+    pruned = dict.fromkeys(spec_keys, 0)
+
+    for path, meta in files:
+        # Zone-map pushdown: a spec whose filters exclude the chunk never reads it.
+        live: list[str] = []
+        for k in spec_keys:
+            if meta is not None and (
+                int(meta["rows_written"]) == 0 or not chunk_may_match(meta.get("zone_map"), specs[k].filters)
+            ):
+                partials[k].append(ChunkPartial(chunk_hash="", total_rows=int(meta["rows_written"])))
+                pruned[k] += 1
+            else:
+                live.append(k)
+        if not live:
+            continue
+
+        got, hit = _chunk_partials(path, meta, [specs[k] for k in live], cache_dir, feed.partials if feed else None)
+        for k, partial, h in zip(live, got, hit, strict=True):
+            partials[k].append(partial)
+            hits[k] += int(h)
+
+    if cache_dir is not None:
+        for k in spec_keys:
+            _prune_cache(cache_dir, specs[k], {p.chunk_hash for p in partials[k] if p.chunk_hash})
+
+    results: dict[str, dict] = {}
+    for q, k in zip(queries, q_spec, strict=True):
+        spec = specs[k]
+        keys = parse_group_by(q.by)
+        grain = list(spec.params["grain"])
+        rng = random.Random(seed)
+
+        groups: dict[str, GroupAgg] = {}
+        pax: dict[str, PassengerAgg] = {}
+
+        total_rows = 0
+        kept_rows = 0
+
+        for partial in partials[k]:
+            total_rows += partial.total_rows
+            kept_rows += partial.kept_rows
+
+            for grain_key, ga in partial.groups.items():
+                gkey = _rollup_key(grain_key, grain, keys)
+                if gkey not in groups:
+                    groups[gkey] = GroupAgg(res=Reservoir(k=sample_size, rng=rng))
+                groups[gkey].merge(ga)
+
+            for pid, pa in partial.pax.items():
+                if pid not in pax:
+                    pax[pid] = PassengerAgg(res=Reservoir(k=min(sample_size, PASSENGER_SAMPLE_SIZE), rng=rng))
+                pax[pid].merge(pa)
+
+        results[q.name] = {
+            "ok": True,
+            "out_dir": out_dir,
+            "query": q.name,
+            "source": str(src),
+            "chunks": len(files),
+            "pruned_chunks": pruned[k],
+            "cache": {
+                "enabled": cache_dir is not None,
+                "hits": hits[k],
+                "misses": len(files) - pruned[k] - hits[k],
+            },
+            "by": q.by,
+            "where": [f.spec() for f in spec.filters],
+            "delay_bucket": int(q.delay_bucket),
+            "metric": q.metric,
+            "min_cost": float(q.min_cost),
+            "sample_size": int(sample_size),
+            "total_rows": int(total_rows),
+            "kept_rows": int(kept_rows),
+            "groups": {gk: g.as_dict() for gk, g in groups.items()},
+            "top_passengers": rank_passengers(pax, q.metric, q.top),
+            "exact_passengers": exact_passengers,
+        }
+
+    if exact_passengers:
+        for q, top_passengers in zip(queries, exact_top_passengers(out_dir, queries), strict=True):
+            results[q.name]["top_passengers"] = top_passengers
+
+    return results
+
+
+def compute_stats_v2(
+    out_dir: str,
+    top: int = 20,
+    by: str = "segment",
+    metric: str = "mean",
+    fmt: str = "both",
+    min_cost: float = 0.0,
+    sample_size: int = 5000,
+    seed: int = 1337,
+    cache: bool = True,
+    where: list[str] | None = None,
+    delay_bucket: int = 60,
+    queries: list[StatsQuery | dict[str, Any]] | None = None,
+    exact_passengers: bool = False,
+    feed: StatsFeed | None = None,
+) -> dict:
+    """
+    Single-query stats (the classic CLI path). Passing `queries` answers all
+    of them in one pass and returns {"queries": {name: result}} instead; the
+    single-query arguments are then ignored.
+    """
+    fmt = fmt.strip().lower()
+    if fmt not in {"json", "csv", "both"}:
+        raise ValueError("format must be one of: json|csv|both")
+
+    if queries is not None:
+        qs = [q if isinstance(q, StatsQuery) else StatsQuery.from_dict(q) for q in queries]
+        res = compute_stats_multi(
+            out_dir, qs, sample_size=sample_size, seed=seed, cache=cache, exact_passengers=exact_passengers, feed=feed
+        )
+        return {"ok": True, "out_dir": out_dir, "format": fmt, "queries": res}
+
+    q = StatsQuery(
+        top=top,
+        by=by,
+        metric=metric.strip().lower(),
+        min_cost=min_cost,
+        where=tuple(where or ()),
+        delay_bucket=delay_bucket,
+    )
+    res = compute_stats_multi(
+        out_dir, [q], sample_size=sample_size, seed=seed, cache=cache, exact_passengers=exact_passengers, feed=feed
+    )[q.name]
+    res.pop("query")
+    res["format"] = fmt
+    return res
 
 
 def write_stats_artifacts_v2(out_dir: str, stats: dict) -> dict[str, str]:
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+from html import escape
+
+# Colors follow the dashboard theme (the :root variables in dashboard._page_html).
+_BAR = "#6aa6ff"
+_TEXT = "#e8eefc"
+_MUTED = "#a9b4cc"
+_GRID = "rgba(255,255,255,.08)"
+
+_W, _H = 640, 320
+_LEFT, _RIGHT, _TOP = 72, 16, 34
+_MAX_LABELS = 40
+
+
+def _nice_ticks(hi: float, n: int = 5) -> list[float]:
+    """
+    0-based axis ticks with a 1/2/5 x 10^k step covering [0, hi].
+    """
+    if not math.isfinite(hi) or hi <= 0:
+        return [0.0, 1.0]
+    raw = hi / n
+    mag = 10 ** math.floor(math.log10(raw))
+    step = next(m * mag for m in (1, 2, 5, 10) if m * mag >= raw)
+    return [i * step for i in range(math.ceil(hi / step - 1e-9) + 1)]
+
+
+def _fmt_tick(v: float) -> str:
+    a = abs(v)
+    if a >= 1e6:
+        return f"{v / 1e6:.4g}M"
+    if a >= 1e3:
+        return f"{v / 1e3:.4g}k"
+    return f"{v:.4g}"
+
+
+def _frame(title: str, xlabel: str, ylabel: str, bottom: int, ticks: list[float], body: list[str]) -> str:
+    plot_h = _H - _TOP - bottom
+    top_v = ticks[-1]
+    parts = [
+        (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_W} {_H}" width="100%" role="img" '
+            f'aria-label="{escape(title)}" font-family="ui-sans-serif, system-ui, Arial" font-size="11">'
+        ),
+        f'<text x="{_W / 2}" y="20" fill="{_TEXT}" font-size="14" text-anchor="middle">{escape(title)}</text>',
+    ]
+    for t in ticks:
+        y = _TOP + plot_h - (t / top_v) * plot_h
+        parts.append(f'<line x1="{_LEFT}" x2="{_W - _RIGHT}" y1="{y:.1f}" y2="{y:.1f}" stroke="{_GRID}"/>')
+        parts.append(
+            f'<text x="{_LEFT - 6}" y="{y + 4:.1f}" fill="{_MUTED}" text-anchor="end">{_fmt_tick(t)}</text>'
+        )
+    parts.extend(body)
+    parts.append(
+        f'<text x="{(_LEFT + _W - _RIGHT) / 2}" y="{_H - 6}" fill="{_MUTED}" text-anchor="middle">{escape(xlabel)}</text>'
+    )
+    parts.append(
+        f'<text transform="translate(14 {_TOP + plot_h / 2}) rotate(-90)" fill="{_MUTED}" '
+        f'text-anchor="middle">{escape(ylabel)}</text>'
+    )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def bar_chart_svg(
+    labels: Sequence[str],
+    values: Sequence[float],
+    title: str,
+    xlabel: str = "",
+    ylabel: str = "",
+    rotate_labels: bool = False,
+) -> str:
+    """
+    Self-contained SVG bar chart (inline-able, hover titles on bars). With
+    more than 40 bars only every n-th category label is drawn.
+    """
+    bottom = 110 if rotate_labels else 48
+    vals = [max(0.0, float(v)) if math.isfinite(float(v)) else 0.0 for v in values]
+    ticks = _nice_ticks(max(vals, default=0.0))
+    plot_w = _W - _LEFT - _RIGHT
+    plot_h = _H - _TOP - bottom
+    slot = plot_w / max(1, len(vals))
+    every = max(1, math.ceil(len(vals) / _MAX_LABELS))
+
+    body: list[str] = []
+    for i, (label, v) in enumerate(zip(labels, vals, strict=True)):
+        h = v / ticks[-1] * plot_h
+        x = _LEFT + i * slot + slot * 0.1
+        y = _TOP + plot_h - h
+        body.append(
+            f'<rect x="{x:.1f}" y="{y:.1f}" width="{slot * 0.8:.1f}" height="{h:.1f}" fill="{_BAR}">'
+            f"<title>{escape(str(label))}: {float(values[i]):,.2f}</title></rect>"
+        )
+        if i % every:
+            continue
+        cx = _LEFT + (i + 0.5) * slot
+        ly = _TOP + plot_h + 14
+        text = escape(str(label))
+        if rotate_labels:
+            body.append(
+                f'<text transform="translate({cx:.1f} {ly}) rotate(-45)" fill="{_MUTED}" '
+                f'text-anchor="end">{text}</text>'
+            )
+        else:
+            body.append(f'<text x="{cx:.1f}" y="{ly}" fill="{_MUTED}" text-anchor="middle">{text}</text>')
+    return _frame(title, xlabel, ylabel, bottom, ticks, body)
+
+
+def histogram_svg(values: Sequence[float], title: str, xlabel: str = "", bins: int = 30) -> str:
+    """
+    SVG histogram of `values` over `bins` equal-width bins.
+    """
+    vals = sorted(float(v) for v in values if math.isfinite(float(v)))
+    bottom = 48
+    if not vals:
+        return _frame(title, xlabel, "Count", bottom, _nice_ticks(0.0), [])
+    lo, hi = vals[0], vals[-1]
+    width = (hi - lo) / bins if hi > lo else 1.0
+    counts = [0] * bins
+    for v in vals:
+        counts[min(bins - 1, int((v - lo) / width))] += 1
+
+    ticks = _nice_ticks(float(max(counts)))
+    plot_w = _W - _LEFT - _RIGHT
+    plot_h = _H - _TOP - bottom
+    slot = plot_w / bins
+    body: list[str] = []
+    for i, n in enumerate(counts):
+        h = n / ticks[-1] * plot_h
+        a, b = lo + i * width, lo + (i + 1) * width
+        body.append(
+            f'<rect x="{_LEFT + i * slot:.1f}" y="{_TOP + plot_h - h:.1f}" width="{slot - 1:.1f}" '
+            f'height="{h:.1f}" fill="{_BAR}"><title>{a:,.0f}–{b:,.0f}: {n}</title></rect>'
+        )
+    for k in range(6):
+        x = _LEFT + k * plot_w / 5
+        body.append(
+            f'<text x="{x:.1f}" y="{_TOP + plot_h + 14}" fill="{_MUTED}" '
+            f'text-anchor="middle">{_fmt_tick(round(lo + k * (hi - lo) / 5, 2))}</text>'
+        )
+    return _frame(title, xlabel, "Count", bottom, ticks, body)
@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from html import escape
+from pathlib import Path
+from typing import Any
+
+from pie.application.catalog import RunCatalog
+from pie.application.dashboard import (
+    DASHBOARD_INPUTS,
+    MANIFEST_NAME,
+    build_dashboard,
+    is_hashed_name,
+)
+from pie.application.merge_ledger import merge_ledger
+from pie.application.run_cache import simulate_cached
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import (
+    StatsFeed,
+    StatsQuery,
+    compute_stats_multi,
+    write_stats_artifacts_v2,
+)
+from pie.domain.runmeta import stable_hash
+from pie.infrastructure.io.store import ArtifactStore, open_store, sync_dir
+
+WORKER_STATE_NAME = ".pie_worker.json"
+WORKER_STATE_VERSION = 1
+# Written next to the worker state after a publish, so idle checks never query the site.
+PUBLISH_RECORD_NAME = ".pie_published.json"
+
+
+@dataclass(frozen=True)
+class WorkerOptions:
+    audit: str = "ledger"
+    ledger_mode: str = "topk"
+    ledger_topk: int = 10
+    ledger_sample: float = 0.05
+    ledger_chunk_size: int = 100
+    ledger_block_rows: int = 10_000
+    run_cache: str = ""
+    run_cache_max_bytes: int = 5 << 30
+    merge: bool = True
+    query: StatsQuery = field(default_factory=StatsQuery)
+    sample_size: int = 5000
+    dashboard_top: int = 20
+    charts: str = "svg"
+    page_size: int = 25
+    catalog: str = ""  # "" = $PIE_CATALOG or the default location
+    register: bool = False
+
+    def sim_kwargs(self) -> dict[str, Any]:
+        return {
+            "audit": self.audit,
+            "ledger_mode": self.ledger_mode,
+            "ledger_topk": self.ledger_topk,
+            "ledger_sample": self.ledger_sample,
+            "ledger_chunk_size": self.ledger_chunk_size,
+            "ledger_block_rows": self.ledger_block_rows,
+        }
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    One config kept up to date: artifacts in `out`, dashboard published to
+    `site` (optional; a directory or an s3:// store URL).
+    """
+
+    name: str
+    config: Path
+    out: Path
+    site: str | None = None
+
+
+class _Memo:
+    """
+    Content digests of files, reused while size and mtime are unchanged so an
+    idle check reads no file contents.
+    """
+
+    def __init__(self, files: dict[str, dict[str, Any]]) -> None:
+        self.files = files
+
+    def sha(self, path: Path) -> str | None:
+        key = str(path)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self.files.pop(key, None)
+            return None
+        prev = self.files.get(key)
+        if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+            return prev["sha256"]
+        h = hashlib.sha256(path.read_bytes()).hexdigest()
+        self.files[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h}
+        return h
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A node of the worker DAG. `inputs` returns what the stage's output is a
+    function of (hashed into its digest); a stage with an unchanged digest
+    is skipped only while `present` confirms its outputs exist.
+    """
+
+    name: str
+    deps: tuple[str, ...]
+    inputs: Callable[[Job, WorkerOptions, _Memo], Any]
+    run: Callable[[Job, WorkerOptions, dict[str, Any]], None]
+    present: Callable[[Job], bool]
+    enabled: Callable[[Job, WorkerOptions], bool] = lambda job, opts: True
+
+
+# --------------------------------------------------------------------------------------
+# Stages
+# --------------------------------------------------------------------------------------
+def _simulate(job: Job, opts: WorkerOptions, ctx: dict[str, Any]) -> None:
+    if opts.run_cache:
+        df, _, _ = simulate_cached(
+            str(job.config), str(job.out), opts.run_cache, max_bytes=opts.run_cache_max_bytes, **opts.sim_kwargs()
+        )
+    else:
+        feed = StatsFeed([opts.query], sample_size=opts.sample_size)
+        df, _ = run_monte_carlo(
+            str(job.config), str(job.out), on_ledger_row=feed.row, on_ledger_chunk=feed.chunk, **opts.sim_kwargs()
+        )
+        ctx["feed"] = feed
+    if opts.register:
+        with RunCatalog(opts.catalog or None) as cat:
+            cat.register_run(str(job.out), df)
+
+
+def _merge(job: Job, opts: WorkerOptions, ctx: dict[str, Any]) -> None:
+    merge_ledger(out_dir=str(job.out))
+
+
+def _stats(job: Job, opts: WorkerOptions, ctx: dict[str, Any]) -> None:
+    q = opts.query
+    res = compute_stats_multi(str(job.out), [q], sample_size=opts.sample_size, feed=ctx.get("feed"))[q.name]
+    res.pop("query")
+    res["format"] = "both"
+    write_stats_artifacts_v2(str(job.out), res)
+    if opts.register:
+        with RunCatalog(opts.catalog or None) as cat:
+            cat.register_stats(str(job.out), res)
+
+
+def _dashboard(job: Job, opts: WorkerOptions, ctx: dict[str, Any]) -> None:
+    build_dashboard(str(job.out), top=opts.dashboard_top, charts=opts.charts, page_size=opts.page_size)
+
+
+def _publish(job: Job, opts: WorkerOptions, ctx: dict[str, Any]) -> None:
+    assert job.site is not None
+    index = job.out / "dashboard" / "index.html"
+    publish_dashboard(index.parent, open_store(job.site))
+    record = {"site": job.site, "index_sha256": hashlib.sha256(index.read_bytes()).hexdigest()}
+    (job.out / PUBLISH_RECORD_NAME).write_text(json.dumps(record) + "\n", encoding="utf-8")
+
+
+def _published(job: Job) -> bool:
+    """
+    Whether this out dir was last published to job.site, judged from the
+    local record (delete it to force a republish).
+    """
+    try:
+        record = json.loads((job.out / PUBLISH_RECORD_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return False
+    return job.site is not None and record.get("site") == job.site
+
+
+def _exist(*paths: Path) -> bool:
+    return all(p.exists() for p in paths)
+
+
+STAGES: tuple[Stage, ...] = (
+    Stage(
+        "simulate",
+        (),
+        inputs=lambda job, opts, memo: [memo.sha(job.config), opts.sim_kwargs(), opts.run_cache != ""],
+        run=_simulate,
+        present=lambda job: _exist(job.out / "run.json", job.out / "ledger_index.json"),
+    ),
+    Stage(
+        "merge",
+        ("simulate",),
+        inputs=lambda job, opts, memo: [memo.sha(job.out / "ledger_index.json")],
+        run=_merge,
+        present=lambda job: _exist(job.out / "entitlements.csv.gz"),
+        enabled=lambda job, opts: opts.merge,
+    ),
+    Stage(
+        "stats",
+        ("simulate",),
+        inputs=lambda job, opts, memo: [
+            memo.sha(job.out / "ledger_index.json"),
+            {**asdict(opts.query), "min_cost": float(opts.query.min_cost)},
+            opts.sample_size,
+        ],
+        run=_stats,
+        present=lambda job: _exist(job.out / "stats.json"),
+    ),
+    Stage(
+        "dashboard",
+        ("stats",),
+        inputs=lambda job, opts, memo: [
+            [memo.sha(job.out / name) for name in DASHBOARD_INPUTS],
+            [opts.dashboard_top, opts.charts, opts.page_size],
+        ],
+        run=_dashboard,
+        present=lambda job: _exist(job.out / "dashboard" / "index.html"),
+    ),
+    Stage(
+        "publish",
+        ("dashboard",),
+        # index.html names every chart and table file by content hash.
+        inputs=lambda job, opts, memo: [memo.sha(job.out / "dashboard" / "index.html"), job.site],
+        run=_publish,
+        present=_published,
+        enabled=lambda job, opts: job.site is not None,
+    ),
+)
+
+
+def topo_order(stages: tuple[Stage, ...]) -> list[Stage]:
+    """
+    Stages ordered so every stage follows its dependencies. Raises
+    ValueError on unknown dependencies or cycles.
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {missing}")
+    order: list[Stage] = []
+    done: set[str] = set()
+    pending = list(stages)
+    while pending:
+        ready = [s for s in pending if all(d in done for d in s.deps)]
+        if not ready:
+            raise ValueError(f"Stage dependency cycle among: {[s.name for s in pending]}")
+        for s in ready:
+            order.append(s)
+            done.add(s.name)
+        pending = [s for s in pending if s.name not in done]
+    return order
+
+
+# --------------------------------------------------------------------------------------
+# Per-job state and execution
+# --------------------------------------------------------------------------------------
+def _read_state(job: Job) -> dict[str, Any]:
+    path = job.out / WORKER_STATE_NAME
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {"version": WORKER_STATE_VERSION, "stages": {}, "files": {}}
+    if state.get("version") != WORKER_STATE_VERSION:
+        return {"version": WORKER_STATE_VERSION, "stages": {}, "files": {}}
+    return state
+
+
+def _write_state(job: Job, state: dict[str, Any]) -> None:
+    job.out.mkdir(parents=True, exist_ok=True)
+    path = job.out / WORKER_STATE_NAME
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2) + "\n", encoding="utf-8")
+    tmp.replace(path)
+
+
+def _is_current(stage: Stage, job: Job, digest: str, state: dict[str, Any]) -> bool:
+    return state["stages"].get(stage.name) == digest and stage.present(job)
+
+
+def plan_job(job: Job, opts: WorkerOptions) -> list[str]:
+    """
+    Names of the stages a run_job() would execute now, judged from the files
+    as they are. Stages below a stale one are listed too, since their inputs
+    are about to change. Reads only small metadata files.
+    """
+    state = _read_state(job)
+    memo = _Memo(dict(state["files"]))
+    stale: list[str] = []
+    for stage in topo_order(STAGES):
+        if not stage.enabled(job, opts):
+            continue
+        if any(d in stale for d in stage.deps) or not _is_current(
+            stage, job, stable_hash(stage.inputs(job, opts, memo)), state
+        ):
+            stale.append(stage.name)
+    if memo.files != state["files"]:
+        _write_state(job, {**state, "files": memo.files})  # remember mtimes of touched-but-equal files
+    return stale
+
+
+def run_job(job: Job, opts: WorkerOptions) -> dict[str, Any]:
+    """
+    Bring one job up to date: walk the DAG in order and run each stage whose
+    input digest changed (or whose outputs are missing). A stage's digest is
+    taken from its inputs as they are just before it would run, so an
+    upstream rerun that produces identical bytes stops propagation.
+    State is saved after every stage; a failed stage blocks its dependents
+    and is retried next cycle.
+    """
+    t0 = time.perf_counter()
+    state = _read_state(job)
+    files_before = dict(state["files"])
+    memo = _Memo(state["files"])
+    ctx: dict[str, Any] = {}
+    ran: list[str] = []
+    skipped: list[str] = []
+    failed: dict[str, str] = {}
+    for stage in topo_order(STAGES):
+        if not stage.enabled(job, opts):
+            continue
+        if any(d in failed for d in stage.deps):
+            failed[stage.name] = "blocked"
+            continue
+        digest = stable_hash(stage.inputs(job, opts, memo))
+        if _is_current(stage, job, digest, state):
+            skipped.append(stage.name)
+            continue
+        try:
+            stage.run(job, opts, ctx)
+        except Exception as e:  # noqa: BLE001 - reported per job; the daemon keeps going
+            state["stages"].pop(stage.name, None)
+            failed[stage.name] = f"{type(e).__name__}: {e}"
+        else:
+            state["stages"][stage.name] = digest
+            ran.append(stage.name)
+        _write_state(job, state)
+    if not ran and not failed and state["files"] != files_before:
+        _write_state(job, state)
+    return {
+        "job": job.name,
+        "ran": ran,
+        "skipped": skipped,
+        "failed": failed,
+        "wall_s": round(time.perf_counter() - t0, 4),
+    }
+
+
+# --------------------------------------------------------------------------------------
+# Publishing
+# --------------------------------------------------------------------------------------
+def publish_dashboard(dash_dir: Path, store: ArtifactStore) -> None:
+    """
+    Mirror a built dashboard into `store`. The site may be a mounted volume
+    or a bucket, so it is updated key by key rather than swapped: hashed
+    files first, index.html last, then files the new build no longer
+    references are removed.
+    """
+    if not (dash_dir / "index.html").exists():
+        raise FileNotFoundError(f"Missing {dash_dir / 'index.html'}. Run: pie dashboard")
+    sync_dir(dash_dir, store, immutable=is_hashed_name, skip=(MANIFEST_NAME,))
+
+
+def write_site_index(store: ArtifactStore, names: list[str]) -> None:
+    """
+    index.html at the site root linking every published dashboard
+    (redirecting when there is only one).
+    """
+    redirect = f"<meta http-equiv='refresh' content='0; url={escape(names[0])}/'/>" if len(names) == 1 else ""
+    links = "".join(f"<li><a href='{escape(n)}/'>{escape(n)}</a></li>" for n in names)
+    html = (
+        f"<!doctype html><html><head><meta charset='utf-8'/><title>PIE Dashboard</title>{redirect}</head>"
+        f"<body><h1>PIE Dashboards</h1><ul>{links}</ul></body></html>\n"
+    ).encode()
+    if store.exists("index.html") and store.get_bytes("index.html") == html:
+        return
+    store.put_bytes("index.html", html)
+
+
+# --------------------------------------------------------------------------------------
+# Daemon
+# --------------------------------------------------------------------------------------
+def discover_jobs(configs: list[str], out_root: str, site_root: str | None = None) -> list[Job]:
+    """
+    One job per config file; directories contribute every *.yml / *.yaml in
+    them (re-listed each cycle, so new configs are picked up). Jobs are named
+    after the file stem and write to out_root/<name> (site_root/<name>).
+    """
+    paths: list[Path] = []
+    for c in configs:
+        p = Path(c)
+        if p.is_dir():
+            paths.extend(sorted(q for q in p.iterdir() if q.suffix in {".yml", ".yaml"} and q.is_file()))
+        elif p.exists():
+            paths.append(p)
+        else:
+            raise FileNotFoundError(f"Config not found: {p}")
+    jobs: dict[str, Job] = {}
+    for p in paths:
+        if p.stem in jobs:
+            raise ValueError(f"Duplicate job name {p.stem!r}: {jobs[p.stem].config} and {p}")
+        jobs[p.stem] = Job(
+            name=p.stem,
+            config=p,
+            out=Path(out_root) / p.stem,
+            site=f"{site_root.rstrip('/')}/{p.stem}" if site_root else None,
+        )
+    return list(jobs.values())
+
+
+class Worker:
+    """
+    Keeps every discovered job up to date. Each cycle plans all jobs from
+    file metadata and only dispatches the ones with stale stages, at most
+    `max_workers` at a time (in worker processes when max_workers > 1), so
+    a cycle with nothing new costs a few stat() calls per job.
+    """
+
+    def __init__(
+        self,
+        configs: list[str],
+        out_root: str,
+        site_root: str | None = None,
+        opts: WorkerOptions | None = None,
+        max_workers: int = 2,
+        log: Callable[[str], None] = print,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("--max-workers must be >= 1")
+        self.opts = opts or WorkerOptions()
+        if self.opts.audit not in {"ledger", "both"}:
+            raise ValueError("pie worker needs --audit ledger|both (stats read the ledger)")
+        self.opts.query.validate()
+        self.configs = configs
+        self.out_root = out_root
+        self.site_root = site_root
+        self.max_workers = max_workers
+        self.log = log
+        self._pool: ProcessPoolExecutor | None = None
+        self._site_index: list[str] | None = None  # job names last written to the site index
+
+    def cycle(self) -> list[dict[str, Any]]:
+        jobs = discover_jobs(self.configs, self.out_root, self.site_root)
+        dirty = [job for job in jobs if plan_job(job, self.opts)]
+        if self.max_workers == 1 or len(dirty) <= 1:
+            results = [run_job(job, self.opts) for job in dirty]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            results = list(self._pool.map(run_job, dirty, [self.opts] * len(dirty)))
+        names = [j.name for j in jobs]
+        if self.site_root and names and names != self._site_index:
+            write_site_index(open_store(self.site_root), names)
+            self._site_index = names
+        return results
+
+    def run_cycle(self) -> list[dict[str, Any]]:
+        """
+        cycle() with one log line per job that had work.
+        """
+        results = self.cycle()
+        for res in results:
+            status = "failed " + json.dumps(res["failed"]) if res["failed"] else "ok"
+            self.log(
+                f"{res['job']}: ran {','.join(res['ran']) or '-'}, skipped {','.join(res['skipped']) or '-'} "
+                f"in {res['wall_s']}s ({status})"
+            )
+        return results
+
+    def run_forever(self, poll_s: float, stop: threading.Event) -> None:
+        try:
+            while not stop.is_set():
+                try:
+                    self.run_cycle()
+                except (OSError, ValueError) as e:  # e.g. a config removed mid-cycle
+                    self.log(f"cycle failed: {e}")
+                stop.wait(poll_s)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
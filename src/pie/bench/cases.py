@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import json
+import random
+import shutil
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+from pie.application.dashboard import build_dashboard
+from pie.application.merge_ledger import merge_ledger
+from pie.application.simulate import (
+    build_scenario,
+    generate_population,
+    run_monte_carlo,
+    sample_disruption,
+    sample_rebooking_cost,
+)
+from pie.application.stats import compute_stats_v2, write_stats_artifacts_v2
+from pie.application.verify import verify_run
+from pie.domain.regulations.eu261 import assess_eu261
+from pie.infrastructure.io.ledger import LEDGER_FIELDS, ZONE_MAP_FIELDS, LedgerWriter
+
+LEDGER_MODES = ("all", "eligible", "topk", "global_topk", "sample", "passenger_sample", "weighted")
+
+# A timed body returns the work it did, {unit: amount}; the first unit is the
+# case's primary metric (the one compared against the baseline).
+Body = Callable[[], dict[str, float]]
+
+
+class Workload:
+    """
+    One point of the benchmark matrix: the base config scaled to
+    `passengers` x `iterations`, plus lazily built fixtures (a simulated
+    run with ledger_mode=all, its stats) shared by the cases at this size.
+    """
+
+    def __init__(self, base_config: dict[str, Any], passengers: int, iterations: int, work_dir: Path) -> None:
+        self.passengers = passengers
+        self.iterations = iterations
+        self.dir = work_dir / f"{passengers}x{iterations}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.cfg = json.loads(json.dumps(base_config))
+        self.cfg["run"]["iterations"] = iterations
+        self.cfg["population"]["passengers"] = passengers
+
+    @property
+    def work(self) -> int:
+        return self.passengers * self.iterations
+
+    @property
+    def chunk_size(self) -> int:
+        return max(1, self.iterations // 4)
+
+    @cached_property
+    def config_path(self) -> Path:
+        path = self.dir / "config.yml"  # JSON is valid YAML
+        path.write_text(json.dumps(self.cfg), encoding="utf-8")
+        return path
+
+    @cached_property
+    def run_dir(self) -> Path:
+        out = self.dir / "run"
+        run_monte_carlo(
+            str(self.config_path), str(out), audit="ledger", ledger_mode="all", ledger_chunk_size=self.chunk_size
+        )
+        return out
+
+    @cached_property
+    def ledger(self) -> dict[str, Any]:
+        return json.loads((self.run_dir / "ledger_index.json").read_text(encoding="utf-8"))["ledger"]
+
+    @property
+    def ledger_mb(self) -> float:
+        return sum(int(ch["bytes"]) for ch in self.ledger["chunks"]) / 1e6
+
+    @cached_property
+    def stats_dir(self) -> Path:
+        out = str(self.run_dir)
+        write_stats_artifacts_v2(out, compute_stats_v2(out_dir=out, by="segment,dtype", cache=False))
+        return self.run_dir
+
+
+def _assess(w: Workload) -> Body:
+    rng = random.Random(int(w.cfg["run"]["seed"]))
+    passengers = generate_population(w.cfg, rng)
+    ctx, eu_cfg = build_scenario(w.cfg)
+    events = [(sample_disruption(w.cfg, rng), sample_rebooking_cost(eu_cfg, rng)) for _ in range(w.iterations)]
+
+    def body() -> dict[str, float]:
+        for event, rebook in events:
+            for p in passengers:
+                assess_eu261(p, ctx, event, eu_cfg, sampled_rebooking_cost_eur=rebook)
+        return {"calls": w.work}
+
+    return body
+
+
+def _simulate(mode: str) -> Callable[[Workload], Body]:
+    def setup(w: Workload) -> Body:
+        out = w.dir / f"simulate-{mode}"
+
+        def body() -> dict[str, float]:
+            run_monte_carlo(
+                str(w.config_path), str(out), audit="ledger", ledger_mode=mode, ledger_chunk_size=w.chunk_size
+            )
+            return {"passenger-iterations": w.work}
+
+        return body
+
+    return setup
+
+
+def _ledger_writer(w: Workload) -> Body:
+    rng = random.Random(7)
+    rows = [
+        {
+            "run_id": "bench",
+            "iteration": i // w.passengers,
+            "seed": 7,
+            "passenger_id": f"P{i % w.passengers:05d}",
+            "segment": rng.choice(("business", "leisure")),
+            "refundable": rng.random() < 0.5,
+            "dtype": rng.choice(("delay", "cancel")),
+            "delay_minutes": rng.randint(0, 800),
+            "cash_comp_eur": rng.choice((0.0, 250.0, 400.0, 600.0)),
+            "care_cost_eur": round(rng.uniform(0, 130), 2),
+            "refund_cost_eur": round(rng.uniform(0, 100), 2),
+            "rebooking_cost_eur": round(rng.uniform(0, 250), 2),
+            "total_cost_eur": round(rng.uniform(0, 1200), 2),
+        }
+        for i in range(w.work)
+    ]
+    path = w.dir / "ledger_writer.csv.gz"
+
+    def body() -> dict[str, float]:
+        with LedgerWriter(path, list(LEDGER_FIELDS), zone_fields=ZONE_MAP_FIELDS, block_rows=10_000) as lw:
+            for row in rows:
+                lw.write_row(row)
+        return {"rows": len(rows), "MB": lw.bytes_written / 1e6}
+
+    return body
+
+
+def _merge(w: Workload) -> Body:
+    def body() -> dict[str, float]:
+        merge_ledger(str(w.run_dir))
+        return {"MB": w.ledger_mb, "rows": int(w.ledger["total_rows_written"])}
+
+    return body
+
+
+def _stats(w: Workload) -> Body:
+    out = str(w.run_dir)
+
+    def body() -> dict[str, float]:
+        compute_stats_v2(out_dir=out, by="segment,dtype", metric="p95", cache=False)
+        return {"rows": int(w.ledger["total_rows_written"])}
+
+    return body
+
+
+def _verify(mode: str) -> Callable[[Workload], Body]:
+    def setup(w: Workload) -> Body:
+        out = str(w.run_dir)
+
+        def body() -> dict[str, float]:
+            verify_run(out, mode=mode, workers=1, replay=False)
+            return {"MB": w.ledger_mb, "chunks": len(w.ledger["chunks"])}
+
+        return body
+
+    return setup
+
+
+def _dashboard(w: Workload) -> Body:
+    out = w.stats_dir
+
+    def body() -> dict[str, float]:
+        shutil.rmtree(out / "dashboard", ignore_errors=True)  # cold build, no reused fragments
+        build_dashboard(str(out))
+        return {"builds": 1}
+
+    return body
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    setup: Callable[[Workload], Body]
+
+
+CASES: tuple[Case, ...] = (
+    Case("assess_eu261", _assess),
+    *(Case(f"simulate[{mode}]", _simulate(mode)) for mode in LEDGER_MODES),
+    Case("ledger_writer", _ledger_writer),
+    Case("merge_ledger", _merge),
+    Case("compute_stats_v2", _stats),
+    Case("verify_run[fast]", _verify("fast")),
+    Case("verify_run[deep]", _verify("deep")),
+    Case("build_dashboard", _dashboard),
+)
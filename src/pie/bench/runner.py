@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import tempfile
+import time
+from collections.abc import Callable, Collection, Mapping, Sequence
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from pie.application.simulate import load_config
+from pie.bench.cases import CASES, Workload
+
+BENCH_VERSION = 1
+DEFAULT_PASSENGERS = (50, 200)
+DEFAULT_ITERATIONS = (20, 100)
+# A case regresses when its primary rate drops more than this below baseline.
+DEFAULT_THRESHOLD = 0.25
+# Baselines live outside the repo, one file per machine (see default_baseline_path).
+BENCH_DIR_ENV = "PIE_BENCH_DIR"
+# Bodies faster than this are looped so every timed sample lasts at least this long.
+_MIN_SAMPLE_S = 0.02
+
+
+def result_key(res: dict[str, Any]) -> str:
+    return f"{res['case']}@{res['passengers']}x{res['iterations']}"
+
+
+def machine_info() -> dict[str, Any]:
+    return {
+        "node": platform.node(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def machine_key(machine: Mapping[str, Any]) -> str:
+    """
+    What a baseline is tied to: host name, CPU count and Python version.
+    """
+    raw = f"{machine.get('node') or 'unknown'}-{machine.get('cpus')}cpu-py{machine.get('python')}"
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", raw)
+
+
+def default_baseline_path(machine: Mapping[str, Any] | None = None) -> Path:
+    """
+    baseline-<machine key>.json under $PIE_BENCH_DIR, else ~/.pie/bench.
+    """
+    env = os.getenv(BENCH_DIR_ENV, "").strip()
+    root = Path(env) if env else Path.home() / ".pie" / "bench"
+    return root / f"baseline-{machine_key(machine or machine_info())}.json"
+
+
+def select_cases(patterns: Sequence[str] = ()) -> list[str]:
+    """
+    Case names equal to or matching any of the fnmatch patterns (all cases
+    if none).
+    """
+    names = [c.name for c in CASES]
+    if not patterns:
+        return names
+    # exact names first: "simulate[all]" is also a glob character class
+    picked = [n for n in names if any(n == p or fnmatch.fnmatchcase(n, p) for p in patterns)]
+    if not picked:
+        raise ValueError(f"No benchmark case matches {list(patterns)}; cases: {', '.join(names)}")
+    return picked
+
+
+def run_bench(
+    config_path: str,
+    passengers: Sequence[int] = DEFAULT_PASSENGERS,
+    iterations: Sequence[int] = DEFAULT_ITERATIONS,
+    cases: Sequence[str] = (),
+    repeat: int = 5,
+    rounds: int = 1,
+    work_dir: str | None = None,
+    only: Collection[str] = (),
+    progress: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Run the selected cases at every passengers x iterations point of the
+    matrix. Each case is set up and warmed up untimed, then timed `repeat`
+    times (short bodies looped); with `rounds` > 1 the whole matrix is
+    swept that many times, so a case's samples are spread over the run
+    instead of sharing one stretch of machine load. Rates use the median
+    sample, which neither a lucky nor an interrupted sample moves much. Every result carries rates per
+    unit of work, the first one being the case's primary metric. `only`
+    restricts the run to these result keys (to re-measure a few).
+    """
+    if repeat < 1 or rounds < 1:
+        raise ValueError("repeat and rounds must be >= 1")
+    if not passengers or not iterations or min(*passengers, *iterations) < 1:
+        raise ValueError("passengers and iterations must be non-empty lists of positive sizes")
+    names = set(select_cases(cases))
+    base = load_config(config_path)
+
+    points = [
+        (case, n_pass, n_iter)
+        for n_pass in passengers
+        for n_iter in iterations
+        for case in CASES
+        if case.name in names and (not only or f"{case.name}@{n_pass}x{n_iter}" in only)
+    ]
+    results: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="pie-bench-", dir=work_dir) as tmp:
+        workloads: dict[tuple[int, int], Workload] = {}
+        prepared: dict[int, tuple[Callable[[], dict[str, float]], dict[str, float], int]] = {}
+        times: dict[int, list[float]] = {k: [] for k in range(len(points))}
+        for rnd in range(rounds):
+            for k, (case, n_pass, n_iter) in enumerate(points):
+                if k not in prepared:
+                    w = workloads.get((n_pass, n_iter)) or Workload(base, n_pass, n_iter, Path(tmp))
+                    workloads[(n_pass, n_iter)] = w
+                    body = case.setup(w)
+                    t0 = time.perf_counter()
+                    work = body()  # warm-up, sizes the loop
+                    loops = max(1, math.ceil(_MIN_SAMPLE_S / max(time.perf_counter() - t0, 1e-9)))
+                    prepared[k] = (body, work, loops)
+                body, work, loops = prepared[k]
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    for _ in range(loops):
+                        body()
+                    times[k].append((time.perf_counter() - t0) / loops)
+                if rnd < rounds - 1:
+                    continue
+                mid = statistics.median(times[k])
+                res = {
+                    "case": case.name,
+                    "passengers": n_pass,
+                    "iterations": n_iter,
+                    "seconds": round(mid, 6),
+                    "seconds_all": [round(t, 6) for t in times[k]],
+                    "loops": loops,
+                    "work": work,
+                    "metric": f"{next(iter(work))}/s",
+                    "rates": {f"{unit}/s": round(amount / mid, 3) for unit, amount in work.items()},
+                }
+                results.append(res)
+                if progress is not None:
+                    progress(res)
+
+    return {
+        "version": BENCH_VERSION,
+        "created_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "config": config_path,
+        "repeat": repeat,
+        "rounds": rounds,
+        "results": results,
+    }
+
+
+def compare(
+    current: dict[str, Any], baseline: dict[str, Any], threshold: float = DEFAULT_THRESHOLD
+) -> list[dict[str, Any]]:
+    """
+    Compare each current result's primary rate with the baseline result of
+    the same case and size. Baselines are only meaningful on the machine
+    that recorded them, so one from another machine is refused. status: ok
+    | regression (rate fell more than `threshold` below baseline) |
+    improved (rose more than `threshold`) | new (not in the baseline).
+    """
+    if not 0 < threshold < 1:
+        raise ValueError("threshold must be in (0, 1)")
+    if int(baseline.get("version", 0)) != BENCH_VERSION:
+        raise ValueError(f"Baseline version {baseline.get('version')} != {BENCH_VERSION}; re-record it")
+    here, there = machine_key(current["machine"]), machine_key(baseline.get("machine", {}))
+    if here != there:
+        raise ValueError(f"Baseline was recorded on {there}, this is {here}; record one here with --update-baseline")
+    base = {result_key(r): r for r in baseline["results"]}
+    rows = []
+    for res in current["results"]:
+        key = result_key(res)
+        rate = res["rates"][res["metric"]]
+        ref = base.get(key)
+        if ref is None or ref["metric"] != res["metric"]:
+            rows.append({"key": key, "metric": res["metric"], "current": rate, "baseline": None, "change": None, "status": "new"})
+            continue
+        ref_rate = ref["rates"][ref["metric"]]
+        change = rate / ref_rate - 1 if ref_rate else 0.0
+        status = "regression" if change < -threshold else "improved" if change > threshold else "ok"
+        rows.append(
+            {
+                "key": key,
+                "metric": res["metric"],
+                "current": rate,
+                "baseline": ref_rate,
+                "change": round(change, 4),
+                "status": status,
+            }
+        )
+    return rows
+
+
+def pool_samples(results: dict[str, Any], again: dict[str, Any]) -> dict[str, Any]:
+    """
+    `results` with the samples of every result re-measured in `again` added
+    and its seconds and rates recomputed from the median of the pooled
+    samples, so a retried case is still compared median to median with the
+    baseline (best-of-N would favour the retry).
+    """
+    extra = {result_key(r): r for r in again["results"]}
+    merged = []
+    for r in results["results"]:
+        new = extra.get(result_key(r))
+        if new is not None:
+            samples = r["seconds_all"] + new["seconds_all"]
+            mid = statistics.median(samples)
+            r = {
+                **r,
+                "seconds": round(mid, 6),
+                "seconds_all": samples,
+                "rates": {f"{unit}/s": round(amount / mid, 3) for unit, amount in r["work"].items()},
+            }
+        merged.append(r)
+    return {**results, "results": merged}
+
+
+def write_results(path: str | Path, results: dict[str, Any]) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+def format_comparison(rows: list[dict[str, Any]]) -> str:
+    lines = [f"{'case':<44} {'metric':<28} {'baseline':>14} {'current':>14} {'change':>8}  status"]
+    for r in rows:
+        base = f"{r['baseline']:,.1f}" if r["baseline"] is not None else "-"
+        change = f"{r['change']:+.1%}" if r["change"] is not None else "-"
+        lines.append(f"{r['key']:<44} {r['metric']:<28} {base:>14} {r['current']:>14,.1f} {change:>8}  {r['status']}")
+    return "\n".join(lines)
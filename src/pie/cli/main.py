@@ -1,22 +1,36 @@
 from __future__ import annotations
 
-import http.server
-import json
-import os
-import socketserver
+# Commands import what they need inside their bodies: a light command such as
+# `pie version`, `pie verify` or `pie runs list` must not pay for pandas,
+# numpy or yaml (see pie.cli.startup and `pie --startup-profile`).
+import sys
 from pathlib import Path
+from typing import Annotated
 
 import typer
 
-from pie.application.dashboard import build_dashboard
-from pie.application.merge_ledger import merge_ledger
-from pie.application.simulate import run_monte_carlo
-from pie.application.stats import compute_stats_v2, write_stats_artifacts_v2
-from pie.application.verify import verify_run
+from pie.application.catalog import SUMMARY_METRICS
 
 app = typer.Typer(help="Passenger Impact Engine (EU261) — simulation CLI")
 
 
+@app.callback()
+def main_callback(
+    startup_profile: bool = typer.Option(
+        False, "--startup-profile", help="Run the command under -X importtime and report where startup time goes"
+    ),
+) -> None:
+    if not startup_profile:
+        return
+    from pie.cli.startup import format_report, profile_command
+
+    prof = profile_command([a for a in sys.argv[1:] if a != "--startup-profile"])
+    sys.stdout.write(prof["stdout"])
+    sys.stderr.write(prof["stderr"])
+    typer.echo(format_report(prof), err=True)
+    raise typer.Exit(code=prof["returncode"])
+
+
 # --------------------------------------------------------------------------------------
 # Version
 # --------------------------------------------------------------------------------------
@@ -33,35 +47,136 @@ def simulate_cmd(
     config: str = typer.Option("configs/demo.yml", help="Path to YAML config"),
     out: str = typer.Option("out", help="Output directory"),
     audit: str = typer.Option("both", help="summary|ledger|both"),
-    ledger_mode: str = typer.Option("all", help="all|eligible|topk|sample"),
-    ledger_topk: int = typer.Option(50, help="Top-K passengers per iteration when ledger_mode=topk"),
-    ledger_sample: float = typer.Option(0.05, help="Sample fraction per iteration when ledger_mode=sample"),
+    ledger_mode: str = typer.Option("all", help="all|eligible|topk|global_topk|sample|passenger_sample|weighted"),
+    ledger_topk: int = typer.Option(
+        50, help="K for ledger_mode=topk (per iteration) or global_topk (across the whole run)"
+    ),
+    ledger_sample: float = typer.Option(
+        0.05,
+        help="Row fraction per iteration (sample), passenger fraction (passenger_sample) "
+        "or base keep rate scaled by cost (weighted)",
+    ),
     ledger_chunk_size: int = typer.Option(100, help="Chunk size (iterations) for ledger chunk files"),
+    ledger_block_rows: int = typer.Option(
+        10_000, help="Rows per independently readable gzip block in chunk files (0 = single stream)"
+    ),
+    ledger_binary: bool = typer.Option(
+        False, "--ledger-binary", help="Also write out/ledger.bin, a fixed-width memory-mappable ledger copy"
+    ),
     ledger_merge: bool = typer.Option(False, "--ledger-merge", help="Merge ledger chunks into out/entitlements.csv.gz"),
+    passenger_index: bool = typer.Option(
+        False, "--passenger-index", help="Build out/passenger_index.sqlite for fast per-passenger lookups"
+    ),
+    run_cache: str = typer.Option(
+        "", help="Run cache directory: restore a verified run with the same run_id instead of recomputing"
+    ),
+    run_cache_max_gb: float = typer.Option(5.0, help="--run-cache: evict least recently used runs beyond this size"),
+    run_cache_max_age_days: float = typer.Option(30.0, help="--run-cache: drop cached runs older than this"),
+    store: str = typer.Option(
+        "",
+        help="Also upload artifacts to a store: a directory or s3://bucket/prefix "
+        "($PIE_S3_ENDPOINT_URL for S3-compatible servers); chunks upload while the simulation runs",
+    ),
+    upload_workers: int = typer.Option(4, help="--store: concurrent uploads"),
+    plan: bool = typer.Option(
+        False,
+        "--plan",
+        help="Print the predicted ledger rows, bytes and runtime (from a calibration micro-run) as JSON and exit",
+    ),
+    max_rows: int = typer.Option(0, help="Refuse to start if the plan predicts more ledger rows (0 = no limit)"),
+    max_gb: float = typer.Option(0.0, help="Refuse to start if the plan predicts more artifact GB (0 = no limit)"),
+    max_minutes: float = typer.Option(0.0, help="Refuse to start if the plan predicts a longer run (0 = no limit)"),
+    catalog: str = typer.Option("", help="Run catalog sqlite (default: $PIE_CATALOG or ~/.pie/catalog.sqlite)"),
+    register: bool = typer.Option(True, "--register/--no-register", help="Register the results in the run catalog"),
 ) -> None:
     """
     Run Monte Carlo simulation and optionally generate ledger artifacts.
+
+    With --plan, or any --max-* limit, the run is planned first; it is refused
+    (exit code 1) before any work starts if the plan exceeds a limit or the
+    free disk space under --out.
     """
-    df, summary = run_monte_carlo(
-        config_path=config,
-        out_dir=out,
-        audit=audit,
-        ledger_mode=ledger_mode,
-        ledger_topk=ledger_topk,
-        ledger_sample=ledger_sample,
-        ledger_chunk_size=ledger_chunk_size,
-    )
+    from pie.application.catalog import RunCatalog
+    from pie.application.merge_ledger import merge_ledger
+    from pie.application.passenger_index import build_passenger_index
+    from pie.application.run_cache import simulate_cached
+    from pie.application.simulate import run_monte_carlo
+    from pie.infrastructure.io.store import open_store
+
+    opts = {
+        "audit": audit,
+        "ledger_mode": ledger_mode,
+        "ledger_topk": ledger_topk,
+        "ledger_sample": ledger_sample,
+        "ledger_chunk_size": ledger_chunk_size,
+        "ledger_block_rows": ledger_block_rows,
+        "ledger_binary": ledger_binary,
+    }
+    if plan or max_rows or max_gb or max_minutes:
+        import json
+
+        from pie.application.plan import PlanLimits, plan_run
+
+        limits = PlanLimits(
+            max_rows=max_rows, max_bytes=int(max_gb * (1 << 30)), max_seconds=max_minutes * 60
+        )
+        try:
+            res = plan_run(config, out_dir=out, limits=limits, **opts)
+        except ValueError as e:
+            raise typer.BadParameter(str(e)) from None
+        if plan:
+            typer.echo(json.dumps(res, indent=2, ensure_ascii=False))
+        for msg in res["warnings"]:
+            typer.echo(f"⚠️  {msg}", err=True)
+        for msg in res["violations"]:
+            typer.echo(f"❌ Refusing to run: {msg}", err=True)
+        if plan or not res["ok"]:
+            raise typer.Exit(code=0 if res["ok"] else 1)
+
+    artifact_store = open_store(store) if store else None
+    if run_cache:
+        df, summary, hit = simulate_cached(
+            config,
+            out,
+            run_cache,
+            max_bytes=int(run_cache_max_gb * (1 << 30)),
+            max_age_s=run_cache_max_age_days * 86400,
+            store=artifact_store,
+            upload_workers=upload_workers,
+            **opts,
+        )
+        if hit:
+            typer.echo(f"♻️  Restored from run cache: {run_cache}")
+    else:
+        df, summary = run_monte_carlo(
+            config_path=config,
+            out_dir=out,
+            store=artifact_store,
+            upload_workers=upload_workers,
+            **opts,
+        )
 
     typer.echo(f"✅ Done. Iterations={len(df)}")
     typer.echo(f"Mean total cost (EUR): {summary['mean_total_cost']:.2f}")
     typer.echo(f"P95 total cost (EUR): {summary['p95_total_cost']:.2f}")
     typer.echo(f"CVaR95 total cost (EUR): {summary['cvar95_total_cost']:.2f}")
     typer.echo(f"Artifacts written to: {out}")
+    if artifact_store is not None:
+        typer.echo(f"Artifacts uploaded to: {artifact_store.url}")
+
+    if register:
+        with RunCatalog(catalog or None) as cat:
+            cat.register_run(out, df)
+            typer.echo(f"Registered in run catalog: {cat.path}")
 
     if ledger_merge:
         merged = merge_ledger(out_dir=out)
         typer.echo(f"✅ Merged ledger written: {merged}")
 
+    if passenger_index:
+        path = build_passenger_index(out_dir=out)
+        typer.echo(f"✅ Passenger index written: {path}")
+
 
 # --------------------------------------------------------------------------------------
 # Verify
@@ -69,11 +184,18 @@ def simulate_cmd(
 @app.command("verify")
 def verify_cmd(
     out: str = typer.Option("out", help="Output directory to verify"),
+    mode: str = typer.Option("fast", help="fast = sizes + sha256 digests + Merkle root; deep = also re-parse chunks"),
+    workers: int = typer.Option(0, help="Parallel workers (0 = one per CPU)"),
+    replay: bool = typer.Option(True, "--replay/--no-replay", help="Replay the RNG to check eligible/sample row counts"),
 ) -> None:
     """
     Verify that a simulation run produced valid artifacts.
     """
-    res = verify_run(out)
+    import json
+
+    from pie.application.verify import verify_run
+
+    res = verify_run(out, mode=mode, workers=workers or None, replay=replay)
     typer.echo(json.dumps(res, indent=2, ensure_ascii=False))
 
 
@@ -83,14 +205,73 @@ def verify_cmd(
 @app.command("merge-ledger")
 def merge_ledger_cmd(
     out: str = typer.Option("out", help="Output directory containing ledger chunks"),
+    sort_by: str = typer.Option(
+        "none", help="none = entitlements.csv.gz in chunk order; passenger = entitlements_by_passenger.csv.gz"
+    ),
+    run_rows: int = typer.Option(200_000, help="--sort-by passenger: rows per in-memory sorted run"),
+    store: str = typer.Option("", help="Also upload the merged file to a store: a directory or s3://bucket/prefix"),
 ) -> None:
     """
     Merge ledger chunk files into one entitlements.csv.gz.
     """
-    merged = merge_ledger(out_dir=out)
+    from pie.application.merge_ledger import merge_ledger
+    from pie.infrastructure.io.store import open_store
+
+    merged = merge_ledger(
+        out_dir=out, sort_by=sort_by, run_rows=run_rows, store=open_store(store) if store else None
+    )
     typer.echo(f"✅ Merged ledger written: {merged}")
 
 
+# --------------------------------------------------------------------------------------
+# Passenger index + lookup
+# --------------------------------------------------------------------------------------
+@app.command("index")
+def index_cmd(
+    out: str = typer.Option("out", help="Output directory containing ledger_index.json + ledger/"),
+) -> None:
+    """
+    Build out/passenger_index.sqlite (passenger_id -> blocks of a
+    passenger-clustered ledger copy, out/passenger_ledger.*.csv.gz).
+    """
+    from pie.application.passenger_index import build_passenger_index
+
+    path = build_passenger_index(out_dir=out)
+    typer.echo(f"✅ Passenger index written: {path}")
+
+
+@app.command("lookup")
+def lookup_cmd(
+    passenger: str = typer.Option("", "--passenger", help="Passenger id, e.g. P00042"),
+    iteration: int = typer.Option(-1, "--iteration", help="Iteration number (needs out/ledger.bin)"),
+    out: str = typer.Option("out", help="Output directory with passenger_index.sqlite or ledger.bin"),
+    limit: int = typer.Option(0, help="Max rows to print (0 = all)"),
+) -> None:
+    """
+    Print every ledger row of one passenger (passenger index or ledger.bin)
+    or of one iteration (ledger.bin) as CSV.
+    """
+    import csv
+
+    from pie.application.passenger_index import lookup_iteration, lookup_passenger
+
+    if bool(passenger) == (iteration >= 0):
+        raise typer.BadParameter("Pass exactly one of --passenger or --iteration")
+    if passenger:
+        rows = lookup_passenger(out, passenger, limit=limit or None)
+        what = f"passenger {passenger}"
+    else:
+        rows = lookup_iteration(out, iteration)[: limit or None]
+        what = f"iteration {iteration}"
+    if not rows:
+        typer.echo(f"No ledger rows for {what}", err=True)
+        raise typer.Exit(code=1)
+
+    w = csv.DictWriter(sys.stdout, fieldnames=list(rows[0].keys()))
+    w.writeheader()
+    w.writerows(rows)
+
+
 # --------------------------------------------------------------------------------------
 # Stats
 # --------------------------------------------------------------------------------------
@@ -101,28 +282,208 @@ def stats_cmd(
         help="Output directory (expects entitlements.csv.gz OR ledger_index.json + ledger/)",
     ),
     top: int = typer.Option(20, help="Top N passengers"),
-    by: str = typer.Option("segment", help="Grouping: none|segment|dtype|segment,dtype"),
+    by: str = typer.Option("segment", help="Grouping: none or comma list of ledger columns, e.g. segment,dtype"),
     metric: str = typer.Option("mean", help="Ranking metric: mean|p50|p95|p99|max"),
     min_cost: float = typer.Option(0.0, help="Ignore rows with total_cost_eur < min_cost"),
     sample_size: int = typer.Option(5000, help="Reservoir size for quantile estimation"),
+    cache: bool = typer.Option(True, "--cache/--no-cache", help="Reuse per-chunk partials in out/stats_cache"),
+    where: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--where",
+            help="Range filter, repeatable: total_cost_eur>=200, iteration<500, cash_comp_eur=0..400",
+        ),
+    ] = None,
+    delay_bucket: int = typer.Option(60, help="Bucket width (minutes) when grouping by delay_minutes"),
+    approx: bool = typer.Option(False, "--approx", help="Estimate from sampled ledger blocks with confidence intervals"),
+    precision: float = typer.Option(0.01, help="--approx: target relative CI half-width of group means"),
+    time_budget: float = typer.Option(10.0, help="--approx: stop sampling after this many seconds (0 = no limit)"),
+    confidence: float = typer.Option(0.95, help="--approx: confidence level of the intervals"),
+    queries: str = typer.Option(
+        "",
+        help="YAML list of queries (name, by, metric, min_cost, where, top, delay_bucket) answered in one pass; "
+        "artifacts go to out/stats/<name>/",
+    ),
+    binary: bool = typer.Option(
+        False, "--binary", help="Compute from the memory-mapped out/ledger.bin (exact quantiles, vectorized)"
+    ),
+    exact_passengers: bool = typer.Option(
+        False,
+        "--exact-passengers",
+        help="Rank passengers exactly by streaming out/entitlements_by_passenger.csv.gz "
+        "(pie merge-ledger --sort-by passenger)",
+    ),
+    catalog: str = typer.Option("", help="Run catalog sqlite (default: $PIE_CATALOG or ~/.pie/catalog.sqlite)"),
+    register: bool = typer.Option(True, "--register/--no-register", help="Register the results in the run catalog"),
 ) -> None:
     """
     Compute grouped cost statistics + top passenger ranking.
     """
-    res = compute_stats_v2(
-        out_dir=out,
-        top=top,
-        by=by,
-        metric=metric,
-        min_cost=min_cost,
-        sample_size=sample_size,
-    )
+    from pie.application.catalog import RunCatalog
+    from pie.application.stats import compute_stats_v2, write_stats_artifacts_v2
+
+    engines = [flag for flag, on in (("--queries", bool(queries)), ("--approx", approx), ("--binary", binary)) if on]
+    if len(engines) > 1:
+        raise typer.BadParameter(f"{' and '.join(engines)} cannot be combined")
+    if exact_passengers and (approx or binary):
+        raise typer.BadParameter(f"--exact-passengers does not apply to {engines[0]}")
+
+    register = register and (Path(out) / "run.json").exists()
+    if queries:
+        import yaml
+
+        specs = yaml.safe_load(Path(queries).read_text(encoding="utf-8"))
+        if isinstance(specs, dict):
+            specs = specs.get("queries", [])
+        multi = compute_stats_v2(
+            out_dir=out, sample_size=sample_size, cache=cache, queries=specs, exact_passengers=exact_passengers
+        )
+        for name, res in multi["queries"].items():
+            written = write_stats_artifacts_v2(str(Path(out) / "stats" / name), res)
+            typer.echo(f"✅ {name}: total_rows={res['total_rows']}, groups={len(res['groups'])}")
+            for p in written.values():
+                typer.echo(f"Written: {p}")
+        if register:
+            with RunCatalog(catalog or None) as cat:
+                for name, res in multi["queries"].items():
+                    cat.register_stats(out, res, query=name)
+        return
+
+    if binary:
+        from pie.application.binstats import compute_stats_binary
+
+        res = compute_stats_binary(
+            out_dir=out,
+            top=top,
+            by=by,
+            metric=metric,
+            min_cost=min_cost,
+            where=where,
+            delay_bucket=delay_bucket,
+        )
+    elif approx:
+        from pie.application.approx import compute_stats_approx
+
+        res = compute_stats_approx(
+            out_dir=out,
+            top=top,
+            by=by,
+            metric=metric,
+            min_cost=min_cost,
+            sample_size=sample_size,
+            where=where,
+            delay_bucket=delay_bucket,
+            precision=precision,
+            time_budget=time_budget,
+            confidence=confidence,
+        )
+    else:
+        res = compute_stats_v2(
+            out_dir=out,
+            top=top,
+            by=by,
+            metric=metric,
+            min_cost=min_cost,
+            sample_size=sample_size,
+            cache=cache,
+            where=where,
+            delay_bucket=delay_bucket,
+            exact_passengers=exact_passengers,
+        )
 
     paths = write_stats_artifacts_v2(out, res)
 
     typer.echo(f"✅ Stats computed. total_rows={res['total_rows']}, groups={len(res['groups'])}")
+    if binary:
+        typer.echo(f"Engine: binary ({res['source']}), kept_rows={res['kept_rows']}")
+    elif approx:
+        a = res["approx"]
+        typer.echo(
+            f"Approx: {a['blocks_sampled']}/{a['blocks_total']} blocks, "
+            f"precision={a['precision_achieved']:.4f} ({a['stopped']}), elapsed={a['elapsed_s']}s"
+        )
+    else:
+        typer.echo(
+            f"Chunks: {res['chunks']} (pruned={res['pruned_chunks']}, "
+            f"cache hits={res['cache']['hits']}, misses={res['cache']['misses']})"
+        )
     for p in paths:
         typer.echo(f"Written: {p}")
+    if register:
+        with RunCatalog(catalog or None) as cat:
+            cat.register_stats(out, res)
+
+
+# --------------------------------------------------------------------------------------
+# Run catalog
+# --------------------------------------------------------------------------------------
+runs_app = typer.Typer(help="Query the run catalog")
+app.add_typer(runs_app, name="runs")
+
+
+@runs_app.command("list")
+def runs_list_cmd(
+    catalog: str = typer.Option("", help="Run catalog sqlite (default: $PIE_CATALOG or ~/.pie/catalog.sqlite)"),
+    config_hash: str = typer.Option("", help="Only runs of this config hash"),
+    since: str = typer.Option("", help="Only runs created at/after this ISO date, e.g. 2024-05-01"),
+    until: str = typer.Option("", help="Only runs created before this ISO date"),
+    metric: str = typer.Option("", help=f"Filter on a summary metric: {'|'.join(SUMMARY_METRICS)}"),
+    min_value: float = typer.Option(None, help="--metric: lower bound (inclusive)"),
+    max_value: float = typer.Option(None, help="--metric: upper bound (inclusive)"),
+    limit: int = typer.Option(50, help="Max runs to list"),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of a table"),
+) -> None:
+    """
+    List registered runs, newest first.
+    """
+    import csv
+    import json
+
+    from pie.application.catalog import RunCatalog
+
+    with RunCatalog(catalog or None) as cat:
+        runs = cat.list_runs(
+            config_hash=config_hash or None,
+            since=since or None,
+            until=until or None,
+            metric=metric or None,
+            min_value=min_value,
+            max_value=max_value,
+            limit=limit,
+        )
+    if as_json:
+        typer.echo(json.dumps(runs, indent=2, ensure_ascii=False))
+        return
+    w = csv.writer(sys.stdout, delimiter="\t", lineterminator="\n")
+    w.writerow(["run_id", "created_at", "config_hash", "iterations", *SUMMARY_METRICS, "out_dir"])
+    for r in runs:
+        w.writerow(
+            [
+                r["run_id"],
+                r["created_at"],
+                r["config_hash"],
+                r["iterations"],
+                *(f"{r[m]:.4f}" if m in r else "" for m in SUMMARY_METRICS),
+                r["out_dir"],
+            ]
+        )
+
+
+@runs_app.command("compare")
+def runs_compare_cmd(
+    run_ids: Annotated[list[str], typer.Argument(help="Run ids or unique prefixes; deltas are against the first")],
+    catalog: str = typer.Option("", help="Run catalog sqlite (default: $PIE_CATALOG or ~/.pie/catalog.sqlite)"),
+) -> None:
+    """
+    Compare summary metrics, cost sketches and registered stats groups of runs.
+    """
+    import json
+
+    from pie.application.catalog import RunCatalog
+
+    with RunCatalog(catalog or None) as cat:
+        res = cat.compare(run_ids)
+    typer.echo(json.dumps(res, indent=2, ensure_ascii=False))
 
 
 # --------------------------------------------------------------------------------------
@@ -132,12 +493,284 @@ def stats_cmd(
 def dashboard_cmd(
     out: str = typer.Option("out", help="Output directory"),
     top: int = typer.Option(20, help="Top N passengers to show"),
+    charts: str = typer.Option("svg", help="Chart backend: svg (built-in) | matplotlib (PNG)"),
+    page_size: int = typer.Option(25, help="Rows per page in the dashboard tables"),
+    store: str = typer.Option(
+        "", help="Also mirror the dashboard to <store>/dashboard/: a directory or s3://bucket/prefix"
+    ),
 ) -> None:
     """
     Generate dashboard HTML + assets under out/dashboard/.
     """
-    paths = build_dashboard(out_dir=out, top=top)
-    typer.echo(f"✅ Dashboard written: {paths.index_html}")
+    from pie.application.dashboard import build_dashboard
+    from pie.infrastructure.io.store import open_store
+
+    paths = build_dashboard(
+        out_dir=out, top=top, charts=charts, page_size=page_size, store=open_store(store) if store else None
+    )
+    if not paths.rebuilt:
+        typer.echo(f"✅ Dashboard up to date: {paths.index_html}")
+        return
+    typer.echo(f"✅ Dashboard written: {paths.index_html} (rebuilt: {', '.join(paths.rebuilt)})")
+
+
+# --------------------------------------------------------------------------------------
+# Pipeline
+# --------------------------------------------------------------------------------------
+@app.command("pipeline")
+def pipeline_cmd(
+    config: str = typer.Option("configs/demo.yml", help="Path to YAML config"),
+    out: str = typer.Option("out", help="Output directory (replaced atomically when every stage succeeded)"),
+    audit: str = typer.Option("ledger", help="ledger|both (summary skips stats and dashboard)"),
+    ledger_mode: str = typer.Option("topk", help="all|eligible|topk|global_topk|sample|passenger_sample|weighted"),
+    ledger_topk: int = typer.Option(10, help="K for ledger_mode=topk/global_topk"),
+    ledger_sample: float = typer.Option(0.05, help="Sampling rate for ledger_mode=sample/passenger_sample/weighted"),
+    ledger_chunk_size: int = typer.Option(100, help="Chunk size (iterations) for ledger chunk files"),
+    ledger_block_rows: int = typer.Option(10_000, help="Rows per independently readable gzip block in chunk files"),
+    ledger_merge: bool = typer.Option(True, "--ledger-merge/--no-ledger-merge", help="Write out/entitlements.csv.gz"),
+    run_cache: str = typer.Option("", help="Run cache directory (a hit restores the run; stats then read the chunks)"),
+    top: int = typer.Option(20, help="Top N passengers (stats and dashboard)"),
+    by: str = typer.Option("segment", help="Stats grouping: none or comma list of ledger columns"),
+    metric: str = typer.Option("mean", help="Ranking metric: mean|sum|max|p95"),
+    min_cost: float = typer.Option(0.0, help="Ignore rows with total_cost_eur < min_cost"),
+    sample_size: int = typer.Option(5000, help="Reservoir size for quantile estimation"),
+    where: Annotated[list[str] | None, typer.Option("--where", help="Stats range filter, repeatable")] = None,
+    delay_bucket: int = typer.Option(60, help="Bucket width (minutes) when grouping by delay_minutes"),
+    charts: str = typer.Option("svg", help="Chart backend: svg (built-in) | matplotlib (PNG)"),
+    page_size: int = typer.Option(25, help="Rows per page in the dashboard tables"),
+    catalog: str = typer.Option("", help="Run catalog sqlite (default: $PIE_CATALOG or ~/.pie/catalog.sqlite)"),
+    register: bool = typer.Option(True, "--register/--no-register", help="Register the results in the run catalog"),
+) -> None:
+    """
+    simulate -> merge-ledger -> stats -> dashboard in one process, with
+    stats aggregated in memory and a per-stage out/pipeline_manifest.json.
+    """
+    from pie.application.catalog import RunCatalog
+    from pie.application.pipeline import (
+        PIPELINE_MANIFEST_NAME,
+        PipelineOptions,
+        run_pipeline,
+    )
+    from pie.application.stats import StatsQuery
+
+    opts = PipelineOptions(
+        audit=audit,
+        ledger_mode=ledger_mode,
+        ledger_topk=ledger_topk,
+        ledger_sample=ledger_sample,
+        ledger_chunk_size=ledger_chunk_size,
+        ledger_block_rows=ledger_block_rows,
+        run_cache=run_cache,
+        merge=ledger_merge,
+        query=StatsQuery(
+            top=top,
+            by=by,
+            metric=metric.strip().lower(),
+            min_cost=min_cost,
+            where=tuple(where or ()),
+            delay_bucket=delay_bucket,
+        ),
+        sample_size=sample_size,
+        dashboard_top=top,
+        charts=charts,
+        page_size=page_size,
+    )
+    res = run_pipeline(config, out, opts)
+
+    typer.echo(f"✅ Pipeline done: run_id={res['run_id'][:12]}{' (run cache hit)' if res['cache_hit'] else ''}")
+    for st in res["stages"]:
+        typer.echo(f"  {st['stage']:<10} {st['wall_s']:>8.3f}s  rows={st['rows']:<10} bytes={st['bytes']}")
+    typer.echo(f"Mean total cost (EUR): {res['summary']['mean_total_cost']:.2f}")
+    typer.echo(f"Artifacts written to: {out} (manifest: {Path(out) / PIPELINE_MANIFEST_NAME})")
+
+    if register:
+        with RunCatalog(catalog or None) as cat:
+            cat.register_run(out, res["df"])
+            if res["stats"] is not None:
+                cat.register_stats(out, res["stats"])
+            typer.echo(f"Registered in run catalog: {cat.path}")
+
+
+# --------------------------------------------------------------------------------------
+# Worker daemon
+# --------------------------------------------------------------------------------------
+@app.command("worker")
+def worker_cmd(
+    config: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--config",
+            help="Config file or directory of *.yml configs, repeatable (one job each) [default: configs/demo.yml]",
+        ),
+    ] = None,
+    out_root: str = typer.Option("out", help="Artifacts go to <out-root>/<config name>/"),
+    site: str = typer.Option(
+        "",
+        help="Publish dashboards to <site>/<config name>/ with an index page at <site>/ "
+        "(a directory or s3://bucket/prefix)",
+    ),
+    poll: float = typer.Option(30.0, help="Seconds between checks for changed inputs"),
+    max_workers: int = typer.Option(2, help="Jobs (configs) processed concurrently"),
+    once: bool = typer.Option(False, "--once", help="Run a single cycle and exit"),
+    audit: str = typer.Option("ledger", help="ledger|both"),
+    ledger_mode: str = typer.Option("topk", help="all|eligible|topk|global_topk|sample|passenger_sample|weighted"),
+    ledger_topk: int = typer.Option(10, help="K for ledger_mode=topk/global_topk"),
+    ledger_sample: float = typer.Option(0.05, help="Sampling rate for ledger_mode=sample/passenger_sample/weighted"),
+    ledger_chunk_size: int = typer.Option(100, help="Chunk size (iterations) for ledger chunk files"),
+    ledger_merge: bool = typer.Option(True, "--ledger-merge/--no-ledger-merge", help="Keep entitlements.csv.gz current"),
+    run_cache: str = typer.Option("", help="Run cache directory shared by all jobs"),
+    run_cache_max_gb: float = typer.Option(5.0, help="--run-cache: evict least recently used runs beyond this size"),
+    top: int = typer.Option(20, help="Top N passengers (stats and dashboard)"),
+    by: str = typer.Option("segment", help="Stats grouping: none or comma list of ledger columns"),
+    metric: str = typer.Option("mean", help="Ranking metric: mean|sum|max|p95"),
+    min_cost: float = typer.Option(0.0, help="Ignore rows with total_cost_eur < min_cost"),
+    sample_size: int = typer.Option(5000, help="Reservoir size for quantile estimation"),
+    where: Annotated[list[str] | None, typer.Option("--where", help="Stats range filter, repeatable")] = None,
+    charts: str = typer.Option("svg", help="Chart backend: svg (built-in) | matplotlib (PNG)"),
+    catalog: str = typer.Option("", help="Run catalog sqlite (default: $PIE_CATALOG or ~/.pie/catalog.sqlite)"),
+    register: bool = typer.Option(True, "--register/--no-register", help="Register the results in the run catalog"),
+) -> None:
+    """
+    Keep simulate -> merge -> stats -> dashboard -> publish current for each
+    config, rerunning only the stages whose inputs changed.
+    """
+    import signal
+    import threading
+    import time
+
+    from pie.application.stats import StatsQuery
+    from pie.application.worker import Worker, WorkerOptions
+
+    config = config or ["configs/demo.yml"]
+    opts = WorkerOptions(
+        audit=audit,
+        ledger_mode=ledger_mode,
+        ledger_topk=ledger_topk,
+        ledger_sample=ledger_sample,
+        ledger_chunk_size=ledger_chunk_size,
+        run_cache=run_cache,
+        run_cache_max_bytes=int(run_cache_max_gb * (1 << 30)),
+        merge=ledger_merge,
+        query=StatsQuery(top=top, by=by, metric=metric.strip().lower(), min_cost=min_cost, where=tuple(where or ())),
+        sample_size=sample_size,
+        dashboard_top=top,
+        charts=charts,
+        catalog=catalog,
+        register=register,
+    )
+
+    def log(msg: str) -> None:
+        typer.echo(f"[{time.strftime('%Y-%m-%dT%H:%M:%S')}] {msg}")
+
+    try:
+        worker = Worker(config, out_root, site or None, opts, max_workers=max_workers, log=log)
+    except ValueError as e:
+        raise typer.BadParameter(str(e)) from None
+    if once:
+        try:
+            results = worker.run_cycle()
+        finally:
+            worker.close()
+        if any(r["failed"] for r in results):
+            raise typer.Exit(code=1)
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    log(f"PIE worker started: {', '.join(config)} -> {out_root} (poll {poll}s, {max_workers} workers)")
+    try:
+        worker.run_forever(poll, stop)
+    except KeyboardInterrupt:
+        pass
+
+
+# --------------------------------------------------------------------------------------
+# Bench
+# --------------------------------------------------------------------------------------
+@app.command("bench")
+def bench_cmd(
+    config: str = typer.Option("configs/demo.yml", help="Base YAML config, rescaled to every matrix size"),
+    passengers: str = typer.Option("50,200", help="Comma-separated population sizes"),
+    iterations: str = typer.Option("20,100", help="Comma-separated iteration counts"),
+    case: Annotated[
+        list[str] | None,
+        typer.Option("--case", help="Case name or glob (e.g. 'simulate*'), repeatable; default all"),
+    ] = None,
+    repeat: int = typer.Option(5, help="Timed repetitions per case (median kept)"),
+    rounds: int = typer.Option(1, help="Sweeps over the whole matrix, samples pooled (use 3+ to record a baseline)"),
+    output: str = typer.Option("out/bench.json", help="Where to write the JSON results"),
+    baseline: str = typer.Option(
+        "", help="Baseline results to compare against (default: one per machine under $PIE_BENCH_DIR or ~/.pie/bench)"
+    ),
+    threshold: float = typer.Option(0.25, help="Fail when a rate drops more than this fraction below baseline"),
+    retries: int = typer.Option(1, help="Re-measure regressed cases this many times before failing (samples pooled)"),
+    update_baseline: bool = typer.Option(False, "--update-baseline", help="Write the results as the new baseline"),
+) -> None:
+    """
+    Benchmark the hot paths over a matrix of population and iteration sizes
+    and compare with a stored baseline (exit code 1 on regressions).
+    """
+    import json
+
+    from pie.bench.runner import (
+        compare,
+        default_baseline_path,
+        format_comparison,
+        pool_samples,
+        run_bench,
+        write_results,
+    )
+
+    def bench(only: list[str]) -> dict:
+        return run_bench(
+            config,
+            sizes_p,
+            sizes_i,
+            cases=case or (),
+            repeat=repeat,
+            rounds=rounds,
+            only=only,
+            progress=lambda r: typer.echo(
+                f"  {r['case']:<26} {r['passengers']:>6}x{r['iterations']:<6} {r['seconds'] * 1000:10.1f} ms  "
+                + ", ".join(f"{v:,.1f} {k}" for k, v in r["rates"].items())
+            ),
+        )
+
+    try:
+        sizes_p = [int(x) for x in passengers.split(",") if x.strip()]
+        sizes_i = [int(x) for x in iterations.split(",") if x.strip()]
+        res = bench([])
+    except ValueError as e:
+        raise typer.BadParameter(str(e)) from None
+
+    baseline_path = Path(baseline) if baseline else default_baseline_path(res["machine"])
+    if update_baseline:
+        typer.echo(f"✅ Results written: {write_results(output, res)}")
+        typer.echo(f"✅ Baseline updated: {write_results(baseline_path, res)}")
+        return
+    if not baseline_path.exists():
+        typer.echo(f"✅ Results written: {write_results(output, res)}")
+        typer.echo(f"No baseline at {baseline_path}; record one with --update-baseline")
+        return
+    ref = json.loads(baseline_path.read_text(encoding="utf-8"))
+    try:
+        rows = compare(res, ref, threshold=threshold)
+    except ValueError as e:
+        raise typer.BadParameter(str(e)) from None
+    for _ in range(retries):
+        slow = [r["key"] for r in rows if r["status"] == "regression"]
+        if not slow:
+            break
+        typer.echo(f"Re-measuring {len(slow)} regressed case(s)")
+        res = pool_samples(res, bench(slow))
+        rows = compare(res, ref, threshold=threshold)
+    typer.echo(f"✅ Results written: {write_results(output, res)}")
+    typer.echo(format_comparison(rows))
+    regressions = [r for r in rows if r["status"] == "regression"]
+    if regressions:
+        typer.echo(f"❌ {len(regressions)} regression(s) beyond {threshold:.0%} of {baseline_path}", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"✅ No regressions beyond {threshold:.0%} of {baseline_path}")
 
 
 # --------------------------------------------------------------------------------------
@@ -148,26 +781,36 @@ def serve_cmd(
     out: str = typer.Option("out", help="Output directory (expects out/dashboard/index.html)"),
     host: str = typer.Option("0.0.0.0", help="Bind host"),
     port: int = typer.Option(8010, help="Port"),
+    reload_interval: float = typer.Option(2.0, help="Seconds between checks for a newly built dashboard (0 = never)"),
+    verbose: bool = typer.Option(False, "--verbose", help="Log every request"),
 ) -> None:
     """
-    Serve dashboard over HTTP. Good for VM + host browser.
+    Serve the dashboard over HTTP: threaded, from memory, with gzip/brotli,
+    ETag and Range support, reloading atomically when a new build lands.
     """
-    dash_dir = Path(out) / "dashboard"
-    index = dash_dir / "index.html"
-    if not index.exists():
-        raise typer.BadParameter(f"Missing {index}. Run: pie dashboard --out {out}")
+    import threading
 
-    os.chdir(dash_dir)
+    from pie.application.serve import make_server
 
-    typer.echo(f"✅ Serving dashboard from: {dash_dir}")
-    typer.echo(f"   URL: http://{host}:{port}/index.html")
-
-    # Reuse address helps when you restart quickly
-    class ReuseTCPServer(socketserver.TCPServer):
-        allow_reuse_address = True
+    dash_dir = Path(out) / "dashboard"
+    try:
+        server, site = make_server(dash_dir, host=host, port=port)
+    except FileNotFoundError:
+        raise typer.BadParameter(f"Missing {dash_dir / 'index.html'}. Run: pie dashboard --out {out}") from None
+    server.verbose = verbose
+    stop = threading.Event()
+    if reload_interval > 0:
+        site.watch(reload_interval, stop)
 
-    with ReuseTCPServer((host, port), http.server.SimpleHTTPRequestHandler) as httpd:
-        httpd.serve_forever()
+    typer.echo(f"✅ Serving dashboard from: {dash_dir} ({len(site.files)} files in memory)")
+    typer.echo(f"   URL: http://{host}:{port}/index.html")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
 
 
 if __name__ == "__main__":
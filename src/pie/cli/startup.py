@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+# Import-time budget (ms, as reported by -X importtime) for commands that
+# cron/k8s jobs call many times a day; enforced by tests/test_startup.py.
+LIGHT_COMMANDS = ("version", "verify", "merge-ledger", "index", "lookup", "runs", "serve")
+LIGHT_BUDGET_MS = 250.0
+# Never imported by a light command.
+HEAVY_MODULES = ("pandas", "numpy", "yaml", "matplotlib")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def profile_command(args: list[str], env: dict[str, str] | None = None) -> dict[str, Any]:
+    """
+    Run `pie <args>` in a fresh interpreter under -X importtime and return
+    its output plus the import profile: total import time, every module
+    loaded with (self_ms, cumulative_ms) and the top-level imports.
+    """
+    src = str(Path(__file__).resolve().parents[2])
+    child_env = {**os.environ, **(env or {})}
+    child_env["PYTHONPATH"] = os.pathsep.join(p for p in (src, child_env.get("PYTHONPATH", "")) if p)
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "pie.cli.main", *args],
+        capture_output=True,
+        text=True,
+        env=child_env,
+        check=False,  # the exit code is part of the profile
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+
+    modules: dict[str, tuple[float, float]] = {}
+    top_level: list[tuple[str, float]] = []
+    stderr: list[str] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m is None:
+            if not line.startswith("import time: self [us]"):
+                stderr.append(line)
+            continue
+        self_ms, cum_ms = int(m.group(1)) / 1000, int(m.group(2)) / 1000
+        modules[m.group(4)] = (self_ms, cum_ms)
+        if not m.group(3):
+            top_level.append((m.group(4), cum_ms))
+    return {
+        "args": args,
+        "returncode": proc.returncode,
+        "stdout": proc.stdout,
+        "stderr": "\n".join(stderr) + ("\n" if stderr else ""),
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(sum(s for s, _ in modules.values()), 1),
+        "modules": modules,
+        "top_level": sorted(top_level, key=lambda t: -t[1]),
+        "heavy": [m for m in HEAVY_MODULES if m in modules],
+    }
+
+
+def format_report(profile: dict[str, Any], top: int = 15) -> str:
+    lines = [
+        f"startup profile: pie {' '.join(profile['args'])}",
+        (
+            f"  wall {profile['wall_ms']:.1f} ms, imports {profile['import_ms']:.1f} ms "
+            f"({len(profile['modules'])} modules)"
+        ),
+        f"  heavy modules: {', '.join(profile['heavy']) or 'none'}",
+        "  slowest top-level imports (cumulative ms):",
+    ]
+    lines.extend(f"    {cum:8.1f}  {name}" for name, cum in profile["top_level"][:top])
+    return "\n".join(lines)
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import queue
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from pie.infrastructure.io.ledger import file_sha256
+
+AUDIT_DIR = "events"
+AUDIT_INDEX_NAME = "events_index.json"
+GENESIS = "0" * 64
+
+
+def chain_hash(prev_chain: str, content_sha256: str) -> str:
+    """
+    Link of the segment hash chain: sha256(prev_chain || content_sha256).
+    """
+    return hashlib.sha256(f"{prev_chain}{content_sha256}".encode("ascii")).hexdigest()
+
+
+class AuditLogWriter:
+    """
+    Batched, rotated, hash-chained audit log: out/events/events_XXXXX.jsonl.gz
+    plus out/events_index.json.
+
+    - emit() only appends to an in-memory batch; full batches go to a
+      background thread that serializes, compresses and writes them
+    - a segment is closed once its uncompressed size reaches segment_bytes
+    - each segment opens with a segment_start line carrying run_id, seed and
+      the previous chain link, so per-event lines stay compact
+    - every segment's chain link covers its content hash and the previous
+      link; the index records the links and the final head
+    """
+
+    def __init__(
+        self,
+        out: Path,
+        run_id: str,
+        seed: int,
+        segment_bytes: int = 32 << 20,
+        batch_events: int = 1024,
+    ) -> None:
+        if segment_bytes <= 0 or batch_events <= 0:
+            raise ValueError("segment_bytes and batch_events must be > 0")
+        self.out = out
+        self.dir = out / AUDIT_DIR
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for old in self.dir.glob("events_*.jsonl.gz"):
+            old.unlink()
+        self.run_id = run_id
+        self.seed = seed
+        self.segment_bytes = segment_bytes
+        self.batch_events = batch_events
+
+        self.segments: list[dict[str, Any]] = []
+        self._chain = GENESIS
+        self._seg_fh: BinaryIO | None = None
+        self._seg_path: Path | None = None
+        self._seg_digest: Any | None = None
+        self._seg_bytes = 0
+        self._seg_events = 0
+
+        self._batch: list[dict[str, Any]] = []
+        self._queue: queue.Queue[list[dict[str, Any]] | None] = queue.Queue(maxsize=8)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._drain, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    # --- producer side (simulation loop) ---
+    def emit(self, event: Mapping[str, Any]) -> None:
+        self._batch.append(dict(event))
+        if len(self._batch) >= self.batch_events:
+            self._hand_off()
+
+    def _hand_off(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("audit log writer failed") from self._error
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def close(self) -> dict[str, Any]:
+        self._hand_off()
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("audit log writer failed") from self._error
+        self._close_segment()
+
+        index = {
+            "version": 1,
+            "run_id": self.run_id,
+            "dir": AUDIT_DIR,
+            "segment_bytes": self.segment_bytes,
+            "events": sum(s["events"] for s in self.segments),
+            "head": self._chain,
+            "segments": self.segments,
+        }
+        (self.out / AUDIT_INDEX_NAME).write_text(json.dumps(index, indent=2) + "\n", encoding="utf-8")
+        return index
+
+    # --- writer thread ---
+    def _drain(self) -> None:
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    return
+                for event in batch:
+                    self._write_event(event)
+        except BaseException as e:  # noqa: BLE001 - surfaced to the producer on its next call
+            self._error = e
+            while self._queue.get() is not None:
+                pass
+
+    def _write_event(self, event: Mapping[str, Any]) -> None:
+        if self._seg_fh is None:
+            self._open_segment()
+        self._write_line(event)
+        self._seg_events += 1
+        if self._seg_bytes >= self.segment_bytes:
+            self._close_segment()
+
+    def _write_line(self, obj: Mapping[str, Any]) -> None:
+        assert self._seg_fh is not None and self._seg_digest is not None
+        data = (json.dumps(obj, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        self._seg_fh.write(data)
+        self._seg_digest.update(data)
+        self._seg_bytes += len(data)
+
+    def _open_segment(self) -> None:
+        n = len(self.segments)
+        self._seg_path = self.dir / f"events_{n:05d}.jsonl.gz"
+        # Owns the file; the name it embeds is the segment's own.
+        self._seg_fh = gzip.GzipFile(self._seg_path, mode="wb", mtime=0)
+        self._seg_digest = hashlib.sha256()
+        self._seg_bytes = 0
+        self._seg_events = 0
+        self._write_line(
+            {
+                "type": "segment_start",
+                "segment": n,
+                "run_id": self.run_id,
+                "seed": self.seed,
+                "prev_chain": self._chain,
+            }
+        )
+
+    def _close_segment(self) -> None:
+        if self._seg_fh is None:
+            return
+        assert self._seg_path is not None and self._seg_digest is not None
+        self._seg_fh.close()
+        content = self._seg_digest.hexdigest()
+        self._chain = chain_hash(self._chain, content)
+        self.segments.append(
+            {
+                "segment": len(self.segments),
+                "file": self._seg_path.name,
+                "events": self._seg_events,
+                "raw_bytes": self._seg_bytes,
+                "bytes": self._seg_path.stat().st_size,
+                "sha256": file_sha256(self._seg_path),
+                "content_sha256": content,
+                "chain": self._chain,
+            }
+        )
+        self._seg_fh = None
+        self._seg_path = None
+        self._seg_digest = None
+
+
+def read_audit_segment(path: Path) -> tuple[str, int, dict[str, Any]]:
+    """
+    (content sha256, event count excluding segment_start, segment_start line).
+    """
+    h = hashlib.sha256()
+    events = -1
+    first: dict[str, Any] = {}
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            h.update(line)
+            if events < 0:
+                first = json.loads(line)
+            events += 1
+    return h.hexdigest(), max(events, 0), first
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from pie.infrastructure.io.ledger import (
+    BIN_HEADER_NAME,
+    BIN_NAME,
+    LEDGER_FIELDS,
+    SAMPLE_WEIGHT_FIELD,
+    read_ledger_index,
+)
+
+BIN_VERSION = 1
+
+# Fixed-width little-endian record; categorical columns are codes into the
+# header's "categories", passenger is an index into its "passengers" table.
+BIN_DTYPE = np.dtype(
+    [
+        ("iteration", "<i4"),
+        ("passenger", "<i4"),
+        ("segment", "u1"),
+        ("refundable", "u1"),
+        ("dtype", "u1"),
+        ("delay_minutes", "<i4"),
+        ("cash_comp_eur", "<f8"),
+        ("care_cost_eur", "<f8"),
+        ("refund_cost_eur", "<f8"),
+        ("rebooking_cost_eur", "<f8"),
+        ("total_cost_eur", "<f8"),
+        (SAMPLE_WEIGHT_FIELD, "<f8"),
+    ]
+)
+
+CATEGORICAL_FIELDS = ("segment", "dtype")
+
+
+class BinaryLedgerWriter:
+    """
+    Buffered writer for out/ledger.bin + out/ledger_bin.json.
+
+    Rows are packed into BIN_DTYPE records and appended in batches of
+    batch_rows. The header (written on close) carries the category and
+    passenger tables, per-iteration row offsets when rows arrive in
+    iteration order, and the sha256 of the record file.
+    """
+
+    def __init__(
+        self,
+        out: Path,
+        passenger_ids: Sequence[str],
+        categories: Mapping[str, Sequence[str]],
+        batch_rows: int = 65_536,
+    ) -> None:
+        self.path = out / BIN_NAME
+        self.header_path = out / BIN_HEADER_NAME
+        self.passenger_ids = list(passenger_ids)
+        self.categories = {k: list(v) for k, v in categories.items()}
+        self.batch_rows = batch_rows
+        self._pid_code = {pid: i for i, pid in enumerate(self.passenger_ids)}
+        self._cat_code = {k: {v: i for i, v in enumerate(vals)} for k, vals in self.categories.items()}
+        self._batch: list[tuple[Any, ...]] = []
+        self._iter_counts: list[int] = []
+        self._ordered = True
+        self._digest = hashlib.sha256()
+        self.rows = 0
+        self.path.write_bytes(b"")  # batches are appended on flush
+
+    def write_row(self, row: Mapping[str, Any]) -> None:
+        it = int(row["iteration"])
+        if it < len(self._iter_counts) - 1:
+            self._ordered = False
+        if it >= len(self._iter_counts):
+            self._iter_counts.extend([0] * (it + 1 - len(self._iter_counts)))
+        self._iter_counts[it] += 1
+
+        self._batch.append(
+            (
+                it,
+                self._pid_code[str(row["passenger_id"])],
+                self._cat_code["segment"][str(row["segment"])],
+                1 if row["refundable"] in (True, "True") else 0,
+                self._cat_code["dtype"][str(row["dtype"])],
+                int(row["delay_minutes"]),
+                float(row["cash_comp_eur"]),
+                float(row["care_cost_eur"]),
+                float(row["refund_cost_eur"]),
+                float(row["rebooking_cost_eur"]),
+                float(row["total_cost_eur"]),
+                float(row.get(SAMPLE_WEIGHT_FIELD, 1.0)),
+            )
+        )
+        self.rows += 1
+        if len(self._batch) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+        data = np.array(self._batch, dtype=BIN_DTYPE).tobytes()
+        with self.path.open("ab") as fh:
+            fh.write(data)
+        self._digest.update(data)
+        self._batch.clear()
+
+    def close(self, run_id: str, seed: int, iterations: int, weighted: bool) -> dict[str, Any]:
+        self._flush()
+
+        offsets: list[int] | None = None
+        if self._ordered:
+            counts = self._iter_counts + [0] * (iterations - len(self._iter_counts))
+            offsets = [0, *np.cumsum(counts, dtype=np.int64).tolist()]
+
+        header = {
+            "version": BIN_VERSION,
+            "run_id": run_id,
+            "seed": seed,
+            "file": BIN_NAME,
+            "rows": self.rows,
+            "bytes": self.path.stat().st_size,
+            "sha256": self._digest.hexdigest(),
+            "record_dtype": [[name, BIN_DTYPE[name].str] for name in BIN_DTYPE.names or ()],
+            "weighted": weighted,
+            "categories": self.categories,
+            "passengers": self.passenger_ids,
+            "iteration_offsets": offsets,
+        }
+        self.header_path.write_text(json.dumps(header) + "\n", encoding="utf-8")
+        return header
+
+
+class BinaryLedger:
+    """
+    Read side of ledger.bin. `records` is a read-only np.memmap; slicing it
+    by iteration is zero-copy, so only the touched pages are ever read.
+    """
+
+    def __init__(self, out_dir: str | Path) -> None:
+        self.out = Path(out_dir)
+        header_path = self.out / BIN_HEADER_NAME
+        if not header_path.exists():
+            raise FileNotFoundError(f"Missing {header_path}. Run: pie simulate --ledger-binary")
+        self.header: dict[str, Any] = json.loads(header_path.read_text(encoding="utf-8"))
+        if int(self.header["version"]) != BIN_VERSION:
+            raise ValueError(f"Unsupported {BIN_HEADER_NAME} version: {self.header['version']}")
+        dtype = np.dtype([(name, code) for name, code in self.header["record_dtype"]])
+        if dtype != BIN_DTYPE:
+            raise ValueError(f"Unexpected record layout in {header_path}")
+        idx = read_ledger_index(self.out)
+        if idx is not None and str(idx["run_id"]) != str(self.header["run_id"]):
+            raise ValueError(f"Stale {header_path}: written by run {self.header['run_id']}, ledger is {idx['run_id']}")
+
+        self.path = self.out / self.header["file"]
+        rows = int(self.header["rows"])
+        if rows:
+            self.records: np.ndarray = np.memmap(self.path, dtype=BIN_DTYPE, mode="r", shape=(rows,))
+        else:
+            self.records = np.zeros(0, dtype=BIN_DTYPE)
+        self.passengers: list[str] = list(self.header["passengers"])
+        self.categories: dict[str, list[str]] = self.header["categories"]
+        offsets = self.header["iteration_offsets"]
+        self.offsets = None if offsets is None else np.asarray(offsets, dtype=np.int64)
+
+    @property
+    def fields(self) -> list[str]:
+        return LEDGER_FIELDS + ([SAMPLE_WEIGHT_FIELD] if self.header["weighted"] else [])
+
+    def iterations(self, start: int, stop: int) -> np.ndarray:
+        """
+        Records of iterations [start, stop), as a view into the memmap.
+        """
+        if self.offsets is None:
+            its = self.records["iteration"]
+            return self.records[(its >= start) & (its < stop)]
+        n = len(self.offsets) - 1
+        start, stop = max(0, start), min(n, stop)
+        if start >= stop:
+            return self.records[:0]
+        return self.records[self.offsets[start] : self.offsets[stop]]
+
+    def iteration(self, it: int) -> np.ndarray:
+        return self.iterations(it, it + 1)
+
+    def passenger_code(self, passenger_id: str) -> int:
+        try:
+            return self.passengers.index(passenger_id)
+        except ValueError:
+            return -1
+
+    def passenger_range(self, first: str, last: str, recs: np.ndarray | None = None) -> np.ndarray:
+        """
+        Records whose passenger id is in [first, last] (string order).
+        """
+        recs = self.records if recs is None else recs
+        codes = [i for i, pid in enumerate(self.passengers) if first <= pid <= last]
+        return recs[np.isin(recs["passenger"], codes)]
+
+    def to_rows(self, recs: np.ndarray) -> list[dict[str, str]]:
+        """
+        Records -> ledger rows formatted like the CSV chunks.
+        """
+        run_id, seed = str(self.header["run_id"]), str(self.header["seed"])
+        seg, dt = self.categories["segment"], self.categories["dtype"]
+        weighted = bool(self.header["weighted"])
+        out: list[dict[str, str]] = []
+        for r in recs.tolist():
+            it, pax, s, refundable, d, delay, cash, care, refund, rebook, total, w = r
+            row = {
+                "run_id": run_id,
+                "iteration": str(it),
+                "seed": seed,
+                "passenger_id": self.passengers[pax],
+                "segment": seg[s],
+                "refundable": str(bool(refundable)),
+                "dtype": dt[d],
+                "delay_minutes": str(delay),
+                "cash_comp_eur": str(cash),
+                "care_cost_eur": str(care),
+                "refund_cost_eur": str(refund),
+                "rebooking_cost_eur": str(rebook),
+                "total_cost_eur": str(total),
+            }
+            if weighted:
+                row[SAMPLE_WEIGHT_FIELD] = str(w)
+            out.append(row)
+        return out
@@ -2,10 +2,52 @@ from __future__ import annotations
 
 import csv
 import gzip
-from collections.abc import Mapping
+import hashlib
+import io
+import json
+import stat
+from collections.abc import Iterable, Iterator, Mapping, Sequence
 from dataclasses import asdict, is_dataclass
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pie.infrastructure.io.store import Uploader
+
+LEDGER_FIELDS = [
+    "run_id",
+    "iteration",
+    "seed",
+    "passenger_id",
+    "segment",
+    "refundable",
+    "dtype",
+    "delay_minutes",
+    "cash_comp_eur",
+    "care_cost_eur",
+    "refund_cost_eur",
+    "rebooking_cost_eur",
+    "total_cost_eur",
+]
+
+# Extra column written by ledger_mode=weighted: inverse inclusion probability.
+SAMPLE_WEIGHT_FIELD = "sample_weight"
+
+# Memory-mappable ledger copy (see binledger); names live here so callers
+# that only check for the files need not import numpy.
+BIN_NAME = "ledger.bin"
+BIN_HEADER_NAME = "ledger_bin.json"
+
+# Numeric columns whose per-chunk min/max are recorded as zone maps.
+ZONE_MAP_FIELDS = [
+    "iteration",
+    "delay_minutes",
+    "cash_comp_eur",
+    "care_cost_eur",
+    "refund_cost_eur",
+    "rebooking_cost_eur",
+    "total_cost_eur",
+]
 
 
 class LedgerWriter:
@@ -14,16 +56,52 @@ class LedgerWriter:
 
     - Avoids keeping 10M+ rows in RAM
     - Supports .csv and .csv.gz
+    - Tracks min/max of zone_fields (zone map) for predicate pushdown
+    - With block_rows > 0, .csv.gz files are written as a header member plus
+      one independent gzip member per block_rows rows. The file is still a
+      plain gzip CSV, but each block can be read alone by (offset, length);
+      see `blocks` and read_block_lines().
+    - After close, `sha256` and `bytes_written` describe the file on disk
+    - With an `uploader`, the closed
+      file is queued for upload under `key` (default: its file name)
     """
 
-    def __init__(self, path: Path, fieldnames: list[str]) -> None:
+    def __init__(
+        self,
+        path: Path,
+        fieldnames: list[str],
+        zone_fields: Sequence[str] = (),
+        block_rows: int = 0,
+        uploader: Uploader | None = None,
+        key: str | None = None,
+    ) -> None:
         self.path = path
+        self.uploader = uploader
+        self.key = key or path.name
         self.fieldnames = fieldnames
+        self.zone_fields = [f for f in zone_fields if f in fieldnames]
+        self.zone_map: dict[str, list[float]] = {}
+        self.block_rows = block_rows if path.suffix == ".gz" else 0
+        # [offset, length, rows] per data block (block mode only)
+        self.blocks: list[list[int]] = []
         self._fh: Any | None = None
         self._writer: csv.DictWriter | None = None
+        self._buf: io.StringIO | None = None
+        self._block_fill = 0
+        self._digest: Any | None = None
+        self.sha256: str | None = None
+        self.bytes_written = 0
 
     def __enter__(self) -> LedgerWriter:
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.block_rows > 0:
+            self._fh = open(self.path, "wb")
+            self._digest = hashlib.sha256()
+            self._buf = io.StringIO(newline="")
+            self._writer = csv.DictWriter(self._buf, fieldnames=self.fieldnames)
+            self._writer.writeheader()
+            self._flush_block(header=True)
+            return self
         if self.path.suffix == ".gz":
             self._fh = gzip.open(self.path, "wt", encoding="utf-8", newline="")
         else:
@@ -46,8 +124,184 @@ class LedgerWriter:
         cleaned = {k: row.get(k, "") for k in self.fieldnames}
         self._writer.writerow(cleaned)
 
+        if self._buf is not None:
+            self._block_fill += 1
+            if self._block_fill >= self.block_rows:
+                self._flush_block()
+
+        for k in self.zone_fields:
+            v = float(cleaned[k])
+            z = self.zone_map.get(k)
+            if z is None:
+                self.zone_map[k] = [v, v]
+            elif v < z[0]:
+                z[0] = v
+            elif v > z[1]:
+                z[1] = v
+
+    def _flush_block(self, header: bool = False) -> None:
+        assert self._buf is not None and self._fh is not None
+        data = self._buf.getvalue()
+        if not data:
+            return
+        # mtime=0 keeps identical content byte-identical across runs
+        member = gzip.compress(data.encode("utf-8"), mtime=0)
+        offset = self._fh.tell()
+        self._fh.write(member)
+        assert self._digest is not None
+        self._digest.update(member)
+        if not header:
+            self.blocks.append([offset, len(member), self._block_fill])
+        self._buf.seek(0)
+        self._buf.truncate(0)
+        self._block_fill = 0
+
     def __exit__(self, exc_type, exc, tb) -> None:
+        if self._buf is not None and self._fh is not None:
+            self._flush_block()
         if self._fh is not None:
             self._fh.close()
+            # Block mode hashed members as they were written; other modes re-read
+            # the (page-cached) file once.
+            self.sha256 = self._digest.hexdigest() if self._digest is not None else file_sha256(self.path)
+            self.bytes_written = self.path.stat().st_size
+            if self.uploader is not None and exc_type is None:
+                self.uploader.submit(self.key, self.path)
         self._fh = None
         self._writer = None
+        self._buf = None
+        self._digest = None
+
+
+def read_ledger_index(out: Path) -> dict[str, Any] | None:
+    """
+    Load out/ledger_index.json, or None when the run has no ledger.
+    """
+    path = out / "ledger_index.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def resolve_ledger_dir(out: Path, ledger: Mapping[str, Any]) -> Path:
+    """
+    The index stores the ledger dir as it was spelled at simulate time (often
+    relative to another cwd). Chunks always live under the run's out dir, so
+    prefer that location and fall back to the recorded path.
+    """
+    recorded = Path(str(ledger["dir"]))
+    local = out / recorded.name
+    if local.is_dir():
+        return local
+    return recorded
+
+
+def read_block_lines(path: Path, offset: int, length: int) -> list[str]:
+    """
+    Data lines of one block written by LedgerWriter(block_rows>0).
+    length < 0 means "the whole file", minus its header line; this is how
+    chunks without block metadata are addressed.
+    """
+    if length < 0:
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            f.readline()
+            return f.read().splitlines()
+    with path.open("rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    return gzip.decompress(data).decode("utf-8").splitlines()
+
+
+def iter_chunk_blocks(ledger_dir: Path, chunks: Sequence[Mapping[str, Any]]) -> Iterator[tuple[int, Path, int, int, int]]:
+    """
+    Yields (chunk, path, offset, length, rows) for every addressable block.
+    Chunks without block metadata yield one whole-file pseudo block.
+    """
+    for ch in chunks:
+        path = ledger_dir / ch["file"]
+        blocks = ch.get("blocks")
+        if blocks is None:
+            yield int(ch["chunk"]), path, 0, -1, int(ch["rows_written"])
+            continue
+        for offset, length, rows in blocks:
+            yield int(ch["chunk"]), path, int(offset), int(length), int(rows)
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            buf = f.read(block_size)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
+
+
+def detach_hardlinks(out: Path, names: Iterable[str], dirs: Iterable[str] = ()) -> None:
+    """
+    Unlink the run files `names` (relative to `out`) and the files directly
+    under `dirs` that are hardlinked elsewhere (e.g. restored from a run
+    cache), so rewriting them in place can never alter the other copy, or
+    read-only (a cache entry's mode survives once the entry is evicted), which
+    a non-root writer could not reopen. Anything else in `out` is left alone.
+    """
+    paths = [out / n for n in names]
+    for d in dirs:
+        if (out / d).is_dir():
+            paths += (out / d).iterdir()
+    for p in paths:
+        if not p.is_file() or p.is_symlink():
+            continue
+        st = p.stat()
+        if st.st_nlink > 1 or not st.st_mode & stat.S_IWUSR:
+            p.unlink()
+
+
+def merkle_root(hex_digests: Sequence[str]) -> str:
+    """
+    sha256 Merkle root over chunk digests, in chunk order. An odd node at any
+    level is paired with itself. The root of zero chunks is sha256(b"").
+    """
+    level = [bytes.fromhex(h) for h in hex_digests]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def passenger_in_sample(passenger_id: str, fraction: float) -> bool:
+    """
+    Hash-determined passenger subset for ledger_mode=passenger_sample: the
+    first 8 bytes of blake2b(passenger_id) as a fraction of 2**64. The same
+    ids are selected in every iteration and every run.
+    """
+    h = int.from_bytes(hashlib.blake2b(passenger_id.encode("utf-8"), digest_size=8).digest(), "big")
+    return h < fraction * 2.0**64
+
+
+class WeightedRowSampler:
+    """
+    Tail-biased inclusion probabilities for ledger_mode=weighted.
+
+    A row with total cost c is kept with p = min(1, fraction * max(c / mean, floor)),
+    where mean is the running mean cost of all rows seen before it. Costly
+    rows are kept more often; the floor keeps cheap rows representable.
+    Writers store 1/p as the row's sample weight (Horvitz-Thompson).
+    """
+
+    def __init__(self, fraction: float, floor: float = 0.1) -> None:
+        self.fraction = fraction
+        self.floor = floor
+        self._n = 0
+        self._sum = 0.0
+
+    def inclusion_prob(self, cost: float) -> float:
+        mean = self._sum / self._n if self._n else 0.0
+        rel = cost / mean if mean > 0 else 1.0
+        self._n += 1
+        self._sum += cost
+        return min(1.0, self.fraction * max(rel, self.floor))
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Self
+
+# S3 rejects multipart parts below 5 MiB (except the last one).
+MIN_PART_SIZE = 5 << 20
+
+
+class ArtifactStore(ABC):
+    """
+    Where run artifacts are published. Keys are relative '/'-separated paths
+    mirroring the out dir layout (run.json, ledger/entitlements_chunk_00000.csv.gz,
+    dashboard/index.html, ...). Writes of a key are atomic for readers.
+    """
+
+    url: str
+
+    @abstractmethod
+    def put_file(self, key: str, path: Path) -> None:
+        ...
+
+    @abstractmethod
+    def put_bytes(self, key: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def get_bytes(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str = "") -> list[str]:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LocalStore(ArtifactStore):
+    """
+    A directory. Files are staged next to their target and renamed over it,
+    so the directory may be a mounted volume that is being served.
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.url = str(self.root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Key escapes the store root: {key!r}")
+        return path
+
+    def _replace(self, target: Path, write: Callable[[Path], None]) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+        try:
+            write(tmp)
+            tmp.replace(target)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def put_file(self, key: str, path: Path) -> None:
+        target = self._path(key)
+        if target == Path(path).resolve():  # the store is the out dir itself
+            return
+        self._replace(target, lambda tmp: shutil.copyfile(path, tmp))
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self._replace(self._path(key), lambda tmp: tmp.write_bytes(data))
+
+    def get_bytes(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def list(self, prefix: str = "") -> list[str]:
+        if not self.root.exists():
+            return []
+        keys = (p.relative_to(self.root).as_posix() for p in self.root.rglob("*") if p.is_file())
+        return sorted(k for k in keys if k.startswith(prefix) and ".tmp-" not in k)
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        path.unlink(missing_ok=True)
+        parent = path.parent
+        root = self.root.resolve()
+        while parent != root and parent.is_dir() and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+
+
+def _is_missing(err: Exception) -> bool:
+    code = getattr(err, "response", {}).get("Error", {}).get("Code")
+    return code in {"404", "NoSuchKey", "NotFound"}
+
+
+class S3Store(ArtifactStore):
+    """
+    An S3-compatible bucket (AWS, MinIO, Ceph, ...). `client` is any object
+    with the boto3 S3 client methods used here; by default one is created
+    with boto3 (optional dependency), honouring `endpoint_url` for
+    non-AWS endpoints. Files of at least `multipart_threshold` bytes are
+    sent as a multipart upload in `part_size` parts.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client: Any | None = None,
+        endpoint_url: str | None = None,
+        multipart_threshold: int = 64 << 20,
+        part_size: int = 16 << 20,
+    ) -> None:
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be >= {MIN_PART_SIZE} bytes")
+        if multipart_threshold < part_size:
+            raise ValueError("multipart_threshold must be >= part_size")
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise ImportError(
+                    "The S3 artifact store needs boto3: pip install 'passenger-impact-engine[s3]'"
+                ) from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.url = f"s3://{bucket}/{self.prefix}"
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put_file(self, key: str, path: Path) -> None:
+        if Path(path).stat().st_size < self.multipart_threshold:
+            self.put_bytes(key, Path(path).read_bytes())
+            return
+        full = self._key(key)
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=full)["UploadId"]
+        try:
+            parts = []
+            with open(path, "rb") as f:
+                while chunk := f.read(self.part_size):
+                    n = len(parts) + 1
+                    resp = self.client.upload_part(
+                        Bucket=self.bucket, Key=full, UploadId=upload_id, PartNumber=n, Body=chunk
+                    )
+                    parts.append({"ETag": resp["ETag"], "PartNumber": n})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=full, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=full, UploadId=upload_id)
+            raise
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def get_bytes(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if _is_missing(e):
+                return False
+            raise
+        return True
+
+    def list(self, prefix: str = "") -> list[str]:
+        keys: list[str] = []
+        kwargs: dict[str, Any] = {"Bucket": self.bucket, "Prefix": self._key(prefix)}
+        while True:
+            resp = self.client.list_objects_v2(**kwargs)
+            keys.extend(obj["Key"][len(self.prefix) :] for obj in resp.get("Contents", []))
+            if not resp.get("IsTruncated"):
+                return sorted(keys)
+            kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def open_store(url: str | Path) -> ArtifactStore:
+    """
+    s3://bucket/prefix -> S3Store (endpoint from $PIE_S3_ENDPOINT_URL, for
+    S3-compatible servers); anything else is a local directory.
+    """
+    url = str(url)
+    if url.startswith("s3://"):
+        bucket, _, prefix = url[len("s3://") :].partition("/")
+        if not bucket:
+            raise ValueError(f"Missing bucket in store URL: {url}")
+        return S3Store(bucket, prefix, endpoint_url=os.environ.get("PIE_S3_ENDPOINT_URL") or None)
+    return LocalStore(url.removeprefix("file://"))
+
+
+class Uploader:
+    """
+    Uploads files to a store on a small thread pool while the caller keeps
+    working (e.g. the next ledger chunk is simulated while the previous one
+    uploads). wait() blocks until everything submitted so far is stored and
+    re-raises the first upload error.
+    """
+
+    def __init__(self, store: ArtifactStore, max_workers: int = 4) -> None:
+        if max_workers < 1:
+            raise ValueError("upload workers must be >= 1")
+        self.store = store
+        self.submitted: dict[str, Path] = {}
+        self.bytes = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pie-upload")
+        self._pending: list[Future[None]] = []
+
+    def submit(self, key: str, path: Path) -> None:
+        self.submitted[key] = Path(path)
+        self.bytes += Path(path).stat().st_size
+        self._pending.append(self._pool.submit(self.store.put_file, key, Path(path)))
+
+    def wait(self) -> None:
+        pending, self._pending = self._pending, []
+        errors = [e for e in (f.exception() for f in pending) if e is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            return
+        self.close()
+
+
+def sync_dir(
+    src: Path,
+    store: ArtifactStore,
+    prefix: str = "",
+    immutable: Callable[[str], bool] = lambda rel: False,
+    last: Iterable[str] = ("index.html",),
+    skip: Iterable[str] = (),
+) -> list[str]:
+    """
+    Make store[prefix...] mirror the files under `src`: files named
+    immutable (content-hashed) are only uploaded when missing, the others
+    always; the `last` files go after everything they may reference, and
+    keys no longer present under `src` are deleted at the end. Returns the
+    uploaded relative paths.
+    """
+    last, skip = tuple(last), set(skip)
+    rels = sorted(
+        (p.relative_to(src).as_posix() for p in src.rglob("*") if p.is_file()),
+        key=lambda r: (r in last, r),
+    )
+    rels = [r for r in rels if r not in skip]
+    present = set(store.list(prefix))
+    uploaded = []
+    for rel in rels:
+        key = prefix + rel
+        if immutable(rel) and key in present:
+            continue
+        store.put_file(key, src / rel)
+        uploaded.append(rel)
+    wanted = {prefix + r for r in rels}
+    for key in sorted(present - wanted):
+        store.delete(key)
+    return uploaded
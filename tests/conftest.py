@@ -1,5 +1,21 @@
 import sys
 from pathlib import Path
 
+import pytest
+import yaml
+
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def small_config(tmp_path: Path) -> Path:
+    """
+    demo.yml shrunk to a size that simulates in well under a second.
+    """
+    cfg = yaml.safe_load((ROOT / "configs" / "demo.yml").read_text(encoding="utf-8"))
+    cfg["run"]["iterations"] = 40
+    cfg["population"]["passengers"] = 30
+    path = tmp_path / "small.yml"
+    path.write_text(yaml.safe_dump(cfg), encoding="utf-8")
+    return path
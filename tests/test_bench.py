@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from pie.bench.cases import CASES
+from pie.bench.runner import (
+    compare,
+    default_baseline_path,
+    machine_key,
+    pool_samples,
+    result_key,
+    run_bench,
+    select_cases,
+)
+
+
+def test_bench_smoke_runs_every_case(small_config: Path, tmp_path: Path):
+    work = tmp_path / "work"
+    work.mkdir()
+    res = run_bench(str(small_config), passengers=[10], iterations=[4], repeat=1, rounds=2, work_dir=str(work))
+    assert [r["case"] for r in res["results"]] == [c.name for c in CASES]
+    for r in res["results"]:
+        assert r["seconds"] > 0 and r["rates"][r["metric"]] > 0 and len(r["seconds_all"]) == 2
+    assert list(work.iterdir()) == []  # work dir cleaned up
+
+
+def test_compare_flags_regressions_beyond_threshold(small_config: Path):
+    res = run_bench(str(small_config), passengers=[10], iterations=[4], cases=["simulate[all]", "verify*"], repeat=1)
+    assert [r["case"] for r in res["results"]] == ["simulate[all]", "verify_run[fast]", "verify_run[deep]"]
+
+    slower = json.loads(json.dumps(res))
+    slower["results"][0]["rates"] = {k: v / 2 for k, v in slower["results"][0]["rates"].items()}
+    slower["results"][0]["seconds"] *= 2
+    rows = {r["key"]: r for r in compare(slower, res, threshold=0.25)}
+    assert rows["simulate[all]@10x4"]["status"] == "regression"
+    assert rows["simulate[all]@10x4"]["change"] == pytest.approx(-0.5)
+    assert rows["verify_run[fast]@10x4"]["status"] == "ok"
+    assert compare(res, {**res, "results": res["results"][1:]})[0]["status"] == "new"
+
+    # a re-measurement is pooled with the first samples, not swapped in as best-of-N
+    again = json.loads(json.dumps(res))
+    again["results"][0]["seconds_all"] = [again["results"][0]["seconds"] / 4] * 2
+    merged = pool_samples(slower, {**again, "results": again["results"][:1]})
+    first = merged["results"][0]
+    assert result_key(first) == "simulate[all]@10x4" and len(first["seconds_all"]) == 3
+    quick = again["results"][0]["seconds_all"][0]
+    assert first["seconds"] == pytest.approx(quick, abs=1e-6)  # median of [slow, quick, quick]
+    assert first["rates"][first["metric"]] == pytest.approx(first["work"][first["metric"][:-2]] / quick, rel=1e-3)
+    assert merged["results"][1:] == slower["results"][1:]
+
+    # baselines belong to the machine that recorded them
+    other = {**res, "machine": {**res["machine"], "node": "elsewhere"}}
+    with pytest.raises(ValueError, match="recorded on elsewhere"):
+        compare(res, other)
+
+    with pytest.raises(ValueError):
+        select_cases(["nope*"])
+
+
+def test_default_baseline_is_per_machine(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("PIE_BENCH_DIR", str(tmp_path))
+    a = {"node": "ci-1", "cpus": 4, "python": "3.11.9"}
+    assert default_baseline_path(a) == tmp_path / f"baseline-{machine_key(a)}.json"
+    assert default_baseline_path(a) != default_baseline_path({**a, "cpus": 1})
+
@@ -0,0 +1,71 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+import yaml
+
+from pie.application.catalog import CostSketch, RunCatalog
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import compute_stats_v2
+
+
+def test_cost_sketch_merges_and_bounds_relative_error():
+    rng = random.Random(7)
+    a_vals = [rng.lognormvariate(6, 1) for _ in range(3000)]
+    b_vals = [rng.lognormvariate(7, 0.5) for _ in range(2000)] + [0.0] * 50
+    a, b = CostSketch(), CostSketch()
+    a.extend(a_vals)
+    b.extend(b_vals)
+    a.merge(CostSketch.from_json(b.to_json()))
+
+    vals = sorted(a_vals + b_vals)
+    assert a.count == len(vals)
+    for q in (0.5, 0.95, 0.99):
+        exact = vals[int(q * (len(vals) - 1))]
+        assert a.quantile(q) == pytest.approx(exact, rel=0.011)
+    assert a.quantile(0.001) == 0.0
+    with pytest.raises(ValueError, match="Cannot merge"):
+        a.merge(CostSketch(alpha=0.05))
+
+
+def test_catalog_registers_and_queries_runs(small_config: Path, tmp_path: Path):
+    other_cfg = yaml.safe_load(small_config.read_text(encoding="utf-8"))
+    other_cfg["run"]["seed"] = int(other_cfg["run"]["seed"]) + 1
+    other_config = tmp_path / "other.yml"
+    other_config.write_text(yaml.safe_dump(other_cfg), encoding="utf-8")
+
+    out_a, out_b = tmp_path / "a", tmp_path / "b"
+    _, summary_a = run_monte_carlo(config_path=str(small_config), out_dir=str(out_a), audit="ledger")
+    run_monte_carlo(config_path=str(other_config), out_dir=str(out_b), audit="ledger")
+
+    with RunCatalog(tmp_path / "catalog.sqlite") as cat:
+        run_a = cat.register_run(str(out_a))
+        run_b = cat.register_run(str(out_b))
+        assert cat.register_run(str(out_a)) == run_a  # idempotent
+        cat.register_stats(str(out_a), compute_stats_v2(out_dir=str(out_a), by="segment"))
+
+        runs = cat.list_runs()
+        assert {r["run_id"] for r in runs} == {run_a, run_b}
+        assert runs[0]["p95_total_cost"] > 0
+
+        config_a = json.loads((out_a / "run.json").read_text(encoding="utf-8"))["config_hash"]
+        assert [r["run_id"] for r in cat.list_runs(config_hash=config_a)] == [run_a]
+        hit = cat.list_runs(
+            metric="mean_total_cost",
+            min_value=summary_a["mean_total_cost"] - 1e-6,
+            max_value=summary_a["mean_total_cost"] + 1e-6,
+        )
+        assert [r["run_id"] for r in hit] == [run_a]
+        assert cat.list_runs(since="2999-01-01") == []
+        with pytest.raises(ValueError, match="Invalid metric"):
+            cat.list_runs(metric="p97")
+
+        res = cat.compare([run_a[:6], run_b])
+        assert [r["run_id"] for r in res["runs"]] == [run_a, run_b]
+        assert res["runs"][0]["delta"]["mean_total_cost"] == 0.0
+        assert res["runs"][0]["sketch_p50"] > 0
+        assert res["groups_p95"]
+        assert all(v[run_b] is None for v in res["groups_p95"].values())
+        with pytest.raises(ValueError, match="Unknown run"):
+            cat.compare(["zzz"])
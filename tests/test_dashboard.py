@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from pie.application.dashboard import build_dashboard
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import compute_stats_v2, write_stats_artifacts_v2
+from pie.application.svgcharts import bar_chart_svg, histogram_svg
+
+
+@pytest.fixture
+def stats_out(small_config: Path, tmp_path: Path) -> Path:
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger")
+    write_stats_artifacts_v2(str(out), compute_stats_v2(out_dir=str(out), by="segment,dtype"))
+    return out
+
+
+def test_svg_dashboard_builds_without_matplotlib(stats_out: Path):
+    t0 = time.perf_counter()
+    paths = build_dashboard(str(stats_out), top=10)
+    elapsed = time.perf_counter() - t0
+
+    html = paths.index_html.read_text(encoding="utf-8")
+    svgs = sorted(p.name for p in paths.assets_dir.glob("*.svg"))
+    assert len(svgs) == 5
+    assert all(f"assets/{name}" in html for name in svgs)
+    assert all(p.read_text(encoding="utf-8").startswith("<svg") for p in paths.assets_dir.glob("*.svg"))
+    assert "No chart" not in html
+    assert "matplotlib" not in sys.modules
+    assert elapsed < 1.0
+
+
+def test_dashboard_rebuilds_only_changed_fragments(stats_out: Path):
+    first = build_dashboard(str(stats_out), top=10)
+    assert "index" in first.rebuilt
+    assets_before = {p.name for p in first.assets_dir.iterdir()}
+
+    # Touched but unchanged inputs: nothing is rendered or rewritten.
+    os.utime(stats_out / "stats_groups.csv")
+    assert build_dashboard(str(stats_out), top=10).rebuilt == ()
+
+    top_csv = stats_out / "stats_top_passengers.csv"
+    rows = top_csv.read_text(encoding="utf-8").splitlines()
+    top_csv.write_text("\n".join([rows[0], *rows[2:]]) + "\n", encoding="utf-8")
+    again = build_dashboard(str(stats_out), top=10)
+    assert set(again.rebuilt) == {"top_passengers", "top_table", "index"}
+
+    assets_after = {p.name for p in again.assets_dir.iterdir()}
+    assert len(list((stats_out / "dashboard" / "data").glob("top_table.*.json"))) == 1
+    (old_top,) = {n for n in assets_before if n.startswith("top_passengers.")}
+    (new_top,) = {n for n in assets_after if n.startswith("top_passengers.")}
+    assert old_top != new_top  # content-hashed name, old file pruned
+    assert assets_before - {old_top} == assets_after - {new_top}
+    manifest = json.loads((again.index_html.parent / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["fragments"]["top_passengers"]["file"] == f"assets/{new_top}"
+
+
+def test_tables_are_lazy_json_files(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger")
+    res = compute_stats_v2(out_dir=str(out), by="passenger_id", top=1000)
+    write_stats_artifacts_v2(str(out), res)
+
+    paths = build_dashboard(str(out), top=1000, page_size=10)
+    html = paths.index_html.read_text(encoding="utf-8")
+    assert "<table" not in html
+    assert len(html) < 20_000
+    assert html.count("class='pie-table'") == 2 and "data-page-size='10'" in html
+    (script,) = paths.assets_dir.glob("table.*.js")
+    assert f"assets/{script.name}" in html
+
+    dash = paths.index_html.parent
+    (groups_json,) = dash.glob("data/groups_table.*.json")
+    data = json.loads(groups_json.read_text(encoding="utf-8"))
+    assert data["columns"][0] == "group"
+    assert len(data["rows"]) == len(res["groups"]) == 30
+    assert all(isinstance(v, float) for v in data["rows"][0][1:])
+    assert f"data-src='data/{groups_json.name}'" in html
+
+
+def test_svg_charts_escape_labels_and_handle_empty_input():
+    svg = bar_chart_svg(["a<b", "c&d"], [1.0, 250_000.0], "T & T", "x", "y")
+    assert "a&lt;b" in svg and "c&amp;d" in svg and "T &amp; T" in svg
+    assert ">250k<" in svg  # nice 0..250k axis
+    assert histogram_svg([], "empty").startswith("<svg")
+    assert histogram_svg([5.0, 5.0], "flat").count("<rect") == 30
+
+
+def test_dashboard_rejects_unknown_backend(stats_out: Path):
+    with pytest.raises(ValueError, match="Invalid charts backend"):
+        build_dashboard(str(stats_out), charts="png")
@@ -0,0 +1,136 @@
+import csv
+import gzip
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pie.application import passenger_index
+from pie.application.binstats import compute_stats_binary
+from pie.application.passenger_index import (
+    PassengerIndex,
+    build_passenger_index,
+    lookup_passenger,
+)
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import compute_stats_v2
+from pie.application.verify import verify_run
+from pie.infrastructure.io.binledger import BinaryLedger
+from pie.infrastructure.io.ledger import (
+    LedgerWriter,
+    read_block_lines,
+    read_ledger_index,
+)
+
+
+def test_block_mode_writes_independent_gzip_members(tmp_path: Path):
+    path = tmp_path / "chunk.csv.gz"
+    with LedgerWriter(path, ["a", "b"], block_rows=3) as w:
+        for i in range(7):
+            w.write_row({"a": i, "b": i * 2})
+
+    assert [rows for _, _, rows in w.blocks] == [3, 3, 1]
+    offset, length, _ = w.blocks[1]
+    assert read_block_lines(path, offset, length) == ["3,6", "4,8", "5,10"]
+
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["a"] for r in rows] == [str(i) for i in range(7)]
+
+
+def test_passenger_lookup_matches_full_scan(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="ledger",
+        ledger_mode="topk",
+        ledger_topk=5,
+        ledger_chunk_size=10,
+        ledger_block_rows=16,
+    )
+    build_passenger_index(str(out))
+
+    expected: dict[str, list[dict[str, str]]] = {}
+    for chunk in sorted((out / "ledger").glob("*.csv.gz")):
+        with gzip.open(chunk, "rt", encoding="utf-8", newline="") as f:
+            for r in csv.DictReader(f):
+                expected.setdefault(r["passenger_id"], []).append(r)
+
+    for pid, rows in expected.items():
+        assert lookup_passenger(str(out), pid) == rows
+    assert lookup_passenger(str(out), "P99999") == []
+
+
+def test_passenger_lookup_reads_few_blocks_in_all_mode(small_config: Path, tmp_path: Path, monkeypatch):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="ledger",
+        ledger_mode="all",
+        ledger_chunk_size=10,
+        ledger_block_rows=16,
+    )
+    first = build_passenger_index(str(out))
+    build_passenger_index(str(out), block_rows=16)  # rebuild replaces the clustered copy
+    assert first.exists() and len(list(out.glob("passenger_ledger.*.csv.gz"))) == 1
+    ledger_blocks = sum(len(ch["blocks"]) for ch in read_ledger_index(out)["ledger"]["chunks"])
+
+    reads: list[int] = []
+    real_read = passenger_index.read_block_lines
+    monkeypatch.setattr(
+        passenger_index, "read_block_lines", lambda path, off, n: reads.append(off) or real_read(path, off, n)
+    )
+    rows = lookup_passenger(str(out), "P00007")
+    # 40 clustered rows in 16-row blocks: at most 4 blocks, not every chunk block
+    assert len(rows) == 40 and [r["iteration"] for r in rows] == [str(i) for i in range(40)]
+    assert len(reads) <= 4 < ledger_blocks
+    with PassengerIndex(str(out)) as pi:
+        assert sum(b["rows"] for b in pi.blocks("P00007")) == 40
+
+
+def test_binary_ledger_matches_csv_chunks(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="ledger",
+        ledger_chunk_size=10,
+        ledger_binary=True,
+    )
+    bl = BinaryLedger(out)
+    assert len(bl.records) == 40 * 30
+    it7 = bl.iteration(7)
+    assert np.shares_memory(it7, bl.records)
+
+    csv_rows = []
+    for path in sorted((out / "ledger").glob("*.csv.gz")):
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            csv_rows += list(csv.DictReader(f))
+    assert bl.to_rows(it7) == [r for r in csv_rows if r["iteration"] == "7"]
+    assert lookup_passenger(str(out), "P00003") == [r for r in csv_rows if r["passenger_id"] == "P00003"]
+
+    res = verify_run(str(out), workers=1)
+    assert res["binary_checked"] is True
+
+    a = compute_stats_v2(str(out), by="segment,dtype", metric="p95", top=5, cache=False)
+    b = compute_stats_binary(str(out), by="segment,dtype", metric="p95", top=5)
+    assert b["groups"].keys() == a["groups"].keys()
+    for k, g in a["groups"].items():
+        assert b["groups"][k] == pytest.approx(g)
+    assert [p["passenger_id"] for p in b["top_passengers"]] == [p["passenger_id"] for p in a["top_passengers"]]
+
+
+def test_run_without_binary_drops_an_earlier_binary_copy(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(str(small_config), str(out), audit="ledger", ledger_chunk_size=10, ledger_binary=True)
+    assert (out / "ledger.bin").exists()
+    run_monte_carlo(str(small_config), str(out), audit="ledger", ledger_mode="topk", ledger_chunk_size=10)
+
+    assert not (out / "ledger.bin").exists() and not (out / "ledger_bin.json").exists()
+    res = verify_run(str(out), workers=1)
+    assert res["ok"] and res["binary_checked"] is False
+    build_passenger_index(str(out))
+    assert len(lookup_passenger(str(out), "P00003")) == 40
+
@@ -0,0 +1,72 @@
+import json
+import os
+from pathlib import Path
+
+from pie.application import pipeline as pipeline_mod
+from pie.application import stats as stats_mod
+from pie.application.pipeline import (
+    PIPELINE_MANIFEST_NAME,
+    PipelineOptions,
+    run_pipeline,
+)
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import StatsQuery, compute_stats_v2
+
+
+def test_pipeline_feeds_stats_in_memory_and_swaps_out_dir(small_config: Path, tmp_path: Path, monkeypatch):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "stale.txt").write_text("old run", encoding="utf-8")
+    opts = PipelineOptions(
+        ledger_mode="all",
+        ledger_chunk_size=10,
+        query=StatsQuery(by="segment,dtype", metric="p95", min_cost=50.0),
+    )
+
+    scanned: list[str] = []
+    real_scan = stats_mod._scan_partials
+    monkeypatch.setattr(stats_mod, "_scan_partials", lambda path, *a: scanned.append(str(path)) or real_scan(path, *a))
+    res = run_pipeline(str(small_config), str(out), opts)
+    assert scanned == []  # stats came from the rows seen while simulating
+
+    manifest = json.loads((out / PIPELINE_MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert [s["stage"] for s in manifest["stages"]] == ["simulate", "merge", "stats", "dashboard"]
+    assert manifest["stats_from_feed"] and not manifest["cache_hit"]
+    assert all(s["wall_s"] >= 0 and s["bytes"] > 0 for s in manifest["stages"])
+    assert manifest["stages"][0]["rows"] == res["stats"]["total_rows"] > 0
+
+    assert not (out / "stale.txt").exists()
+    assert (out / "dashboard" / "index.html").exists()
+    assert (out / "entitlements.csv.gz").exists()
+    live = out.parent / os.readlink(out)
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([live.name, "out", "small.yml"])
+    idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+    assert idx["ledger"]["dir"] == str(out / "ledger")
+
+    # Same numbers as the separate simulate + stats commands.
+    ref = tmp_path / "ref"
+    run_monte_carlo(str(small_config), str(ref), audit="ledger", ledger_mode="all", ledger_chunk_size=10)
+    expected = compute_stats_v2(str(ref), by="segment,dtype", metric="p95", min_cost=50.0, cache=False)
+    saved = json.loads((out / "stats.json").read_text(encoding="utf-8"))
+    assert saved["groups"] == expected["groups"]
+    assert saved["top_passengers"] == expected["top_passengers"]
+    assert saved["source"] == str(out / "ledger")
+
+
+def test_pipeline_rerun_switches_the_out_symlink_without_a_gap(small_config: Path, tmp_path: Path, monkeypatch):
+    out = tmp_path / "out"
+    run_pipeline(str(small_config), str(out))
+    first = out.parent / os.readlink(out)
+
+    seen: list[bool] = []
+    real_replace = os.replace
+
+    def replace(src, dst):
+        seen.append((out / "dashboard" / "index.html").exists())
+        real_replace(src, dst)
+
+    monkeypatch.setattr(pipeline_mod.os, "replace", replace)
+    run_pipeline(str(small_config), str(out))
+    assert seen and all(seen)  # the previous run stays served up to the switch
+    assert out.is_symlink() and not first.exists()
+    assert (out / "dashboard" / "index.html").exists()
@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pie.application.plan import PlanLimits, plan_run
+from pie.application.simulate import run_monte_carlo
+from pie.cli.main import app
+
+
+@pytest.mark.parametrize(
+    "mode,opts",
+    [
+        ("all", {}),
+        ("topk", {"ledger_topk": 50}),  # K > passengers: every passenger, like verify expects
+        ("global_topk", {"ledger_topk": 7}),
+        ("passenger_sample", {"ledger_sample": 0.3}),
+    ],
+)
+def test_plan_rows_match_the_run(small_config: Path, tmp_path: Path, mode: str, opts: dict):
+    res = plan_run(str(small_config), audit="ledger", ledger_mode=mode, ledger_chunk_size=10, **opts)
+    run_monte_carlo(str(small_config), str(tmp_path / "out"), audit="ledger", ledger_mode=mode, ledger_chunk_size=10, **opts)
+    idx = json.loads((tmp_path / "out" / "ledger_index.json").read_text(encoding="utf-8"))
+
+    assert res["ok"] and res["ledger"]["rows_exact"]
+    assert res["ledger"]["rows"] == idx["ledger"]["total_rows_written"]
+    assert res["ledger"]["chunks"] == len(idx["ledger"]["chunks"])
+    # the small config fits in the calibration budget, so bytes are the run's own
+    ledger_bytes = sum(ch["bytes"] for ch in idx["ledger"]["chunks"])
+    assert res["ledger"]["bytes"] == pytest.approx(ledger_bytes, rel=0.05)
+    assert res["runtime_s"] > 0
+
+
+def test_plan_extrapolates_data_dependent_modes_and_flags_limits(small_config: Path):
+    res = plan_run(str(small_config), audit="ledger", ledger_mode="eligible", budget=300)
+    assert res["calibration"]["iterations"] == 10 and not res["ledger"]["rows_exact"]
+    assert 0 <= res["ledger"]["rows"] <= 40 * 30
+    assert any("extrapolated" in w for w in res["warnings"])
+
+    res = plan_run(str(small_config), audit="summary", limits=PlanLimits(max_bytes=1, max_seconds=1e6))
+    assert res["ledger"]["rows"] == 0 and res["ledger"]["chunks"] == 0
+    assert not res["ok"] and len(res["violations"]) == 1 and "bytes" in res["violations"][0]
+
+
+def test_simulate_refuses_before_any_work(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    runner = CliRunner()
+    args = ["simulate", "--config", str(small_config), "--out", str(out), "--no-register"]
+
+    res = runner.invoke(app, [*args, "--plan"])
+    assert res.exit_code == 0 and json.loads(res.stdout)["ledger"]["rows"] == 40 * 30
+    assert not out.exists()
+
+    res = runner.invoke(app, [*args, "--max-rows", "100"])
+    assert res.exit_code == 1 and "Refusing to run" in res.output
+    assert not out.exists()
@@ -0,0 +1,79 @@
+import gzip
+import http.client
+import threading
+from pathlib import Path
+
+import pytest
+
+from pie.application.serve import make_server
+
+
+@pytest.fixture
+def served(tmp_path: Path):
+    dash = tmp_path / "dashboard"
+    (dash / "assets").mkdir(parents=True)
+    (dash / "index.html").write_text("<html>" + "x" * 2000 + "</html>", encoding="utf-8")
+    (dash / "assets" / "chart.0123456789ab.svg").write_text("<svg>" + "y" * 1000 + "</svg>", encoding="utf-8")
+    server, site = make_server(dash, host="127.0.0.1", port=0)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield dash, site, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _get(port: int, path: str, headers: dict[str, str] | None = None):
+    con = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    con.request("GET", path, headers=headers or {})
+    resp = con.getresponse()
+    body = resp.read()
+    con.close()
+    return resp, body
+
+
+def test_serves_from_memory_with_etag_gzip_and_range(served):
+    dash, _, port = served
+    resp, body = _get(port, "/")
+    assert resp.status == 200 and body.startswith(b"<html>")
+    assert resp.getheader("Cache-Control") == "no-cache"
+    etag = resp.getheader("ETag")
+
+    resp, body = _get(port, "/index.html", {"If-None-Match": etag})
+    assert resp.status == 304 and body == b""
+
+    resp, body = _get(port, "/index.html", {"Accept-Encoding": "gzip, deflate"})
+    assert resp.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == (dash / "index.html").read_bytes()
+    gz_etag = resp.getheader("ETag")
+    assert gz_etag == etag[:-1] + '-gz"' and resp.getheader("Accept-Ranges") is None
+    assert _get(port, "/index.html", {"Accept-Encoding": "gzip", "If-None-Match": gz_etag})[0].status == 304
+    assert _get(port, "/index.html", {"If-None-Match": gz_etag})[0].status == 200
+
+    resp, body = _get(port, "/index.html", {"Range": "bytes=0-5", "Accept-Encoding": "gzip"})
+    assert resp.status == 206 and body == b"<html>"
+    assert resp.getheader("ETag") == etag and resp.getheader("Content-Encoding") is None
+    assert resp.getheader("Content-Range") == "bytes 0-5/2013"
+    resp, _ = _get(port, "/index.html", {"Range": "bytes=0-5", "If-Range": gz_etag})
+    assert resp.status == 200  # a gzip validator never selects identity bytes
+    resp, body = _get(port, "/index.html", {"Range": "bytes=-7"})
+    assert body == b"</html>"
+    resp, _ = _get(port, "/index.html", {"Range": "bytes=9999-"})
+    assert resp.status == 416
+
+    resp, _ = _get(port, "/assets/chart.0123456789ab.svg")
+    assert resp.getheader("Content-Type") == "image/svg+xml"
+    assert "immutable" in resp.getheader("Cache-Control")
+
+    for path in ("/missing.html", "/../dashboard/index.html", "/%2e%2e/etc/passwd"):
+        assert _get(port, path)[0].status == 404
+
+
+def test_reload_swaps_in_a_new_build_atomically(served):
+    dash, site, port = served
+    (dash / "index.html").unlink()
+    assert site.reload() is False  # mid-publish: keep serving the old snapshot
+    assert _get(port, "/")[1].startswith(b"<html>x")
+
+    (dash / "index.html").write_text("<html>v2</html>", encoding="utf-8")
+    assert site.reload() is True
+    assert _get(port, "/")[1] == b"<html>v2</html>"
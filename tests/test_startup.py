@@ -0,0 +1,45 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from pie.application.simulate import run_monte_carlo
+from pie.cli.startup import LIGHT_BUDGET_MS, profile_command
+
+
+@pytest.fixture
+def run_dir(small_config: Path, tmp_path: Path) -> Path:
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger", ledger_mode="topk")
+    return out
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["version"],
+        ["verify", "--out", "{out}", "--workers", "1"],
+        ["merge-ledger", "--out", "{out}"],
+        ["index", "--out", "{out}"],
+        ["runs", "list", "--catalog", "{tmp}/catalog.sqlite"],
+    ],
+    ids=lambda a: a[0] if a[0] != "runs" else "runs-list",
+)
+def test_light_commands_stay_within_startup_budget(args: list[str], run_dir: Path, tmp_path: Path):
+    prof = profile_command([a.format(out=run_dir, tmp=tmp_path) for a in args])
+    assert prof["returncode"] == 0, prof["stderr"]
+    assert prof["heavy"] == [], f"light command imported {prof['heavy']}"
+    assert prof["import_ms"] < LIGHT_BUDGET_MS, prof["top_level"][:10]
+
+
+def test_startup_profile_flag_reports_imports():
+    proc = subprocess.run(
+        [sys.executable, "-m", "pie.cli.main", "--startup-profile", "version"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert proc.stdout.startswith("Passenger Impact Engine")
+    assert "startup profile: pie version" in proc.stderr
+    assert "heavy modules: none" in proc.stderr
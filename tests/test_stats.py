@@ -0,0 +1,242 @@
+import csv
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pie.application import merge_ledger as merge_mod
+from pie.application import stats as stats_mod
+from pie.application.approx import compute_stats_approx
+from pie.application.merge_ledger import merge_ledger
+from pie.application.query import parse_where
+from pie.application.simulate import run_monte_carlo
+from pie.application.stats import compute_stats_v2
+from pie.application.verify import verify_run
+from pie.cli.main import app
+from pie.infrastructure.io.ledger import passenger_in_sample
+
+
+@pytest.fixture
+def ledger_run(small_config: Path, tmp_path: Path) -> str:
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger", ledger_chunk_size=10)
+    return str(out)
+
+
+def test_stats_cache_hits_on_rerun(ledger_run: str):
+    first = compute_stats_v2(ledger_run, by="segment,dtype")
+    assert first["cache"] == {"enabled": True, "hits": 0, "misses": 4}
+
+    second = compute_stats_v2(ledger_run, by="segment,dtype")
+    assert second["cache"]["hits"] == 4
+    assert second["groups"] == first["groups"]
+    assert second["top_passengers"] == first["top_passengers"]
+
+
+def test_stats_cache_trusts_index_digests_and_caps_passenger_samples(small_config: Path, tmp_path: Path, monkeypatch):
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger", ledger_chunk_size=40)
+    monkeypatch.setattr(stats_mod, "file_sha256", lambda path: pytest.fail(f"re-hashed {path}"))
+    first = compute_stats_v2(str(out), by="segment")
+    assert compute_stats_v2(str(out), by="segment")["cache"]["hits"] == 1
+
+    (sidecar,) = (out / "stats_cache").glob("*.json.gz")
+    with gzip.open(sidecar, "rt", encoding="utf-8") as f:
+        pax = json.load(f)["pax"]
+    assert len(pax) == 30
+    assert all(p["rows"] == 40 and len(p["res"]["data"]) == stats_mod.PASSENGER_CHUNK_SAMPLE_SIZE for p in pax.values())
+    assert first["top_passengers"][0]["rows"] == 40
+
+
+def test_coarse_grouping_rolls_up_from_cached_partials(ledger_run: str):
+    fine = compute_stats_v2(ledger_run, by="segment,dtype")
+    coarse = compute_stats_v2(ledger_run, by="segment")
+    assert coarse["cache"]["misses"] == 0
+
+    for seg in ("business", "leisure"):
+        parts = [g for k, g in fine["groups"].items() if k.startswith(f"segment={seg}|")]
+        g = coarse["groups"][f"segment={seg}"]
+        assert g["rows"] == sum(p["rows"] for p in parts)
+        assert g["sum_total_cost_eur"] == pytest.approx(sum(p["sum_total_cost_eur"] for p in parts))
+        assert g["max_total_cost_eur"] == max(p["max_total_cost_eur"] for p in parts)
+
+
+def test_stats_without_cache_matches(ledger_run: str):
+    cached = compute_stats_v2(ledger_run, by="dtype", min_cost=200)
+    plain = compute_stats_v2(ledger_run, by="dtype", min_cost=200, cache=False)
+    assert plain["cache"]["enabled"] is False
+    assert plain["kept_rows"] == cached["kept_rows"]
+    assert plain["groups"] == cached["groups"]
+
+
+def test_zone_maps_prune_chunks_outside_filter(ledger_run: str):
+    res = compute_stats_v2(ledger_run, by="none", where=["iteration<10"])
+    assert res["pruned_chunks"] == 3
+    assert res["total_rows"] == 40 * 30
+    assert res["kept_rows"] == 10 * 30
+
+
+def test_group_by_delay_buckets(ledger_run: str):
+    res = compute_stats_v2(ledger_run, by="dtype,delay_minutes", delay_bucket=120)
+    assert "dtype=cancel|delay_minutes=0-119" in res["groups"]
+    assert sum(g["rows"] for g in res["groups"].values()) == res["kept_rows"]
+
+
+def test_parse_where():
+    f_ge, f_range, f_lt = parse_where(["total_cost_eur>=200", "cash_comp_eur=0..400", "iteration<5"])
+    assert f_ge.matches(200) and not f_ge.matches(199.99)
+    assert f_range.matches(400) and not f_range.may_match(401, 900)
+    assert not f_lt.matches(5) and not f_lt.may_match(5, 9)
+    with pytest.raises(ValueError):
+        parse_where(["passenger_id>3"])
+
+
+def test_approx_exhausting_all_blocks_is_exact(ledger_run: str):
+    exact = compute_stats_v2(ledger_run, by="segment")
+    approx = compute_stats_approx(ledger_run, by="segment", precision=1e-9, time_budget=0)
+    assert approx["approx"]["stopped"] == "exhausted"
+    for k, g in exact["groups"].items():
+        a = approx["groups"][k]
+        assert a["rows"] == pytest.approx(g["rows"])
+        assert a["sum_total_cost_eur"] == pytest.approx(g["sum_total_cost_eur"])
+        assert a["mean_ci_low_eur"] == pytest.approx(a["mean_ci_high_eur"])
+
+
+def test_approx_stops_at_precision(ledger_run: str):
+    res = compute_stats_approx(ledger_run, by="none", precision=0.5, batch_blocks=1, min_blocks=2)
+    a = res["approx"]
+    assert a["stopped"] == "precision"
+    assert a["blocks_sampled"] < a["blocks_total"]
+    g = res["groups"]["all"]
+    assert g["mean_ci_low_eur"] <= g["mean_total_cost_eur"] <= g["mean_ci_high_eur"]
+
+
+def test_multi_query_single_pass_matches_individual_runs(ledger_run: str, monkeypatch):
+    queries = [
+        {"name": "seg_p95", "by": "segment,dtype", "metric": "p95", "min_cost": 200},
+        {"name": "dtype", "by": "dtype"},
+        {"name": "pax", "by": "passenger_id", "top": 3, "where": ["iteration>=20"]},
+    ]
+
+    opened: list[str] = []
+    real_iter = stats_mod._iter_rows_gz
+
+    def counting_iter(path):
+        opened.append(path.name)
+        return real_iter(path)
+
+    monkeypatch.setattr(stats_mod, "_iter_rows_gz", counting_iter)
+    multi = compute_stats_v2(ledger_run, queries=queries, cache=False)["queries"]
+    assert sorted(opened) == sorted(set(opened))
+    assert len(opened) == 4
+
+    for q in queries:
+        q = dict(q)
+        single = compute_stats_v2(ledger_run, cache=False, **{k: v for k, v in q.items() if k != "name"})
+        got = multi[q["name"]]
+        assert got["kept_rows"] == single["kept_rows"]
+        assert got["groups"] == single["groups"]
+        assert got["top_passengers"] == single["top_passengers"]
+
+
+def test_passenger_sample_keeps_every_row_of_a_fixed_subset(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="ledger",
+        ledger_mode="passenger_sample",
+        ledger_sample=0.3,
+        ledger_chunk_size=10,
+    )
+    idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+    picked = {f"P{i:05d}" for i in range(30) if passenger_in_sample(f"P{i:05d}", 0.3)}
+    assert 0 < len(picked) < 30
+    assert idx["ledger"]["sampled_passengers"] == len(picked)
+    assert verify_run(str(out), workers=1)["replayed"] is True
+
+    stats = compute_stats_v2(str(out), top=100, by="none", metric="mean", fmt="json", cache=False)
+    assert {p["passenger_id"] for p in stats["top_passengers"]} == picked
+    assert all(p["rows"] == 40 for p in stats["top_passengers"])
+
+
+def test_weighted_ledger_stats_are_reweighted(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="both",
+        ledger_mode="weighted",
+        ledger_sample=0.3,
+        ledger_chunk_size=10,
+    )
+    idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+    assert idx["ledger"]["fields"][-1] == "sample_weight"
+    assert idx["ledger"]["total_rows_written"] < 40 * 30
+    assert verify_run(str(out), workers=1)["replayed"] is True
+
+    # The run's own per-iteration totals are the exact population answer.
+    lines = (out / "cost_distribution.csv").read_text(encoding="utf-8").splitlines()
+    true_sum = sum(float(r["total_cost_eur"]) for r in csv.DictReader(lines))
+    g = compute_stats_v2(str(out), by="none", cache=False)["groups"]["all"]
+    assert g["rows"] == pytest.approx(40 * 30, rel=0.15)
+    assert g["sum_total_cost_eur"] == pytest.approx(true_sum, rel=0.15)
+    assert g["mean_total_cost_eur"] == pytest.approx(true_sum / (40 * 30), rel=0.15)
+
+
+def test_exact_passengers_from_externally_sorted_ledger(ledger_run: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(merge_mod, "_MAX_FAN_IN", 4)
+    sorted_path = merge_ledger(ledger_run, sort_by="passenger", run_rows=100)
+
+    with gzip.open(sorted_path, "rt", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 40 * 30
+    keys = [(r["passenger_id"], int(r["iteration"])) for r in rows]
+    assert keys == sorted(keys)
+    assert not list(Path(ledger_run).glob(".sort_*"))
+
+    by_pid: dict[str, list[float]] = {}
+    for r in rows:
+        by_pid.setdefault(r["passenger_id"], []).append(float(r["total_cost_eur"]))
+    expected = sorted((stats_mod._q_from_sorted(sorted(v), 0.95) for v in by_pid.values()), reverse=True)[:5]
+
+    res = compute_stats_v2(ledger_run, top=5, metric="p95", cache=False, exact_passengers=True)
+    assert res["exact_passengers"] is True
+    assert [p["score"] for p in res["top_passengers"]] == pytest.approx(expected)
+    assert all(p["rows"] == 40 for p in res["top_passengers"])
+
+
+def test_stats_feed_partials_match_a_scan_of_the_written_chunks(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    feed = stats_mod.StatsFeed([stats_mod.StatsQuery(by="segment,dtype")], sample_size=5)
+    run_monte_carlo(
+        str(small_config),
+        str(out),
+        audit="ledger",
+        ledger_chunk_size=10,
+        on_ledger_row=feed.row,
+        on_ledger_chunk=feed.chunk,
+    )
+    assert feed.rows == 40 * 30
+
+    idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+    (spec,) = feed.specs
+    for ch in idx["ledger"]["chunks"]:
+        (scanned,) = stats_mod._scan_partials(out / "ledger" / ch["file"], ch["sha256"], [spec])
+        assert feed.partials[(ch["sha256"], spec.key)].state() == scanned.state()
+
+
+@pytest.mark.parametrize(
+    ("flags", "message"),
+    [
+        (["--queries", "q.yml", "--approx"], "--queries and --approx cannot be combined"),
+        (["--queries", "q.yml", "--binary"], "--queries and --binary cannot be combined"),
+        (["--approx", "--binary"], "--approx and --binary cannot be combined"),
+        (["--binary", "--exact-passengers"], "--exact-passengers does not apply to --binary"),
+    ],
+)
+def test_stats_cli_rejects_conflicting_engines(tmp_path: Path, flags: list[str], message: str):
+    res = CliRunner().invoke(app, ["stats", "--out", str(tmp_path), "--no-register", *flags])
+    assert res.exit_code == 2 and message in " ".join(res.output.split())
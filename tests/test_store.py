@@ -0,0 +1,149 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from pie.application.dashboard import build_dashboard
+from pie.application.merge_ledger import merge_ledger
+from pie.application.simulate import run_artifacts, run_monte_carlo
+from pie.application.stats import compute_stats_v2, write_stats_artifacts_v2
+from pie.infrastructure.io.store import MIN_PART_SIZE, LocalStore, S3Store
+
+
+class _ClientError(Exception):
+    def __init__(self, code: str) -> None:
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3:
+    """
+    The subset of the boto3 S3 client that S3Store uses, in memory. Records
+    the order in which keys become visible.
+    """
+
+    def __init__(self, page_size: int = 3) -> None:
+        self.objects: dict[str, bytes] = {}
+        self.order: list[str] = []
+        self.multipart: dict[str, list[bytes]] = {}
+        self.page_size = page_size
+        self.on_put = lambda key: None
+
+    def _store(self, key: str, data: bytes) -> None:
+        self.on_put(key)
+        self.objects[key] = data
+        self.order.append(key)
+
+    def put_object(self, Bucket, Key, Body):
+        self._store(Key, bytes(Body))
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"up-{len(self.multipart)}"
+        self.multipart[upload_id] = []
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        assert PartNumber == len(self.multipart[UploadId]) + 1
+        self.multipart[UploadId].append(bytes(Body))
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.multipart.pop(UploadId)
+        assert [p["PartNumber"] for p in MultipartUpload["Parts"]] == list(range(1, len(parts) + 1))
+        self._store(Key, b"".join(parts))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.multipart.pop(UploadId, None)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise _ClientError("NoSuchKey")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise _ClientError("404")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start : start + self.page_size]
+        resp = {"Contents": [{"Key": k} for k in page], "IsTruncated": start + self.page_size < len(keys)}
+        if resp["IsTruncated"]:
+            resp["NextContinuationToken"] = str(start + self.page_size)
+        return resp
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+def test_simulate_uploads_chunks_while_running_and_indexes_last(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    client = FakeS3()
+    store = S3Store("bucket", "runs/demo", client=client)
+    seen_before_index: list[str] = []
+    client.on_put = lambda key: None if (out / "ledger_index.json").exists() else seen_before_index.append(key)
+
+    run_monte_carlo(
+        str(small_config), str(out), audit="ledger", ledger_mode="all", ledger_chunk_size=1, store=store
+    )
+
+    # chunks went up while the simulation was still writing the ledger
+    assert any(k.startswith("runs/demo/ledger/") for k in seen_before_index)
+    files = run_artifacts(out)
+    assert sorted(client.objects) == sorted(f"runs/demo/{rel}" for rel in files)
+    for rel in files:
+        assert client.objects[f"runs/demo/{rel}"] == (out / rel).read_bytes()
+    # nothing that references another artifact is visible before it
+    uploaded = [k.removeprefix("runs/demo/") for k in client.order]
+    first_index = min(uploaded.index(n) for n in ("ledger_index.json", "run.json"))
+    assert all(uploaded.index(rel) < first_index for rel in files if rel.startswith("ledger/"))
+    assert store.list("ledger/") == sorted(f for f in files if f.startswith("ledger/"))
+    assert store.exists("run.json") and not store.exists("nope.json")
+    assert json.loads(store.get_bytes("run.json"))["run_id"]
+
+
+def test_large_files_use_multipart_upload(tmp_path: Path):
+    client = FakeS3()
+    store = S3Store("bucket", client=client, multipart_threshold=MIN_PART_SIZE, part_size=MIN_PART_SIZE)
+    data = bytes(range(256)) * (12 * 4096)  # 12 MiB -> 5 + 5 + 2 MiB parts
+    src = tmp_path / "big.bin"
+    src.write_bytes(data)
+
+    parts: list[int] = []
+    real = client.upload_part
+    client.upload_part = lambda **kw: parts.append(len(kw["Body"])) or real(**kw)
+    store.put_file("big.bin", src)
+    assert parts == [MIN_PART_SIZE, MIN_PART_SIZE, 2 << 20]
+    assert client.objects["big.bin"] == data and not client.multipart
+
+    with pytest.raises(ValueError):
+        S3Store("bucket", client=client, part_size=1 << 20)
+
+
+def test_dashboard_and_merged_ledger_publish_to_store(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(str(small_config), str(out), audit="ledger", ledger_mode="all", ledger_chunk_size=10)
+    write_stats_artifacts_v2(str(out), compute_stats_v2(out_dir=str(out), by="segment,dtype"))
+    site = LocalStore(tmp_path / "site")
+
+    merged = merge_ledger(str(out), store=site)
+    assert site.get_bytes(merged.name) == merged.read_bytes()
+
+    build_dashboard(str(out), store=site)
+    keys = site.list("dashboard/")
+    assert "dashboard/index.html" in keys
+    for key in keys:
+        assert site.get_bytes(key) == (out / key).read_bytes()
+
+    (tmp_path / "site" / "dashboard" / "stale.svg").write_text("<svg/>", encoding="utf-8")
+    writes: list[str] = []
+    real_put = site.put_file
+    site.put_file = lambda key, path: writes.append(key) or real_put(key, path)
+    build_dashboard(str(out), store=site)
+    # unchanged content-hashed assets are not re-sent; stale ones are removed
+    assert "dashboard/index.html" in writes
+    assert all(not key.endswith(".svg") for key in writes)
+    assert not site.exists("dashboard/stale.svg")
@@ -0,0 +1,211 @@
+import csv
+import gzip
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from pie.application.run_cache import RunCache, simulate_cached
+from pie.application.simulate import run_monte_carlo
+from pie.application.verify import verify_run
+from pie.infrastructure.io.ledger import detach_hardlinks, file_sha256, merkle_root
+
+
+@pytest.fixture
+def ledger_run(small_config: Path, tmp_path: Path) -> Path:
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger", ledger_chunk_size=10)
+    return out
+
+
+def test_fast_and_deep_verify_pass(ledger_run: Path):
+    fast = verify_run(str(ledger_run), workers=2)
+    assert fast["digests_checked"] == 4 and fast["chunks_reparsed"] == 0
+    idx = json.loads((ledger_run / "ledger_index.json").read_text(encoding="utf-8"))
+    assert fast["merkle_root"] == idx["ledger"]["merkle_root"]
+
+    deep = verify_run(str(ledger_run), mode="deep", workers=2)
+    assert deep["chunks_reparsed"] == 4
+    assert deep["total_rows"] == 40 * 30
+
+
+def test_fast_verify_detects_same_size_corruption(ledger_run: Path):
+    chunk = ledger_run / "ledger" / "entitlements_chunk_00002.csv.gz"
+    data = bytearray(chunk.read_bytes())
+    data[-12] ^= 0xFF
+    chunk.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match="Digest mismatch in entitlements_chunk_00002"):
+        verify_run(str(ledger_run), workers=1)
+
+
+def test_merkle_root_pairs_odd_leaf_with_itself():
+    a, b, c = (f"{i:064x}" for i in (1, 2, 3))
+    assert merkle_root([a, b, c]) == merkle_root([a, b, c, c])
+    assert merkle_root([a, b, c]) != merkle_root([a, c, b])
+
+
+@pytest.mark.parametrize("ledger_mode", ["eligible", "sample"])
+def test_replay_checks_data_dependent_modes(small_config: Path, tmp_path: Path, ledger_mode: str):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="ledger",
+        ledger_mode=ledger_mode,
+        ledger_sample=0.3,
+        ledger_chunk_size=10,
+    )
+    assert verify_run(str(out), workers=1)["replayed"] is True
+    assert verify_run(str(out), workers=1, replay=False)["replayed"] is False
+
+    # Shift one row between chunks: totals and block sums still agree, replay does not.
+    index_path = out / "ledger_index.json"
+    idx = json.loads(index_path.read_text(encoding="utf-8"))
+    a, b = idx["ledger"]["chunks"][:2]
+    a["rows_written"] += 1
+    a["blocks"][-1][2] += 1
+    b["rows_written"] -= 1
+    b["blocks"][-1][2] -= 1
+    index_path.write_text(json.dumps(idx), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="replay expects"):
+        verify_run(str(out), workers=1)
+
+
+def test_global_topk_writes_one_sorted_chunk(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(
+        config_path=str(small_config),
+        out_dir=str(out),
+        audit="ledger",
+        ledger_mode="global_topk",
+        ledger_topk=25,
+        ledger_chunk_size=10,
+    )
+    idx = json.loads((out / "ledger_index.json").read_text(encoding="utf-8"))
+    (chunk,) = idx["ledger"]["chunks"]
+    assert (chunk["start_iteration"], chunk["end_iteration"], chunk["rows_written"]) == (0, 39, 25)
+    assert verify_run(str(out), mode="deep", workers=1)["total_rows"] == 25
+
+    with gzip.open(out / "ledger" / chunk["file"], "rt", encoding="utf-8") as f:
+        costs = [float(r["total_cost_eur"]) for r in csv.DictReader(f)]
+    assert costs == sorted(costs, reverse=True)
+
+    # Same run with ledger_mode=all: the global top 25 must match.
+    full = tmp_path / "full"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(full), audit="ledger")
+    all_costs = []
+    for path in sorted((full / "ledger").glob("*.csv.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            all_costs += [float(r["total_cost_eur"]) for r in csv.DictReader(f)]
+    assert costs == sorted(all_costs, reverse=True)[:25]
+
+
+def test_audit_log_rotates_and_detects_tampering(small_config: Path, tmp_path: Path):
+    out = tmp_path / "out"
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="summary", audit_segment_bytes=2048)
+
+    index = json.loads((out / "events_index.json").read_text(encoding="utf-8"))
+    assert len(index["segments"]) > 1
+    assert index["events"] == 40 + 2  # run_start + iterations + run_end
+    res = verify_run(str(out), workers=2)["audit_log"]
+    assert res == {"segments": len(index["segments"]), "events": 42, "head": index["head"]}
+
+    with gzip.open(out / "events" / "events_00001.jsonl.gz", "rt", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0]["type"] == "segment_start"
+    assert lines[0]["prev_chain"] == index["segments"][0]["chain"]
+    assert all("run_id" not in e for e in lines[1:])
+
+    # Rewrite one segment with edited content and fix up its file digest: the chain still catches it.
+    seg = index["segments"][1]
+    lines[1]["data"]["total_cost_eur"] = 0.0
+    path = out / "events" / seg["file"]
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.writelines(json.dumps(e, separators=(",", ":")) + "\n" for e in lines)
+    seg["bytes"] = path.stat().st_size
+    seg["sha256"] = file_sha256(path)
+    (out / "events_index.json").write_text(json.dumps(index), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="Content hash mismatch in audit segment events_00001"):
+        verify_run(str(out), workers=1)
+
+
+def test_run_cache_restores_verified_runs(small_config: Path, tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    out = tmp_path / "out"
+    df1, summary1, hit1 = simulate_cached(str(small_config), str(out), str(cache_dir), audit="ledger")
+    assert hit1 is False
+    (out / "run.json").unlink()
+
+    df2, summary2, hit2 = simulate_cached(str(small_config), str(out), str(cache_dir), audit="ledger")
+    assert hit2 is True
+    assert summary2 == pytest.approx(summary1)
+    assert df2["total_cost_eur"].tolist() == df1["total_cost_eur"].tolist()
+    assert (out / "ledger" / "entitlements_chunk_00000.csv.gz").stat().st_nlink == 2
+    assert verify_run(str(out), workers=1)["ok"] is True
+
+    # A fresh run into the same out dir must not write through the hardlinks.
+    cached_chunk = next((cache_dir).glob("*/ledger/entitlements_chunk_00000.csv.gz"))
+    before = cached_chunk.read_bytes()
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger", ledger_mode="topk")
+    assert cached_chunk.read_bytes() == before
+
+    # Size-bounded eviction keeps only the most recently used entry.
+    other = tmp_path / "other"
+    simulate_cached(str(small_config), str(other), str(cache_dir), audit="summary")
+    RunCache(cache_dir, max_bytes=1).evict(keep=json.loads((other / "run.json").read_text())["run_id"])
+    assert len([d for d in cache_dir.iterdir() if not d.name.startswith(".")]) == 1
+
+
+def test_run_cache_restored_copies_stay_writable(small_config: Path, tmp_path: Path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    out = tmp_path / "out"
+    simulate_cached(str(small_config), str(out), str(cache_dir), audit="ledger")
+    (out / "run.json").unlink()
+
+    def no_link(src, dst):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, "link", no_link)
+    assert simulate_cached(str(small_config), str(out), str(cache_dir), audit="ledger")[2] is True
+    chunk = out / "ledger" / "entitlements_chunk_00000.csv.gz"
+    assert chunk.stat().st_nlink == 1 and chunk.stat().st_mode & stat.S_IWUSR
+
+    # a read-only file left behind (e.g. the hardlink of an evicted entry) is replaced, not rewritten
+    chunk.chmod(0o444)
+    detach_hardlinks(out, (), dirs=("ledger",))
+    assert not chunk.exists()
+
+
+def test_simulate_leaves_unrelated_files_in_the_out_dir_alone(small_config: Path, tmp_path: Path):
+    out = tmp_path / "shared"
+    notes = out / "notes"
+    notes.mkdir(parents=True)
+    readonly = notes / "readonly.txt"
+    readonly.write_text("keep", encoding="utf-8")
+    readonly.chmod(0o444)
+    elsewhere = tmp_path / "elsewhere.txt"
+    elsewhere.write_text("keep", encoding="utf-8")
+    linked = notes / "linked.txt"
+    os.link(elsewhere, linked)
+
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="summary")
+    assert readonly.read_text(encoding="utf-8") == "keep"
+    assert linked.stat().st_nlink == 2
+
+
+
+def test_run_cache_restore_drops_a_stale_binary_copy(small_config: Path, tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    out = tmp_path / "out"
+    simulate_cached(str(small_config), str(out), str(cache_dir), audit="ledger")
+    run_monte_carlo(config_path=str(small_config), out_dir=str(out), audit="ledger", ledger_mode="topk", ledger_binary=True)
+    (out / "run.json").unlink()
+
+    assert simulate_cached(str(small_config), str(out), str(cache_dir), audit="ledger")[2] is True
+    assert not (out / "ledger.bin").exists()
+    assert verify_run(str(out), workers=1)["binary_checked"] is False
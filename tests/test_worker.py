@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+
+from pie.application import worker as worker_mod
+from pie.application.stats import StatsQuery
+from pie.application.worker import (
+    STAGES,
+    Stage,
+    Worker,
+    WorkerOptions,
+    discover_jobs,
+    plan_job,
+    topo_order,
+)
+
+
+def _write_configs(small_config: Path, cfg_dir: Path) -> None:
+    cfg = yaml.safe_load(small_config.read_text(encoding="utf-8"))
+    cfg_dir.mkdir()
+    for i, name in enumerate(("a", "b")):
+        cfg["run"]["seed"] = 100 + i
+        (cfg_dir / f"{name}.yml").write_text(yaml.safe_dump(cfg), encoding="utf-8")
+
+
+def test_worker_reruns_only_stages_with_changed_inputs(small_config: Path, tmp_path: Path, monkeypatch):
+    cfg_dir, out_root, site = tmp_path / "cfg", tmp_path / "out", tmp_path / "site"
+    _write_configs(small_config, cfg_dir)
+    opts = WorkerOptions(ledger_mode="all", ledger_chunk_size=10)
+    worker = Worker([str(cfg_dir)], str(out_root), str(site), opts, max_workers=2, log=lambda msg: None)
+
+    first = {r["job"]: r for r in worker.cycle()}  # two dirty jobs: run on the process pool
+    all_stages = ["simulate", "merge", "stats", "dashboard", "publish"]
+    assert first["a"]["ran"] == first["b"]["ran"] == all_stages
+    assert (site / "a" / "index.html").exists() and (site / "b" / "index.html").exists()
+    assert "<title>PIE Dashboard</title>" in (site / "index.html").read_text(encoding="utf-8")
+    assert worker.cycle() == []  # nothing changed: nothing dispatched
+    # idle checks judge the publish stage from the local record, not the site
+    monkeypatch.setattr(worker_mod, "open_store", lambda url: pytest.fail(f"queried {url}"))
+    assert worker.cycle() == []
+    monkeypatch.undo()
+
+    # A config edit reruns that job only.
+    cfg_b = yaml.safe_load((cfg_dir / "b.yml").read_text(encoding="utf-8"))
+    cfg_b["run"]["iterations"] = 30
+    (cfg_dir / "b.yml").write_text(yaml.safe_dump(cfg_b), encoding="utf-8")
+    (cfg_dir / "a.yml").touch()  # touched but unchanged
+    [res] = worker.cycle()
+    assert res["job"] == "b" and res["ran"] == all_stages
+    assert json.loads((out_root / "b" / "run.json").read_text(encoding="utf-8"))["iterations"] == 30
+
+    # A new stats query leaves the simulation and merged ledger alone.
+    worker.opts = WorkerOptions(ledger_mode="all", ledger_chunk_size=10, query=StatsQuery(min_cost=1e12))
+    for res in worker.cycle():
+        assert res["ran"] == ["stats", "dashboard", "publish"]
+        assert res["skipped"] == ["simulate", "merge"]
+
+    # Missing outputs are rebuilt even when inputs are unchanged.
+    (out_root / "a" / "stats.json").unlink()
+    job_a = next(j for j in discover_jobs([str(cfg_dir)], str(out_root), str(site)) if j.name == "a")
+    assert plan_job(job_a, worker.opts) == ["stats", "dashboard", "publish"]
+    worker.close()
+
+
+def test_topo_order_rejects_cycles_and_unknown_deps():
+    assert [s.name for s in topo_order(STAGES)] == ["simulate", "merge", "stats", "dashboard", "publish"]
+    noop = {"inputs": lambda *a: None, "run": lambda *a: None, "present": lambda job: True}
+    with pytest.raises(ValueError, match="cycle"):
+        topo_order((Stage("x", ("y",), **noop), Stage("y", ("x",), **noop)))
+    with pytest.raises(ValueError, match="unknown"):
+        topo_order((Stage("x", ("nope",), **noop),))